@@ -705,6 +705,8 @@ class ViewAction(Action):
         self.videosink = None
         self.audiosink = None
         self.sync = True
+        # the frames shown are added to it, if set
+        self.frame_cache = None
 
     def getDynamicLinks(self, producer, stream):
         self.debug("producer:%r, stream:%r, sync:%r",
@@ -714,6 +716,7 @@ class ViewAction(Action):
         res = Action.getDynamicLinks(self, producer, stream)
         if isinstance(stream, VideoStream):
             consumer = DefaultVideoSink()
+            consumer.frame_cache = self.frame_cache
             self.videosink = consumer
             self.videosink.setSync(self.sync)
 
@@ -32,7 +32,8 @@ from pitivi.log.loggable import Loggable
 from pitivi.action import render_action_for_uri, ViewAction
 from pitivi.factories.base import SourceFactory
 from pitivi.factories.timeline import TimelineSourceFactory
-from pitivi.settings import export_settings_to_render_settings
+from pitivi.settings import export_settings_to_render_settings, \
+        get_bool_env
 from pitivi.stream import VideoStream, AudioStream
 from pitivi.utils import beautify_length
 
@@ -41,7 +42,8 @@ class Actioner(Loggable, Signallable):
 
     __signals__ = {
         "eos" : None,
-        "error" : None
+        "error" : None,
+        "profile" : ["profiler"]
         }
 
     RENDERER = 0
@@ -157,13 +159,23 @@ class Actioner(Loggable, Signallable):
         self.acting = True
 
 class Renderer(Actioner):
-    """ Rendering helper methods """
+    """
+    Rendering helper methods
 
-    def __init__(self, project, pipeline=None, outfile=None):
+    When profiling, the elements of the pipeline are measured during the
+    render, and C{profile} is emitted with the L{PipelineProfiler} once it's
+    over. Set C{PITIVI_PROFILE_RENDER} in the environment to profile all the
+    renders.
+    """
+
+    def __init__(self, project, pipeline=None, outfile=None, profile=None):
         self.actioner = self.RENDERER
         Actioner.__init__(self, project, pipeline)
         self.detectStreamTypes()
         self.outfile = outfile
+        if profile is None:
+            profile = get_bool_env("PITIVI_PROFILE_RENDER")
+        self.profile = profile
 
     def detectStreamTypes(self):
         self.have_video = False
@@ -207,6 +219,30 @@ class Renderer(Actioner):
         if not self.acting and self.outfile:
             self._startAction()
 
+    def _startAction(self):
+        if self.profile:
+            # started before the elements are made, to see them all
+            self.pipeline.startProfiling()
+        if self.project.prerender is not None:
+            # renders use the original objects, not the preview quality files
+            self.project.prerender.suspend()
+        Actioner._startAction(self)
+
+    def removeAction(self):
+        if self.profile:
+            self._reportProfile()
+        Actioner.removeAction(self)
+        if self.project.prerender is not None:
+            self.project.prerender.resume()
+
+    def _reportProfile(self):
+        profiler = self.pipeline.stopProfiling()
+        if profiler is None:
+            return
+
+        self.info("render profile:\n%s", profiler.formatReport())
+        self.emit("profile", profiler)
+
 class Previewer(Actioner):
     """ Previewing helper methods """
 
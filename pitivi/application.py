@@ -23,9 +23,11 @@
 """
 Main application
 """
+from pitivi.startuptimer import startup_timer
+startup_timer.begin("imports")
+
 import gobject
 gobject.threads_init()
-import gtk
 from optparse import OptionParser
 import os
 import sys
@@ -39,30 +41,35 @@ from gettext import gettext as _
 import pitivi.instance as instance
 
 from pitivi.check import initial_checks
-from pitivi.device import get_probe
 from pitivi.effects import EffectsHandler
 from pitivi.configure import APPNAME
 from pitivi.settings import GlobalSettings
-from pitivi.threads import ThreadMaster
-from pitivi.pluginmanager import PluginManager
+from pitivi.threads import JobExecutor
 from pitivi.signalinterface import Signallable
 from pitivi.log.loggable import Loggable
 from pitivi.log import log
-from pitivi.ui.mainwindow import PitiviMainWindow
 from pitivi.projectmanager import ProjectManager, ProjectLogObserver
 from pitivi.undo import UndoableActionLog, DebugActionLogObserver
 from pitivi.timeline.timeline_undo import TimelineLogObserver
 from pitivi.sourcelist_undo import SourceListLogObserver
 from pitivi.undo import UndoableAction
-from pitivi.ui.viewer import PitiviViewer
-from pitivi.actioner import Renderer, Previewer
 
-# FIXME : Speedup loading time
-# Currently we load everything in one go
-# It would be better if a minimalistic UI could start up ASAP, without loading
-# anything gst-related or that could slow down startup.
-# AND THEN load up the required parts.
-# This will result in a much better end-user experience
+startup_timer.end()
+
+GlobalSettings.addConfigSection("undo")
+GlobalSettings.addConfigOption("undoMaxActions",
+    section="undo",
+    key="max-actions",
+    environment="PITIVI_UNDO_MAX_ACTIONS",
+    default=100000)
+
+# The user interface, the plugins and the device probe are only imported and
+# set up when they are first needed, so that running without the UI never
+# loads gtk. Set PITIVI_STARTUP_TIMING or pass --timing to get the time taken
+# by each phase of the startup.
+GlobalSettings.addConfigOption("startupTiming",
+    environment="PITIVI_STARTUP_TIMING",
+    default=False)
 
 # FIXME : maybe we should have subclasses for UI and CLI
 
@@ -87,6 +94,10 @@ class Pitivi(Loggable, Signallable):
 
     @ivar settings: Application-wide settings.
     @type settings: L{GlobalSettings}.
+    @ivar plugin_manager: The plugins, collected when first used.
+    @type plugin_manager: L{PluginManager}
+    @ivar deviceprobe: The capture devices, probed when first used.
+    @type deviceprobe: L{DeviceProbe} or C{None}
     @ivar projects: List of used projects
     @type projects: List of L{Project}.
     @ivar current: Currently used project.
@@ -129,26 +140,54 @@ class Pitivi(Loggable, Signallable):
         self.current = None
 
         # get settings
+        startup_timer.begin("settings")
         self.settings = GlobalSettings()
-        self.threads = ThreadMaster()
+        startup_timer.end()
+        self.threads = JobExecutor()
         #self.screencast = False
 
-        self.plugin_manager = PluginManager(
-            self.settings.get_local_plugin_path(),
-            self.settings.get_plugin_settings_path())
+        self._plugin_manager = None
+        self._deviceprobe = None
+        self._deviceprobe_created = False
         self.effects = EffectsHandler()
-        self.deviceprobe = get_probe()
 
+        startup_timer.begin("project manager")
         self.projectManager = ProjectManager(self.effects)
         self._connectToProjectManager(self.projectManager)
+        startup_timer.end()
 
-        self.action_log = UndoableActionLog()
+        self.action_log = UndoableActionLog(self.settings.undoMaxActions)
         self.debug_action_log_observer = DebugActionLogObserver()
         self.debug_action_log_observer.startObserving(self.action_log)
         self.timelineLogObserver = TimelineLogObserver(self.action_log)
         self.projectLogObserver = ProjectLogObserver(self.action_log)
         self.sourcelist_log_observer = SourceListLogObserver(self.action_log)
 
+    def _getPluginManager(self):
+        if self._plugin_manager is None:
+            from pitivi.pluginmanager import PluginManager
+
+            startup_timer.begin("plugins")
+            self._plugin_manager = PluginManager(
+                self.settings.get_local_plugin_path(),
+                self.settings.get_plugin_settings_path())
+            startup_timer.end()
+        return self._plugin_manager
+
+    plugin_manager = property(_getPluginManager)
+
+    def _getDeviceProbe(self):
+        if not self._deviceprobe_created:
+            from pitivi.device import get_probe
+
+            startup_timer.begin("device probe")
+            self._deviceprobe = get_probe()
+            self._deviceprobe_created = True
+            startup_timer.end()
+        return self._deviceprobe
+
+    deviceprobe = property(_getDeviceProbe)
+
     #{ Shutdown methods
 
     def shutdown(self):
@@ -164,11 +203,11 @@ class Pitivi(Loggable, Signallable):
         if self.projectManager.current and not self.projectManager.closeRunningProject():
             self.warning("Not closing since running project doesn't want to close")
             return False
-        self.threads.stopAllThreads()
+        self.threads.shutdown()
         self.settings.storeSettings()
-        if self.deviceprobe:
-            self.deviceprobe.release()
-        self.deviceprobe = None
+        if self._deviceprobe:
+            self._deviceprobe.release()
+        self._deviceprobe = None
         self.current = None
         instance.PiTiVi = None
         self.emit("shutdown")
@@ -242,6 +281,7 @@ When -r is specified, the given project file is rendered without opening the GUI
     no_ui_help = _("""Run pitivi with no gui""")
     render_help = _("""Render the given project file to OUTPUT_FILE with no GUI.""")
     preview_help = _("""Preview the given project file without the full UI.""")
+    timing_help = _("""Print how long each phase of the startup took.""")
 
     def __init__(self):
         Pitivi.__init__(self)
@@ -250,9 +290,13 @@ When -r is specified, the given project file is rendered without opening the GUI
 
     def _newProjectLoaded(self, project):
         if self.render_output:
+            from pitivi.actioner import Renderer
+
             # create renderer and set output file
             self.actioner = Renderer(self.current, pipeline=None, outfile=self.output_file)
         elif self.preview:
+            from pitivi.actioner import Previewer
+
             # create previewer and set ui
             self.actioner = Previewer(self.current, pipeline=None, ui=self.gui)
             # hack to make the gtk.HScale seek slider UI behave properly
@@ -265,10 +309,6 @@ When -r is specified, the given project file is rendered without opening the GUI
             self.actioner.startAction()
 
     def run(self, argv):
-        # check for dependencies
-        if not self._checkDependencies():
-            return
-
         # parse cmdline options
         parser = self._createOptionParser()
         options, args = parser.parse_args(argv)
@@ -304,9 +344,23 @@ When -r is specified, the given project file is rendered without opening the GUI
             parser.error("invalid arguments")
             return
 
+        if options.timing:
+            self.settings.startupTiming = True
+
+        # check for dependencies
+        startup_timer.begin("checks")
+        dependencies_ok = self._checkDependencies(options.no_ui)
+        startup_timer.end()
+        if not dependencies_ok:
+            return
+
+        startup_timer.begin("user interface")
         if options.no_ui:
             self.gui = None
         elif options.preview:
+            import gtk
+            from pitivi.ui.viewer import PitiviViewer
+
             # init ui for previewing
             self.gui = PitiviViewer()
             self.window = gtk.Window()
@@ -314,10 +368,14 @@ When -r is specified, the given project file is rendered without opening the GUI
             self.window.add(self.gui)
             self.window.show_all()
         else:
+            from pitivi.ui.mainwindow import PitiviMainWindow
+
             # create the ui
             self.gui = PitiviMainWindow(self)
             self.gui.show()
+        startup_timer.end()
 
+        startup_timer.begin("project")
         if not options.import_sources and args:
             index = 0
             if options.render_output:
@@ -336,10 +394,19 @@ When -r is specified, the given project file is rendered without opening the GUI
             self.current.sources.connect("discovery-error",
                     self._discoveryErrorCb, uris)
             self.current.sources.addUris(uris)
+        startup_timer.end()
 
         # run the mainloop
+        gobject.idle_add(self._startedCb)
         self.mainloop.run()
 
+    def _startedCb(self):
+        report = startup_timer.getReport()
+        self.debug("startup timing:\n%s", report)
+        if self.settings.startupTiming:
+            print >> sys.stderr, report
+        return False
+
     def _deleteCb(self, unused_widget, unused_data):
         self.shutdown()
 
@@ -372,14 +439,22 @@ When -r is specified, the given project file is rendered without opening the GUI
                 dest="render_output", action="store_true", default=False)
         parser.add_option("-p", "--preview", help=self.preview_help,
                 action="store_true", default=False)
+        parser.add_option("--timing", help=self.timing_help,
+                action="store_true", default=False)
 
         return parser
 
 
-    def _checkDependencies(self):
-        missing_deps = initial_checks()
+    def _checkDependencies(self, no_ui=False):
+        missing_deps = initial_checks(no_ui)
         if missing_deps:
             message, detail = missing_deps
+            if no_ui:
+                print >> sys.stderr, "%s\n%s" % (message, detail)
+                return False
+
+            import gtk
+
             dialog = gtk.MessageDialog(type=gtk.MESSAGE_ERROR,
                                        buttons=gtk.BUTTONS_OK)
             dialog.set_icon_name("pitivi")
@@ -23,7 +23,6 @@
 Runtime checks.
 """
 
-import gtk
 import gst
 
 from gettext import gettext as _
@@ -78,6 +77,7 @@ def check_required_version(modulename):
     This function does not check for the existence of the given module !
     """
     if modulename == "gtk":
+        import gtk
         if list(gtk.pygtk_version) < _string_to_list(PYGTK_REQ):
             return [PYGTK_REQ, _version_to_string(gtk.pygtk_version)]
     if modulename == "pygst":
@@ -96,7 +96,14 @@ def check_required_version(modulename):
             return [GNONLIN_REQ, gnlver]
     return [None, None]
 
-def initial_checks():
+def initial_checks(no_ui=False):
+    """
+    Check the dependencies, only those needed without the user interface if
+    C{no_ui} is set.
+
+    @return: A (message, detail) tuple describing the first missing
+    dependency, or C{None}.
+    """
     reg = gst.registry_get_default()
     if PiTiVi:
         return (_("%s is already running!") % APPNAME,
@@ -104,6 +111,23 @@ def initial_checks():
     if not reg.find_plugin("gnonlin"):
         return (_("Could not find the GNonLin plugins!"),
                 _("Make sure the plugins were installed and are available in the GStreamer plugins path."))
+    req, inst = check_required_version("pygst")
+    if req:
+        return (_("You do not have a recent enough version of the GStreamer Python bindings (currently %s)") % inst,
+                _("Install a version of the GStreamer Python bindings greater or equal to %s") % req)
+    req, inst = check_required_version("gst")
+    if req:
+        return (_("You do not have a recent enough version of GStreamer (currently %s)") % inst,
+                _("Install a version of the GStreamer greater or equal to %s") % req)
+    req, inst = check_required_version("gnonlin")
+    if req:
+        return (_("You do not have a recent enough version of the GNonLin GStreamer plugin (currently %s)") % inst,
+                _("Install a version of the GNonLin GStreamer plugin greater or equal to %s") % req)
+    if no_ui:
+        return None
+
+    import gtk
+
     if not reg.find_plugin("autodetect"):
         return (_("Could not find the autodetect plugins!"),
                 _("Make sure you have installed gst-plugins-good and is available in the GStreamer plugin path."))
@@ -129,22 +153,10 @@ def initial_checks():
     if req:
         return (_("You do not have a recent enough version of the GTK+ Python bindings (currently %s)") % inst,
                 _("Install a version of the GTK+ Python bindings greater or equal to %s") % req)
-    req, inst = check_required_version("pygst")
-    if req:
-        return (_("You do not have a recent enough version of the GStreamer Python bindings (currently %s)") % inst,
-                _("Install a version of the GStreamer Python bindings greater or equal to %s") % req)
-    req, inst = check_required_version("gst")
-    if req:
-        return (_("You do not have a recent enough version of GStreamer (currently %s)") % inst,
-                _("Install a version of the GStreamer greater or equal to %s") % req)
     req, inst = check_required_version("cairo")
     if req:
         return (_("You do not have a recent enough version of the cairo Python bindings (currently %s)") % inst,
                 _("Install a version of the cairo Python bindings greater or equal to %s") % req)
-    req, inst = check_required_version("gnonlin")
-    if req:
-        return (_("You do not have a recent enough version of the GNonLin GStreamer plugin (currently %s)") % inst,
-                _("Install a version of the GNonLin GStreamer plugin greater or equal to %s") % req)
     if not __try_import__("zope.interface"):
         return (_("Could not import the Zope interface module"),
                 _("Make sure you have the zope.interface module installed"))
@@ -98,11 +98,19 @@ class Discoverer(Signallable, Loggable):
     The "discovery-done" signal is emitted an uri is finished being analyzed.
     The "discovery-error" signal is emitted if an error is encountered while
     analyzing an uri.
+
+    Analyzing only prerolls the streams to read their caps and duration, it
+    doesn't wait for a thumbnail. The video thumbnails missing from the cache
+    are made afterwards, one uri at a time and only while there is nothing
+    to analyze. The "thumbnail-done" signal is emitted when the thumbnail of
+    a discovered uri is ready, once the thumbnail of its video streams is
+    set.
     """
 
     __signals__ = {
         "discovery-error" : ["a", "b", "c" ],
         "discovery-done" : ["uri", "factory"],
+        "thumbnail-done" : ["uri", "factory"],
         "ready" : None,
         "starting" : None,
         "missing-plugins": ["uri", "detail", "description"]
@@ -111,7 +119,10 @@ class Discoverer(Signallable, Loggable):
     def __init__(self):
         Loggable.__init__(self)
         self.queue = []
+        # (uri, factory) waiting for a thumbnail
+        self.thumbnail_queue = []
         self.working = False
+        self.thumbnailing = False
         self.timeout_id = 0
         self._resetState()
 
@@ -167,11 +178,16 @@ class Discoverer(Signallable, Loggable):
         self.working = True
         self.emit("starting")
 
-        self._scheduleAnalysis()
+        if not self.thumbnailing:
+            # otherwise the analysis starts when the thumbnail is done
+            self._scheduleAnalysis()
 
     def _scheduleAnalysis(self):
         gobject.idle_add(self._analyze)
 
+    def _scheduleThumbnail(self):
+        gobject.idle_add(self._thumbnail, priority=gobject.PRIORITY_LOW)
+
     def _removeTimeout(self):
         gobject.source_remove(self.timeout_id)
         self.timeout_id = 0
@@ -231,9 +247,33 @@ class Discoverer(Signallable, Loggable):
         self._emitError()
 
     def _emitDone(self, factory):
+        for stream in factory.getOutputStreams(VideoStream):
+            if stream.thumbnail is None:
+                self.thumbnail_queue.append((self.current_uri, factory))
+                break
+
         self.emit("discovery-done", self.current_uri, factory)
 
+    def _emitThumbnailResult(self):
+        uri, factory = self.thumbnail_queue[0]
+        thumbnail = self._getThumbnailFilenameFromPad(None)
+        if self.error is not None or not os.path.exists(thumbnail):
+            self.warning("couldn't make a thumbnail for %s: %s", uri,
+                    self.error)
+            if os.path.exists(thumbnail):
+                # don't keep a truncated file around
+                os.remove(thumbnail)
+            return
+
+        for stream in factory.getOutputStreams(VideoStream):
+            stream.thumbnail = thumbnail
+        self.emit("thumbnail-done", uri, factory)
+
     def _emitResult(self):
+        if self.thumbnailing:
+            self._emitThumbnailResult()
+            return True
+
         missing_plugins = bool(self.missing_plugin_details)
         # we got a gst error, error out ASAP
         if not missing_plugins and self.error:
@@ -319,15 +359,22 @@ class Discoverer(Signallable, Loggable):
         self.info("Cleaning up after finished analyzing %s", self.current_uri)
         self._resetState()
 
-        if not rescan:
+        if self.thumbnailing:
+            self.thumbnailing = False
+            self.thumbnail_queue.pop(0)
+        elif not rescan:
             self.queue.pop(0)
         # restart an analysis if there's more...
         if self.queue:
             self._scheduleAnalysis()
-        else:
+            return
+
+        if self.working:
             self.working = False
             self.info("discoverer is now ready again")
             self.emit("ready")
+        if self.thumbnail_queue:
+            self._scheduleThumbnail()
 
     def _timeoutCb(self):
         self.debug("timeout")
@@ -404,7 +451,32 @@ class Discoverer(Signallable, Loggable):
         """
         self.current_uri = self.queue[0]
         self.info("Analyzing %s", self.current_uri)
+        self._startPipeline()
 
+        # return False so we don't get called again
+        return False
+
+    def _thumbnail(self):
+        """
+        Sets up a pipeline to make the thumbnail of the first discovered uri
+        without one
+        """
+        if self.working or self.thumbnailing or not self.thumbnail_queue:
+            # analyzing comes first, the thumbnail is scheduled again after
+            return False
+
+        self.thumbnailing = True
+        self.current_uri = self.thumbnail_queue[0][0]
+        self.info("Making thumbnail for %s", self.current_uri)
+        if os.path.exists(self._getThumbnailFilenameFromPad(None)):
+            # the uri was discovered again before its thumbnail was done
+            self._finishAnalysis("thumbnail already made")
+        else:
+            self._startPipeline()
+
+        return False
+
+    def _startPipeline(self):
         # setup graph and start analyzing
         self.pipeline = gst.Pipeline("Discoverer-%s" % self.current_uri)
 
@@ -412,7 +484,7 @@ class Discoverer(Signallable, Loggable):
         source = self._createSource()
         if source is None:
             self._finishAnalysis("no source")
-            return False
+            return
 
         # create decodebin(2)
         dbin = self._createDecodeBin()
@@ -433,13 +505,10 @@ class Discoverer(Signallable, Loggable):
             self.info("Pipeline didn't want to go to PAUSED")
             self._finishAnalysis("failure going to PAUSED")
 
-            return False
+            return
 
         self._scheduleTimeout()
 
-        # return False so we don't get called again
-        return False
-
     def _busMessageEosCb(self, unused_bus, message):
         self.debug("got EOS")
 
@@ -484,9 +553,9 @@ class Discoverer(Signallable, Loggable):
 
         if prev == gst.STATE_READY and new == gst.STATE_PAUSED and \
                 pending == gst.STATE_VOID_PENDING:
-            have_video, have_audio, have_image = self._getCurrentStreamTypes()
-            if self.unfixed_pads or self.unknown_pads or have_video or have_image:
-                # go to PLAYING to generate the thumbnails
+            if self.thumbnailing or self.unfixed_pads or self.unknown_pads:
+                # go to PLAYING to generate the thumbnails, or until the
+                # caps are fixed
                 if self.pipeline.set_state(gst.STATE_PLAYING) == gst.STATE_CHANGE_FAILURE:
                     if not self.error:
                         self.error = _("Pipeline didn't want to go to PLAYING.")
@@ -590,11 +659,14 @@ class Discoverer(Signallable, Loggable):
         self._addPadProbes(pad)
 
         thumbnail = self._getThumbnailFilenameFromPad(pad)
-        self.thumbnails[pad] = thumbnail
         have_thumbnail = os.path.exists(thumbnail)
+        if have_thumbnail or self.thumbnailing:
+            self.thumbnails[pad] = thumbnail
+        else:
+            self.thumbnails[pad] = None
 
-        if have_thumbnail:
-            self.debug("we already have a thumbnail %s for %s", thumbnail, pad)
+        if have_thumbnail or not self.thumbnailing:
+            self.debug("not making a thumbnail %s for %s now", thumbnail, pad)
             sink = gst.element_factory_make("fakesink")
             # use this and not fakesink.props.num_buffers = 1 to avoid some
             # not-expected errors when discovering pictures
@@ -25,7 +25,6 @@
 Effects global handling
 """
 import gst
-import gtk
 import gobject
 import re
 import os
@@ -33,8 +32,9 @@ import os
 from gettext import gettext as _
 
 from pitivi.factories.operation import EffectFactory
-from pitivi.stream import get_stream_for_pad
+from pitivi.stream import get_stream_for_caps
 from pitivi.configure import get_pixmap_dir
+from pitivi.registrycache import registrycache
 from pitivi.undo import UndoableAction
 
 # Note: Some effects are available through the frei0r library and the libavfilter0 library
@@ -54,6 +54,9 @@ BLACKLISTED_EFFECTS = ["colorconvert", "coglogoinsert", "festival",
                        "alphacolor", "cogcolorspace", "videodetect",
                        "navigationtest", "videoanalyse"]
 
+# element properties that aren't part of the configuration of an effect
+PROPS_TO_IGNORE = ['name', 'qos', 'silent', 'message']
+
 class EffectsHandler(object):
     """
     Handles all the effects
@@ -114,45 +117,74 @@ class EffectsHandler(object):
         )
         self._audio_categories = []
         self._video_categories = []
+        self._categories_map = self._buildCategoriesMap()
         self.video_effects = []
         self.audio_effects = []
         self._effect_factories_dict = {}
-        self._setAllEffects()
+        self._effects_set = False
+
+    def _ensureEffects(self):
+        # effects are only looked up the first time they are needed
+        if not self._effects_set:
+            self._effects_set = True
+            self._setAllEffects()
 
     def _setAllEffects(self):
         """
-        go trough the list of element factories and
-        add them to the correct list filtering if necessary
+        go trough the list of effects found in the registry and
+        add them to the correct list
+        """
+        effects = registrycache().get("effects", self._scanEffects)
+        for name, klass, longname, description, pads in effects:
+            element_factory = gst.element_factory_find(name)
+            if element_factory is None:
+                continue
+
+            effect = EffectFactory(name, name,
+                               self._getEffectCategories(name),
+                               self._getEffectName(longname),
+                               description)
+            self._addStreams(effect, pads)
+
+            if 'Audio' in klass:
+                self.audio_effects.append(element_factory)
+            elif 'Video' in klass:
+                self.video_effects.append(element_factory)
+            self._addEffectToDic(name, effect)
+
+    def _scanEffects(self):
+        """
+        go trough the list of element factories and return the description
+        of those we can use as effects, filtering if necessary
         """
+        effects = []
         factlist = gst.registry_get_default().get_feature_list(gst.ElementFactory)
         for element_factory in factlist:
             klass = element_factory.get_klass()
             if "Effect" in klass and element_factory.get_name()\
               not in BLACKLISTED_EFFECTS:
-                name = element_factory.get_name()
-                effect = EffectFactory(name, name,
-                                   self._getEffectCategories(name),
-                                   self._getEffectName(element_factory),
-                                   self._getEffectDescripton(element_factory))
-                added = self.addStreams(element_factory, effect)
-
-                if added is True:
-                    if 'Audio' in klass:
-                        self.audio_effects.append(element_factory)
-                    elif 'Video' in klass:
-                        self.video_effects.append(element_factory)
-                    self._addEffectToDic(name, effect)
+                pads = self._getPads(element_factory)
+                if pads is None:
+                    continue
+
+                effects.append((element_factory.get_name(), klass,
+                        element_factory.get_longname(),
+                        self._getEffectDescripton(element_factory), pads))
+
+        return effects
 
     def getAllAudioEffects(self):
         """
         @returns:  the list off available audio effects elements
         """
+        self._ensureEffects()
         return self.audio_effects
 
     def getAllVideoEffects(self):
         """
         @returns: the list off available video effects elements
         """
+        self._ensureEffects()
         return self.video_effects
 
     def _addEffectToDic(self, name, factory):
@@ -165,29 +197,44 @@ class EffectsHandler(object):
         @returns: The l{EffectFactory} corresponding to the name
         @raises: KeyError if the name doesn't  exist
         """
+        self._ensureEffects()
         return self._effect_factories_dict.get(name)
 
-    def addStreams(self, element, factory):
+    def _getPads(self, element):
         """
-        Adds the good streams to the corresponding factory
+        @returns: A C{list} of (name, direction, caps) C{tuple}s describing
+        the static pads of the element, or C{None} if it can't be used
+        as an effect
         """
-        pads = element.get_static_pad_templates()
+        pads = []
+        for padTmp in element.get_static_pad_templates():
+            caps = padTmp.get_caps()
+            if caps.is_any(): #FIXME
+                return None
 
-        if not factory:
-            return False
+            if padTmp.direction == gst.PAD_SRC:
+                direction = gst.PAD_SRC
+            elif padTmp.direction == gst.PAD_SINK:
+                direction = gst.PAD_SINK
+            else:
+                continue
+            pads.append((padTmp.name_template, int(direction),
+                    caps.to_string()))
 
-        for padTmp in pads:
-            pad = gst.Pad (padTmp.get())
-            if pad.get_caps() == "ANY": #FIXME
-                return False
+        return pads
 
-            if padTmp.direction == gst.PAD_SRC:
-                stream = get_stream_for_pad(pad)
+    def _addStreams(self, factory, pads):
+        """
+        Adds the good streams to the corresponding factory
+        """
+        for name, direction, caps in pads:
+            stream = get_stream_for_caps(gst.Caps(caps))
+            stream.pad_name = name
+            stream.pad_id = []
+            if direction == gst.PAD_SRC:
                 factory.addInputStream(stream)
-            elif padTmp.direction == gst.PAD_SINK:
-                stream = get_stream_for_pad(pad)
+            elif direction == gst.PAD_SINK:
                 factory.addOutputStream(stream)
-        return True
 
     def _getEffectDescripton(self, element_factory):
         """
@@ -197,25 +244,34 @@ class EffectsHandler(object):
         """
         return element_factory.get_description()
 
-    def _getEffectCategories(self, effect_name):
+    def _buildCategoriesMap(self):
         """
-        @ivar effect_name: the name of the effect for wich we want the category
-        @type effect_name: L{str}
-        @returns: A C{list} of name C{str} of categories corresponding the effect
+        @returns: A C{dict} mapping effect names to a C{tuple} of the lists of
+        their audio and video categories
         """
-        categories = []
+        categories_map = {}
 
         for categorie in self._audio_categories_effects:
             for name in categorie[1]:
-                if name == effect_name:
-                    categories.append(categorie[0])
-                    self._audio_categories.append(categorie[0])
+                categories_map.setdefault(name, ([], []))[0].append(categorie[0])
 
         for categorie in self._video_categories_effects:
             for name in categorie[1]:
-                if name == effect_name:
-                    categories.append(categorie[0])
-                    self._video_categories.append(categorie[0])
+                categories_map.setdefault(name, ([], []))[1].append(categorie[0])
+
+        return categories_map
+
+    def _getEffectCategories(self, effect_name):
+        """
+        @ivar effect_name: the name of the effect for wich we want the category
+        @type effect_name: L{str}
+        @returns: A C{list} of name C{str} of categories corresponding the effect
+        """
+        audio_categories, video_categories = \
+                self._categories_map.get(effect_name, ((), ()))
+        categories = list(audio_categories) + list(video_categories)
+        self._audio_categories.extend(audio_categories)
+        self._video_categories.extend(video_categories)
 
         if not categories:
             uncategorized = _("Uncategorized")
@@ -229,10 +285,10 @@ class EffectsHandler(object):
 
         return categories
 
-    def _getEffectName(self, element_factory):
+    def _getEffectName(self, longname):
         """
-        @ivar element_factory: The element factory
-        @type element_factory: L{gst.ElementFactory}
+        @ivar longname: The long name of the element factory
+        @type longname: C{str}
         @returns: A human readable name C{str} for the effect
         """
         #TODO check if it is the good way to make it translatable
@@ -242,7 +298,7 @@ class EffectsHandler(object):
         effect = _("effect")
         pipe = " |"
         uselessWords = re.compile(video + pipe + audio + pipe + effect)
-        return uselessWords.sub("", element_factory.get_longname()).title()
+        return uselessWords.sub("", longname).title()
 
     def getVideoCategories(self, aware=True):
         """
@@ -253,6 +309,8 @@ class EffectsHandler(object):
         the system if it has been filled earlier, if it hasen't it will just
         return all categories
         """
+        if aware:
+            self._ensureEffects()
         if not self._video_categories or not aware:
             for categorie in self._video_categories_effects:
                 self._video_categories.append(categorie[0])
@@ -269,6 +327,8 @@ class EffectsHandler(object):
         @type aware: C{bool}
         @returns: All audio effect categories names C{str}
         """
+        if aware:
+            self._ensureEffects()
         if not self._audio_categories or not aware:
             for categorie in self._audio_categories_effects:
                 self._audio_categories.append(categorie[0])
@@ -286,6 +346,9 @@ class EffectsHandler(object):
         return effects_categories.extended(self.video_categories).extended(self.audio_categories)
 
     def getEffectIcon(self, effect_name):
+        # not imported at module level, the effects are also used headless
+        import gtk
+
         icontheme = gtk.icon_theme_get_default()
         pixdir = get_pixmap_dir()
         icon = None
@@ -318,6 +381,12 @@ class EffectPropertyChanged(UndoableAction):
         self.gst_element.set_property(self.property_name, self.old_value)
         self._undone()
 
+    def getCoalesceKey(self):
+        return (EffectPropertyChanged, self.gst_element, self.property_name)
+
+    def coalesce(self, action):
+        self.new_value = action.new_value
+
 class EffectGstElementPropertyChangeTracker:
     """
     Track effect configuration changes in its list of control effects
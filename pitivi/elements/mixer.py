@@ -23,6 +23,8 @@
 Audio and Video mixers
 """
 
+import threading
+
 import gobject
 import gst
 
@@ -108,6 +110,18 @@ gobject.type_register(SmartAdderBin)
 gst.element_register(SmartAdderBin, 'smart-adder-bin')
 
 class SmartVideomixerBin(gst.Bin):
+    """
+    Video mixer accepting any raw video.
+
+    When a single input is active and no source has alpha keyframes, which
+    is the case in most of a cut-only timeline, the input goes through to
+    the source pad as is, without conversion nor blending. The inputs are
+    only converted and mixed by videomixer while several of them overlap.
+
+    The inputs are blocked while they are switched between the passthrough
+    and videomixer, and the last segment they got is sent again to their new
+    target.
+    """
 
     __gstdetails__ = (
         "Smart Videomixer",
@@ -130,17 +144,28 @@ class SmartVideomixerBin(gst.Bin):
         # black background
         self.videomixer.props.background = 1
         # FIXME : USE THE PROJECT SETTINGS FOR THESE CAPS !
-        csp = gst.element_factory_make("ffmpegcolorspace")
-        self.add(self.videomixer, csp)
-        self.videomixer.link_pads_full("src", csp, "sink", gst.PAD_LINK_CHECK_NOTHING)
-        srcpad = gst.GhostPad("src", csp.get_pad("src"))
-        srcpad.set_active(True)
-        self.add_pad(srcpad)
+        self.csp = gst.element_factory_make("ffmpegcolorspace")
+        self.passthrough = gst.element_factory_make("identity", "passthrough")
+        self.passthrough.props.silent = True
+        self.add(self.videomixer, self.csp, self.passthrough)
+        self.videomixer.link_pads_full("src", self.csp, "sink", gst.PAD_LINK_CHECK_NOTHING)
+        self.srcpad = gst.GhostPad("src", self.csp.get_pad("src"))
+        self.srcpad.set_active(True)
+        self.add_pad(self.srcpad)
         self.pad_count = 0
         self.inputs = {} # key : pad_name,
                          # value : (sinkpad, ffmpegcolorspace, capsfilter, videomixerpad)
+        # the name of the input linked to the passthrough, if any
+        self.passthrough_input = None
+        # peer => blocked, the peers of the inputs waiting for the switch
+        self._blocked_peers = {}
+        # name => the arguments of the last NEWSEGMENT of the input
+        self._segments = {}
+        self._lock = threading.RLock()
 
         self.alpha_helper = SmartVideomixerBinPropertyHelper(track, self.inputs)
+        self.alpha_helper.connect("alpha-state-changed",
+                self._alphaStateChangedCb)
 
     def update_priority(self, pad, priority):
         self.debug("pad:%r, priority:%d" % ( pad, priority))
@@ -161,10 +186,7 @@ class SmartVideomixerBin(gst.Bin):
         csp = gst.element_factory_make("ffmpegcolorspace", "csp-%d" % self.pad_count)
         capsfilter = gst.element_factory_make("capsfilter", "capsfilter-%d" % self.pad_count)
         # configure the capsfilter caps
-        if self.alpha_helper.alpha_count != 0:
-            capsfilter.props.caps = gst.Caps('video/x-raw-yuv,format=(fourcc)AYUV')
-        else:
-            capsfilter.props.caps = gst.Caps('video/x-raw-yuv')
+        capsfilter.props.caps = self.alpha_helper.caps
 
         self.add(csp, capsfilter)
 
@@ -178,9 +200,11 @@ class SmartVideomixerBin(gst.Bin):
 
         pad = gst.GhostPad(name, csp.get_pad("sink"))
         pad.set_active(True)
+        pad.add_event_probe(self._inputEventProbeCb, name)
         self.add_pad(pad)
         self.inputs[name] = (pad, csp, capsfilter, videomixerpad)
         self.pad_count += 1
+        self._updatePassthrough()
         return pad
 
     def do_release_pad(self, pad):
@@ -188,6 +212,10 @@ class SmartVideomixerBin(gst.Bin):
         name = pad.get_name()
         if name in self.inputs.keys():
             sinkpad, csp, capsfilter, videomixerpad = self.inputs.pop(name)
+            self._segments.pop(name, None)
+            if name == self.passthrough_input:
+                sinkpad.set_target(None)
+                self.passthrough_input = None
             self.remove_pad(sinkpad)
             capsfilter.get_pad("src").unlink(videomixerpad)
             self.videomixer.release_request_pad(videomixerpad)
@@ -195,25 +223,139 @@ class SmartVideomixerBin(gst.Bin):
             capsfilter.set_state(gst.STATE_NULL)
             self.remove(csp)
             self.remove(capsfilter)
+            self._updatePassthrough()
         self.debug("done")
 
+    def canPassthrough(self):
+        """
+        Returns whether the output can be the only input, untouched.
+        """
+        return len(self.inputs) == 1 and \
+                not self.alpha_helper.keyframe_alpha_count
+
+    def _getPassthroughInput(self):
+        if self.canPassthrough():
+            return self.inputs.keys()[0]
+        return None
+
+    def _updatePassthrough(self):
+        self._lock.acquire()
+        try:
+            self._unblockInputs()
+            name = self._getPassthroughInput()
+            if name == self.passthrough_input:
+                return
+
+            peers = []
+            for input_name in (self.passthrough_input, name):
+                if input_name is None:
+                    continue
+                peer = self.inputs[input_name][0].get_peer()
+                if peer is not None and peer.is_active():
+                    peers.append(peer)
+
+            if not peers:
+                self._switchPassthrough(name)
+                return
+
+            # data may be flowing, switch once the inputs are blocked
+            self.debug("blocking %d inputs before switching", len(peers))
+            self._blocked_peers = dict((peer, False) for peer in peers)
+            for peer in peers:
+                peer.set_blocked_async(True, self._inputBlockedCb)
+        finally:
+            self._lock.release()
+
+    def _unblockInputs(self):
+        blocked_peers, self._blocked_peers = self._blocked_peers, {}
+        for peer in blocked_peers:
+            peer.set_blocked_async(False, self._inputBlockedCb)
+
+    def _switchPassthrough(self, name):
+        if self.passthrough_input is not None:
+            sinkpad, csp = self.inputs[self.passthrough_input][:2]
+            sinkpad.set_target(csp.get_pad("sink"))
+            self._resendSegment(self.passthrough_input)
+
+        if name is not None:
+            self.debug("passing %s through", name)
+            self.inputs[name][0].set_target(self.passthrough.get_pad("sink"))
+            self.srcpad.set_target(self.passthrough.get_pad("src"))
+            self._resendSegment(name)
+        else:
+            self.debug("mixing %d inputs", len(self.inputs))
+            self.srcpad.set_target(self.csp.get_pad("src"))
+        self.passthrough_input = name
+
+    def _resendSegment(self, name):
+        # the new target hasn't seen the segment of the input yet
+        segment = self._segments.get(name)
+        if segment is not None:
+            target = self.inputs[name][0].get_target()
+            target.send_event(gst.event_new_new_segment_full(*segment))
+
+    def _inputBlockedCb(self, peer, blocked):
+        if not blocked:
+            return
+
+        self._lock.acquire()
+        try:
+            if peer not in self._blocked_peers:
+                # cancelled by a later update
+                return
+            self._blocked_peers[peer] = True
+            if not all(self._blocked_peers.values()):
+                return
+
+            name = self._getPassthroughInput()
+            if name != self.passthrough_input:
+                self._switchPassthrough(name)
+            self._unblockInputs()
+        finally:
+            self._lock.release()
+
+    def _inputEventProbeCb(self, pad, event, name):
+        if event.type == gst.EVENT_NEWSEGMENT:
+            self._segments[name] = event.parse_new_segment_full()
+        elif event.type == gst.EVENT_FLUSH_STOP:
+            self._segments.pop(name, None)
+        return True
+
+    def _alphaStateChangedCb(self, helper):
+        self._updatePassthrough()
+
 class SmartVideomixerBinPropertyHelper(Signallable):
     """A set of callbacks used for considering the alpha state of all track
-       objects in the composition."""
+       objects in the composition.
+
+    Signals:
+     - C{alpha-state-changed} : Whether there are transitions or alpha
+       keyframes in the track changed.
+    """
+
+    __signals__ = {
+        "alpha-state-changed": [],
+    }
 
     def __init__(self, track, inputs):
-        # this import is here because of a circular dependence
-        from pitivi.timeline.track import TrackError
         self.inputs = inputs
-        self.alpha_count = 0
+        # the number of alpha keyframes below 1.0
+        self.keyframe_alpha_count = 0
+        self.transition_count = 0
+        self.caps = None
+        self._state = None
         # connect track-object-{added,removed} signals from track to callbacks
         track.connect("track-object-added", self._trackAddedCb)
         track.connect("track-object-removed", self._trackRemovedCb)
         track.connect("transition-added", self._transitionAddedCb)
         track.connect("transition-removed", self._transitionRemovedCb)
         # configure initial alpha state
-        self.alphaStateChanged(False)
+        self._updateAlphaState()
+
+    def _getAlphaCount(self):
+        return self.keyframe_alpha_count + self.transition_count
 
+    alpha_count = property(_getAlphaCount)
 
     def _trackAddedCb(self, track, track_object):
         # this import is here because of a circular dependence
@@ -242,50 +384,56 @@ class SmartVideomixerBinPropertyHelper(Signallable):
         else:
             # we must decrement alpha_count and update the alpha state as
             # appropriate
-            old_alpha_count = self.alpha_count
             for kf in interpolator.getKeyframes():
                 if interpolator.valueAt(kf.time) < 1.0:
-                    self.alpha_count -= 1
-            # as we're only decrementing, this should be the only case to check
-            if old_alpha_count > 0 and self.alpha_count == 0:
-                self.alphaStateChanged(False)
+                    self.keyframe_alpha_count -= 1
+            self._updateAlphaState()
             interpolator.disconnect_by_func(self._keyframeChangedCb)
 
     def _keyframeChangedCb(self, interpolator, keyframe, old_value=None):
         """Checks the alpha state and emits a signal if it has changed"""
         # FIXME: This code assumes the interpolation mode is linear and as
         # such only considers the alpha values at keyframes
-        old_alpha_count = self.alpha_count
         new_value = interpolator.valueAt(keyframe.time)
         if old_value == 1.0 or old_value is None:
             if new_value < 1.0:
-                self.alpha_count += 1
+                self.keyframe_alpha_count += 1
         elif old_value < 1.0 or old_value is not None:
             if new_value == 1.0:
-                self.alpha_count -= 1
-        if old_alpha_count == 0 and self.alpha_count > 0:
-            self.alphaStateChanged(True)
-        elif old_alpha_count > 0 and self.alpha_count == 0:
-            self.alphaStateChanged(False)
+                self.keyframe_alpha_count -= 1
+        self._updateAlphaState()
 
     def _transitionAddedCb(self, track, transition):
         # FIXME - this assumes transitions need alpha, change it if they don't
-        if self.alpha_count == 0:
-            self.alphaStateChanged(True)
-        self.alpha_count += 1
+        self.transition_count += 1
+        self._updateAlphaState()
 
     def _transitionRemovedCb(self, track, transition):
-        self.alpha_count -= 1
-        if self.alpha_count == 0:
-            self.alphaStateChanged(False)
+        self.transition_count -= 1
+        self._updateAlphaState()
+
+    def _updateAlphaState(self):
+        state = (self.alpha_count > 0, self.keyframe_alpha_count > 0)
+        if state == self._state:
+            return
+
+        old_state = self._state
+        self._state = state
+        if old_state is None or old_state[0] != state[0]:
+            self.alphaStateChanged(state[0])
+        self.emit("alpha-state-changed")
 
     def alphaStateChanged(self, has_alpha):
         """Updates capsfilter caps to reflect the alpha state of composition"""
         caps = gst.Caps('video/x-raw-yuv')
         if has_alpha == True:
             caps[0]["format"] = gst.Fourcc('AYUV')
+        self.caps = caps
         for input in self.inputs.values():
-            input[2].props.caps = caps
+            capsfilter = input[2]
+            # setting the caps makes the element renegotiate
+            if not capsfilter.props.caps.is_equal(caps):
+                capsfilter.props.caps = caps
 
 
 gobject.type_register(SmartVideomixerBin)
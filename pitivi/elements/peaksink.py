@@ -1,8 +1,6 @@
 # PiTiVi , Non-linear video editor
 #
-#       pitivi/elements/arraysink.py
-#
-# Copyright (c) 2005, Edward Hervey <bilboed@bilboed.com>
+#       pitivi/elements/peaksink.py
 #
 # This program is free software; you can redistribute it and/or
 # modify it under the terms of the GNU Lesser General Public
@@ -19,19 +17,18 @@
 # Free Software Foundation, Inc., 59 Temple Place - Suite 330,
 # Boston, MA 02111-1307, USA.
 """
-Stores audio samples in an array for plotting waveforms
+Reduces audio samples to peaks as they are decoded
 """
 
 import gobject
 gobject.threads_init()
 import gst
-import gtk
 import array
 
-class ArraySink(gst.BaseSink):
+class PeakSink(gst.BaseSink):
 
     """
-    Stores audio samples in a numeric array of floats.
+    Feeds mono float samples to a L{PeakPyramid}, without keeping them.
     """
     caps = gst.Caps(
         "audio/x-raw-float, width=(int) 32, "
@@ -49,30 +46,21 @@ class ArraySink(gst.BaseSink):
        ),
     )
 
-    def __init__(self):
+    def __init__(self, pyramid):
         gst.BaseSink.__init__(self)
         self.props.sync = False
-        self.rate = 0
-        self.channels = 0
-        self.duration = 0L
-        self.reset()
-
-    def reset(self):
-        self.samples = array.array('f')
+        self.pyramid = pyramid
 
     def do_set_caps(self, caps):
         if not caps[0].get_name() == "audio/x-raw-float":
             return False
-        self.rate = caps[0]["rate"]
-        self.channels = caps[0]["channels"]
+        self.pyramid.setRate(caps[0]["rate"])
         return True
 
     def do_render(self, buf):
-        self.samples.fromstring(buf)
-        self.duration += buf.duration
+        samples = array.array('f')
+        samples.fromstring(buf)
+        self.pyramid.addSamples(samples)
         return gst.FLOW_OK
 
-    def do_preroll(self, buf):
-        return self.do_render(buf)
-
-gobject.type_register(ArraySink)
+gobject.type_register(PeakSink)
@@ -48,7 +48,7 @@ def factoryFilter(factory):
 
     return False
 
-_factoryCache = CachedFactoryList(factoryFilter)
+_factoryCache = CachedFactoryList(factoryFilter, "decoders")
 
 class SingleDecodeBin(gst.Bin):
     """
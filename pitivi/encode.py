@@ -26,6 +26,7 @@ Encoding-related utilities and classes
 import gobject
 import gst
 import pitivi.log.log as log
+from pitivi.registrycache import registrycache
 from pitivi.factories.base import OperationFactory, SinkFactory
 from pitivi.factories.operation import TransformFactory, get_modifier_for_stream
 
@@ -318,18 +319,37 @@ class CachedEncoderList(object):
             self._buildFactories()
 
     def _buildFactories(self):
-        self._factories = self._registry.get_feature_list(gst.ElementFactory)
-        self._audioEncoders = []
-        self._videoEncoders = []
-        self._muxers = []
-        for fact in self._factories:
+        # only the factory names are cached, looking them up is cheap
+        # compared to walking the whole registry
+        muxers, video_encoders, audio_encoders = \
+                registrycache().get("encoders", self._scanRegistry)
+        self._muxers = self._findFactories(muxers)
+        self._videoEncoders = self._findFactories(video_encoders)
+        self._audioEncoders = self._findFactories(audio_encoders)
+        self._factories = self._muxers + self._videoEncoders + \
+                self._audioEncoders
+
+    def _scanRegistry(self):
+        muxers = []
+        video_encoders = []
+        audio_encoders = []
+        for fact in self._registry.get_feature_list(gst.ElementFactory):
             klist = fact.get_klass().split('/')
             if list_compat(("Codec", "Muxer"), klist):
-                self._muxers.append(fact)
+                muxers.append(fact.get_name())
             elif list_compat(("Codec", "Encoder", "Video"), klist) or list_compat(("Codec", "Encoder", "Image"), klist):
-                self._videoEncoders.append(fact)
+                video_encoders.append(fact.get_name())
             elif list_compat(("Codec", "Encoder", "Audio"), klist):
-                self._audioEncoders.append(fact)
+                audio_encoders.append(fact.get_name())
+        return muxers, video_encoders, audio_encoders
+
+    def _findFactories(self, names):
+        factories = []
+        for name in names:
+            factory = gst.element_factory_find(name)
+            if factory is not None:
+                factories.append(factory)
+        return factories
 
     def available_muxers(self):
         if self._factories is None:
@@ -32,6 +32,45 @@ from pitivi.stream import match_stream_groups, AudioStream, VideoStream, \
         STREAM_MATCH_COMPATIBLE_CAPS
 from pitivi.utils import formatPercent
 
+# factory name => caps of its sink pad template
+_sink_template_caps = {}
+
+def get_sink_template_caps(factory_name):
+    """
+    Returns the caps of the sink pad template of the given element factory,
+    or C{None} if it can't be found.
+    """
+    try:
+        return _sink_template_caps[factory_name]
+    except KeyError:
+        pass
+
+    caps = None
+    factory = gst.element_factory_find(factory_name)
+    if factory is not None:
+        for template in factory.get_static_pad_templates():
+            if template.direction == gst.PAD_SINK:
+                caps = template.get_caps()
+                break
+    _sink_template_caps[factory_name] = caps
+
+    return caps
+
+def caps_accepted_by(caps, factory_names):
+    """
+    Returns whether elements made by each of the given factories accept the
+    given fixed caps as they are, making a converter in front of them useless.
+    """
+    if caps is None or not caps.is_fixed():
+        return False
+
+    for factory_name in factory_names:
+        template_caps = get_sink_template_caps(factory_name)
+        if template_caps is None or not caps.is_subset(template_caps):
+            return False
+
+    return True
+
 # FIXME: define a proper hierarchy
 class ObjectFactoryError(Exception):
     pass
@@ -349,6 +388,8 @@ class SourceFactory(ObjectFactory):
         if hasattr(bin, "volume"):
             # only audio bins have a volume element
             for elt in [bin.aconv, bin.ares, bin.arate, bin.volume]:
+                if elt is None:
+                    continue
                 elt.set_state(gst.STATE_NULL)
                 bin.remove(elt)
             del bin.volume
@@ -357,6 +398,8 @@ class SourceFactory(ObjectFactory):
             del bin.arate
         elif hasattr(bin, "alpha"):
             for elt in [bin.csp, bin.queue, bin.alpha, bin.capsfilter, bin.scale]:
+                if elt is None:
+                    continue
                 elt.set_state(gst.STATE_NULL)
                 bin.remove(elt)
             del bin.queue
@@ -402,13 +445,15 @@ class SourceFactory(ObjectFactory):
             # so state change order doesn't happen in the usual
             # downstream-to-upstream way.
             for element in [topbin.aconv, topbin.ares, topbin.arate, topbin.volume]:
-                element.sync_state_with_parent()
+                if element is not None:
+                    element.sync_state_with_parent()
 
-            pad.link(topbin.aconv.get_pad("sink"))
+            pad.link(self._getAudioSinkElement(topbin).get_pad("sink"))
             topbin.ghostpad = gst.GhostPad("src", topbin.volume.get_pad("src"))
         elif hasattr(topbin, "alpha"):
             for element in [topbin.queue, topbin.scale, topbin.csp, topbin.alpha, topbin.capsfilter]:
-                element.sync_state_with_parent()
+                if element is not None:
+                    element.sync_state_with_parent()
 
             pad.link(topbin.queue.get_pad("sink"))
             topbin.ghostpad = gst.GhostPad("src", topbin.capsfilter.get_pad("src"))
@@ -432,7 +477,7 @@ class SourceFactory(ObjectFactory):
             del topbin.ghostpad
 
         if hasattr(topbin, "volume"):
-            pad.unlink(topbin.aconv.get_pad("sink"))
+            pad.unlink(self._getAudioSinkElement(topbin).get_pad("sink"))
         elif hasattr(topbin, "alpha"):
             pad.unlink(topbin.queue.get_pad("sink"))
 
@@ -467,20 +512,26 @@ class SourceFactory(ObjectFactory):
         video_bin.queue.props.max_size_buffers = 3
 
         # all video needs to be AYUV, but the colorspace conversion
-        # element depends on the input. if there is no alpha we need to
-        # add ffmpegcolorspace. if we have an argb or rgba stream, we need
-        # alphacolor to preserve the alpha channel (ffmpeg clobbers it).
-        # if we have an ayuv stream we don't want any colorspace
-        # converter.
-
-        if not output_stream.has_alpha():
+        # element depends on the input. if videoscale and alpha handle the
+        # input format as it is, no converter is needed. otherwise if there
+        # is no alpha we need to add ffmpegcolorspace. if we have an argb or
+        # rgba stream, we need alphacolor to preserve the alpha channel
+        # (ffmpeg clobbers it). if we have an ayuv stream we don't want any
+        # colorspace converter.
+        # alpha and videoscale don't touch the frames when they have nothing
+        # to do, so they don't need to be removed from the chain.
+
+        if child_bin is None and \
+                caps_accepted_by(output_stream.caps, ["videoscale", "alpha"]):
+            video_bin.csp = None
+        elif not output_stream.has_alpha():
             video_bin.csp = gst.element_factory_make("ffmpegcolorspace",
                 "internal-colorspace")
         elif output_stream.videotype == 'video/x-raw-rgb':
             video_bin.csp = gst.element_factory_make("alphacolor",
                 "internal-alphacolor")
         else:
-            video_bin.csp = gst.element_factory_make("identity")
+            video_bin.csp = None
 
         video_bin.alpha = gst.element_factory_make("alpha", "internal-alpha")
         video_bin.alpha.props.prefer_passthrough = True
@@ -494,9 +545,15 @@ class SourceFactory(ObjectFactory):
                 "capsfilter-proj-settings")
         self.setFilterCaps(self._filtercaps, video_bin)
 
-        video_bin.add(video_bin.queue, video_bin.scale, video_bin.csp,
-                video_bin.alpha, video_bin.capsfilter)
-        gst.element_link_many(video_bin.queue, video_bin.csp, video_bin.scale)
+        video_bin.add(video_bin.queue, video_bin.scale, video_bin.alpha,
+                video_bin.capsfilter)
+        if video_bin.csp is not None:
+            video_bin.add(video_bin.csp)
+            gst.element_link_many(video_bin.queue, video_bin.csp,
+                    video_bin.scale)
+        else:
+            self.debug("%s needs no colorspace conversion", output_stream)
+            video_bin.queue.link(video_bin.scale)
         if child_bin is not None:
             gst.element_link_many(video_bin.scale, video_bin.child,
                     video_bin.alpha, video_bin.capsfilter)
@@ -508,30 +565,47 @@ class SourceFactory(ObjectFactory):
         video_bin.capsfilter.sync_state_with_parent()
         video_bin.scale.sync_state_with_parent()
         video_bin.queue.sync_state_with_parent()
-        video_bin.csp.sync_state_with_parent()
+        if video_bin.csp is not None:
+            video_bin.csp.sync_state_with_parent()
         video_bin.alpha.sync_state_with_parent()
 
     def _addCommonAudioElements(self, audio_bin, output_stream):
         self.debug("Adding volume element")
         # add a volume element
-        audio_bin.aconv = gst.element_factory_make("audioconvert", "internal-aconv")
+        # audioconvert is only needed if the other elements can't handle the
+        # sample format. audioresample and volume don't touch the samples
+        # when they have nothing to do.
+        if caps_accepted_by(output_stream.caps,
+                ["audioresample", "audiorate", "volume"]):
+            self.debug("%s needs no audio conversion", output_stream)
+            audio_bin.aconv = None
+        else:
+            audio_bin.aconv = gst.element_factory_make("audioconvert", "internal-aconv")
         audio_bin.ares = gst.element_factory_make("audioresample", "internal-audioresample")
         # Fix audio jitter of up to 40ms
         audio_bin.arate = gst.element_factory_make("audiorate", "internal-audiorate")
         audio_bin.arate.props.tolerance = 40 * gst.MSECOND
         audio_bin.volume = gst.element_factory_make("volume", "internal-volume")
-        audio_bin.add(audio_bin.volume, audio_bin.ares, audio_bin.aconv, audio_bin.arate)
+        audio_bin.add(audio_bin.volume, audio_bin.ares, audio_bin.arate)
         #if child_bin:
         #    gst.element_link_many(audio_bin.aconv, audio_bin.ares, audio_bin.arate, audio_bin.child, audio_bin.volume)
         #    audio_bin.child.sync_state_with_parent()
         #else:
-        gst.element_link_many(audio_bin.aconv, audio_bin.ares, audio_bin.arate, audio_bin.volume)
+        gst.element_link_many(audio_bin.ares, audio_bin.arate, audio_bin.volume)
+        if audio_bin.aconv is not None:
+            audio_bin.add(audio_bin.aconv)
+            audio_bin.aconv.link(audio_bin.ares)
+            audio_bin.aconv.sync_state_with_parent()
 
-        audio_bin.aconv.sync_state_with_parent()
         audio_bin.ares.sync_state_with_parent()
         audio_bin.arate.sync_state_with_parent()
         audio_bin.volume.sync_state_with_parent()
 
+    def _getAudioSinkElement(self, audio_bin):
+        if audio_bin.aconv is not None:
+            return audio_bin.aconv
+        return audio_bin.ares
+
 class SinkFactory(ObjectFactory):
     """
     Base class for factories that consume input and have no output.
@@ -27,6 +27,7 @@ import os
 from pitivi.factories.base import RandomAccessSourceFactory, \
         SinkFactory
 from pitivi.stream import MultimediaStream, AudioStream, VideoStream
+from pitivi.imagecache import ImageCache
 
 class FileSourceFactory(RandomAccessSourceFactory):
     """
@@ -45,12 +46,19 @@ class PictureFileSourceFactory(FileSourceFactory):
     """
     Factory for image sources.
 
+    Once decoded and scaled, the image is kept in L{image_cache} and the
+    next bins are fed from there.
+
     @see: L{FileSourceFactory}, L{RandomAccessSourceFactory}.
     """
 
     duration = 3600 * gst.SECOND
     default_duration = 5 * gst.SECOND
 
+    # shared by all the pictures, make this an attribute to inject it from
+    # tests
+    image_cache = ImageCache()
+
     def _makeDefaultBin(self):
         return self._makeStreamBin(self.output_streams[0])
 
@@ -58,14 +66,58 @@ class PictureFileSourceFactory(FileSourceFactory):
         self.debug("making picture bin for %s", self.name)
         freeze = gst.element_factory_make("imagefreeze")
 
+        cache = isinstance(output_stream, VideoStream) and \
+                self.image_cache.max_size
+        if cache:
+            buf = self.image_cache.lookup(self.uri,
+                    self._filtercaps.to_string())
+            if buf is not None:
+                self.debug("Feeding %r from the image cache", freeze)
+                return self._makeCachedStreamBin(output_stream, freeze, buf)
+
         self.debug("Chaining up with %r", freeze)
 
         ret = FileSourceFactory._makeStreamBin(self, output_stream,
             freeze)
+        if cache:
+            # the frame going into imagefreeze is decoded and scaled
+            ret.image_probe = ret.scale.get_pad("src").add_buffer_probe(
+                    self._imageBufferProbeCb)
         self.debug("Returning %r", ret)
 
         return ret
 
+    def _makeCachedStreamBin(self, output_stream, freeze, buf):
+        bin = gst.Bin()
+        bin.appsrc = gst.element_factory_make("appsrc")
+        bin.appsrc.props.caps = buf.caps
+        bin.add(bin.appsrc)
+        self._addCommonVideoElements(bin, output_stream, freeze)
+        bin.appsrc.link(bin.queue)
+        bin.appsrc.sync_state_with_parent()
+        # imagefreeze handles seeks by itself, it never needs another frame
+        bin.appsrc.emit("push-buffer", buf)
+        bin.appsrc.emit("end-of-stream")
+
+        bin.ghostpad = gst.GhostPad("src", bin.capsfilter.get_pad("src"))
+        bin.ghostpad.set_active(True)
+        bin.add_pad(bin.ghostpad)
+        return bin
+
+    def _releaseBin(self, bin):
+        if hasattr(bin, "image_probe"):
+            bin.scale.get_pad("src").remove_buffer_probe(bin.image_probe)
+            del bin.image_probe
+        if hasattr(bin, "appsrc"):
+            bin.appsrc.set_state(gst.STATE_NULL)
+            bin.remove(bin.appsrc)
+            del bin.appsrc
+        FileSourceFactory._releaseBin(self, bin)
+
+    def _imageBufferProbeCb(self, pad, buf):
+        self.image_cache.add(self.uri, self._filtercaps.to_string(), buf)
+        return True
+
 class URISinkFactory(SinkFactory):
     """ A simple sink factory """
 
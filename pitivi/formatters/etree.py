@@ -548,6 +548,10 @@ class ElementTreeFormatter(Formatter):
         stream = self._loadStream(stream_element)
 
         track = Track(stream)
+        # the timeline enables updates once everything is loaded, so that
+        # default sources and transitions are computed once instead of after
+        # every object
+        track.disableUpdates()
 
         track_objects_element  = element.find("track-objects")
         for track_object_element in track_objects_element:
@@ -646,12 +650,17 @@ class ElementTreeFormatter(Formatter):
         for track in tracks:
             timeline.addTrack(track)
 
-        # add the timeline objects
-        for timeline_object in timeline_objects:
-            # NOTE: this is a low-level routine that simply appends the
-            # timeline object to the timeline list. It doesn't ensure all the
-            # child track objects have been added to their respective tracks.
-            timeline.addTimelineObject(timeline_object)
+        timeline.disableUpdates()
+        try:
+            # add the timeline objects
+            for timeline_object in timeline_objects:
+                # NOTE: this is a low-level routine that simply appends the
+                # timeline object to the timeline list. It doesn't ensure all
+                # the child track objects have been added to their respective
+                # tracks.
+                timeline.addTimelineObject(timeline_object)
+        finally:
+            timeline.enableUpdates()
 
         return timeline
 
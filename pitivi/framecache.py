@@ -0,0 +1,427 @@
+# PiTiVi , Non-linear video editor
+#
+#       pitivi/framecache.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Cache of the composited frames of a timeline, by position
+"""
+
+from bisect import bisect_left, bisect_right
+from threading import Lock
+
+import gst
+
+from pitivi.signalinterface import Signallable
+from pitivi.log.loggable import Loggable
+from pitivi.timeline.track import TrackEffect
+
+
+class Frame(object):
+    """
+    A frame of the timeline, as packed 24 bits RGB.
+
+    @ivar position: The timeline position of the frame.
+    @ivar duration: The time the frame is shown.
+    """
+
+    def __init__(self, position, duration, width, height, data):
+        self.position = position
+        self.duration = duration
+        self.width = width
+        self.height = height
+        self.rowstride = (width * 3 + 3) & ~3
+        self.data = data
+
+    def getSize(self):
+        return len(self.data)
+
+    def covers(self, position):
+        return self.position <= position < self.position + self.duration
+
+
+class FrameCache(Signallable, Loggable):
+    """
+    A bounded cache of the frames output by the timeline, so that going back
+    to them doesn't need the pipeline.
+
+    When the cache is full, the frames farthest from the playhead, the last
+    position looked up or added, are evicted first.
+
+    Edits only invalidate the time range they change. Every invalidation
+    increases L{generation}; L{add} drops the frames decoded before it, which
+    may reach the cache afterwards.
+
+    Signals:
+     - C{invalidated} : The frames between the given positions were removed.
+
+    @ivar max_size: The maximum size of the frames kept, in bytes.
+    @ivar generation: The edit generation of the timeline.
+    """
+
+    __signals__ = {
+        "invalidated": ["start", "stop"],
+    }
+
+    def __init__(self, max_size=64 * 1024 * 1024):
+        Loggable.__init__(self)
+        self.max_size = max_size
+        self.size = 0
+        self.generation = 0
+        self.playhead = 0
+        self.hits = 0
+        self.misses = 0
+        self.timeline = None
+        self._lock = Lock()
+        self._positions = []
+        self._frames = {}
+        self._updates_disabled = False
+        # track object => (start, duration) when last seen
+        self._ranges = {}
+        self._interpolators = {}
+        self._effect_handlers = {}
+
+    def setMaxSize(self, max_size):
+        self._lock.acquire()
+        try:
+            self.max_size = max_size
+            self._evict()
+        finally:
+            self._lock.release()
+
+    def add(self, frame, generation):
+        """
+        Add a frame.
+
+        @param frame: The frame.
+        @type frame: L{Frame}
+        @param generation: The L{generation} the frame was decoded in.
+        @type generation: C{int}
+        @return: Whether the frame was kept.
+        @rtype: C{bool}
+        """
+        self._lock.acquire()
+        try:
+            if generation != self.generation or self._updates_disabled \
+                    or frame.getSize() > self.max_size:
+                return False
+
+            self.playhead = frame.position
+            if frame.position in self._frames:
+                self._remove(frame.position)
+            self._positions.insert(bisect_left(self._positions,
+                    frame.position), frame.position)
+            self._frames[frame.position] = frame
+            self.size += frame.getSize()
+            self._evict()
+        finally:
+            self._lock.release()
+
+        return True
+
+    def lookup(self, position):
+        """
+        @return: The frame shown at the given position, or C{None} if it's not
+        cached.
+        @rtype: L{Frame}
+        """
+        self._lock.acquire()
+        try:
+            self.playhead = position
+            index = bisect_right(self._positions, position) - 1
+            if index >= 0:
+                frame = self._frames[self._positions[index]]
+                if frame.covers(position):
+                    self.hits += 1
+                    return frame
+
+            self.misses += 1
+            return None
+        finally:
+            self._lock.release()
+
+    def invalidate(self, start, stop):
+        """
+        Remove the frames between C{start} and C{stop}.
+        """
+        self.log("invalidating %s - %s", gst.TIME_ARGS(start),
+                gst.TIME_ARGS(stop))
+        self._lock.acquire()
+        try:
+            self.generation += 1
+            # frames start before the ones they overlap with, the frame just
+            # before start may reach into the range
+            index = max(0, bisect_left(self._positions, start) - 1)
+            end = bisect_left(self._positions, stop)
+            for position in self._positions[index:end]:
+                frame = self._frames[position]
+                if frame.position + frame.duration > start:
+                    self._remove(position)
+        finally:
+            self._lock.release()
+
+        self.emit("invalidated", start, stop)
+
+    def clear(self):
+        self.invalidate(0, gst.CLOCK_TIME_NONE)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _remove(self, position):
+        frame = self._frames.pop(position)
+        del self._positions[bisect_left(self._positions, position)]
+        self.size -= frame.getSize()
+
+    def _evict(self):
+        while self.size > self.max_size:
+            first = self._positions[0]
+            last = self._positions[-1]
+            if abs(self.playhead - first) > abs(last - self.playhead):
+                self._remove(first)
+            else:
+                self._remove(last)
+
+    ## timeline edits
+
+    def connectToTimeline(self, timeline):
+        """
+        Invalidate the frames changed by the edits of C{timeline}.
+        """
+        self.timeline = timeline
+        timeline.connect("track-added", self._timelineTrackAddedCb)
+        timeline.connect("track-removed", self._timelineTrackRemovedCb)
+        timeline.connect("disable-updates", self._timelineDisableUpdatesCb)
+        for track in timeline.tracks:
+            self._connectToTrack(track)
+
+    def disconnectFromTimeline(self):
+        timeline, self.timeline = self.timeline, None
+        if timeline is None:
+            return
+
+        timeline.disconnect_by_function(self._timelineTrackAddedCb)
+        timeline.disconnect_by_function(self._timelineTrackRemovedCb)
+        timeline.disconnect_by_function(self._timelineDisableUpdatesCb)
+        for track in timeline.tracks:
+            self._disconnectFromTrack(track)
+
+    def _invalidateTrackObject(self, track_object):
+        start, duration = self._ranges[track_object]
+        self.invalidate(start, start + duration)
+
+    def _connectToTrack(self, track):
+        track.connect("track-object-added", self._trackObjectAddedCb)
+        track.connect("track-object-removed", self._trackObjectRemovedCb)
+        track.connect("transition-added", self._transitionCb)
+        track.connect("transition-removed", self._transitionCb)
+        for track_object in track.track_objects:
+            self._connectToTrackObject(track_object)
+
+    def _disconnectFromTrack(self, track):
+        track.disconnect_by_function(self._trackObjectAddedCb)
+        track.disconnect_by_function(self._trackObjectRemovedCb)
+        track.disconnect_by_function(self._transitionCb)
+        for track_object in track.track_objects:
+            self._disconnectFromTrackObject(track_object)
+
+    def _connectToTrackObject(self, track_object):
+        self._ranges[track_object] = (track_object.start,
+                track_object.duration)
+        track_object.connect("start-changed", self._trackObjectMovedCb)
+        track_object.connect("duration-changed", self._trackObjectMovedCb)
+        track_object.connect("in-point-changed", self._trackObjectChangedCb)
+        track_object.connect("priority-changed", self._trackObjectChangedCb)
+        track_object.connect("active-changed", self._trackObjectChangedCb)
+        track_object.connect("interpolators-changed",
+                self._trackObjectInterpolatorsChangedCb)
+        self._connectToInterpolators(track_object)
+
+        if isinstance(track_object, TrackEffect):
+            try:
+                element = track_object.getElement()
+            except IndexError:
+                # the bin isn't made yet
+                element = None
+            if element is not None:
+                self._effect_handlers[track_object] = (element,
+                        element.connect("notify", self._effectNotifyCb,
+                        track_object))
+
+    def _disconnectFromTrackObject(self, track_object):
+        del self._ranges[track_object]
+        track_object.disconnect_by_function(self._trackObjectMovedCb)
+        track_object.disconnect_by_function(self._trackObjectChangedCb)
+        track_object.disconnect_by_function(
+                self._trackObjectInterpolatorsChangedCb)
+        self._disconnectFromInterpolators(track_object)
+
+        element, handler_id = self._effect_handlers.pop(track_object,
+                (None, None))
+        if element is not None:
+            element.disconnect(handler_id)
+
+    def _connectToInterpolators(self, track_object):
+        interpolators = [interpolator for unused_property, interpolator
+                in track_object.interpolators.itervalues()]
+        for interpolator in interpolators:
+            interpolator.connect("keyframe-added", self._keyframeChangedCb)
+            interpolator.connect("keyframe-removed", self._keyframeChangedCb)
+            interpolator.connect("keyframe-moved", self._keyframeChangedCb)
+        self._interpolators[track_object] = interpolators
+
+    def _disconnectFromInterpolators(self, track_object):
+        for interpolator in self._interpolators.pop(track_object, []):
+            interpolator.disconnect_by_function(self._keyframeChangedCb)
+
+    def _timelineTrackAddedCb(self, timeline, track):
+        self._connectToTrack(track)
+        self.clear()
+
+    def _timelineTrackRemovedCb(self, timeline, track):
+        self._disconnectFromTrack(track)
+        self.clear()
+
+    def _timelineDisableUpdatesCb(self, timeline, disabled):
+        self._lock.acquire()
+        try:
+            self._updates_disabled = disabled
+            if not disabled:
+                # the compositions only now catch up with the edits
+                self.generation += 1
+        finally:
+            self._lock.release()
+
+    def _trackObjectAddedCb(self, track, track_object):
+        self._connectToTrackObject(track_object)
+        self._invalidateTrackObject(track_object)
+
+    def _trackObjectRemovedCb(self, track, track_object):
+        self._invalidateTrackObject(track_object)
+        self._disconnectFromTrackObject(track_object)
+
+    def _transitionCb(self, track, transition):
+        self.invalidate(transition.start,
+                transition.start + transition.duration)
+
+    def _trackObjectMovedCb(self, track_object, unused_value):
+        self._invalidateTrackObject(track_object)
+        self._ranges[track_object] = (track_object.start,
+                track_object.duration)
+        self._invalidateTrackObject(track_object)
+
+    def _trackObjectChangedCb(self, track_object, unused_value):
+        self._invalidateTrackObject(track_object)
+
+    def _trackObjectInterpolatorsChangedCb(self, track_object):
+        self._disconnectFromInterpolators(track_object)
+        self._connectToInterpolators(track_object)
+
+    def _keyframeChangedCb(self, interpolator, keyframe, old_value=None):
+        self._invalidateTrackObject(interpolator.trackobject)
+
+    def _effectNotifyCb(self, element, pspec, track_object):
+        self._invalidateTrackObject(track_object)
+
+
+class FrameCapture(Loggable):
+    """
+    Feeds a L{FrameCache} with the frames going through a sink bin.
+
+    The frames are converted in their own thread, the ones the conversion
+    can't keep up with during playback are dropped.
+    """
+
+    caps = gst.Caps("video/x-raw-rgb, bpp=(int)24, depth=(int)24, "
+            "endianness=(int)4321, red_mask=(int)0xff0000, "
+            "green_mask=(int)0x00ff00, blue_mask=(int)0x0000ff")
+
+    def __init__(self, cache):
+        Loggable.__init__(self)
+        self.cache = cache
+        # (start, position) of the current segment
+        self._segment = None
+        # the cache generation when the segment started
+        self._generation = None
+
+    def makeBin(self):
+        """
+        @return: A bin with a C{sink} pad, to link to a tee in front of the
+        video sink.
+        @rtype: C{gst.Bin}
+        """
+        bin = gst.Bin("frame-capture")
+        queue = gst.element_factory_make("queue", "frame-capture-queue")
+        queue.props.leaky = 2
+        queue.props.max_size_buffers = 1
+        queue.props.max_size_bytes = 0
+        queue.props.max_size_time = 0
+        csp = gst.element_factory_make("ffmpegcolorspace",
+                "frame-capture-csp")
+        sink = gst.element_factory_make("fakesink", "frame-capture-sink")
+        sink.props.sync = False
+        # don't hold the preroll of the pipeline
+        sink.props.async = False
+        bin.add(queue, csp, sink)
+        queue.link(csp)
+        csp.link(sink, self.caps)
+
+        pad = sink.get_pad("sink")
+        pad.add_event_probe(self._eventProbeCb)
+        pad.add_buffer_probe(self._bufferProbeCb)
+        bin.add_pad(gst.GhostPad("sink", queue.get_pad("sink")))
+
+        return bin
+
+    def _eventProbeCb(self, pad, event):
+        if event.type == gst.EVENT_FLUSH_START:
+            self._segment = None
+        elif event.type == gst.EVENT_NEWSEGMENT:
+            update, rate, format, start, stop, position = \
+                    event.parse_new_segment()
+            if format != gst.FORMAT_TIME or rate != 1.0:
+                self._segment = None
+            else:
+                self._segment = (start, position)
+                if not update:
+                    self._generation = self.cache.generation
+
+        return True
+
+    def _bufferProbeCb(self, pad, buffer):
+        segment = self._segment
+        if segment is None or buffer.caps is None or \
+                buffer.timestamp == gst.CLOCK_TIME_NONE:
+            return True
+
+        start, position = segment
+        if buffer.timestamp < start:
+            return True
+
+        structure = buffer.caps[0]
+        duration = buffer.duration
+        if duration == gst.CLOCK_TIME_NONE:
+            framerate = structure["framerate"]
+            if not framerate.num:
+                return True
+            duration = gst.SECOND * framerate.denom / framerate.num
+
+        frame = Frame(buffer.timestamp - start + position, duration,
+                structure["width"], structure["height"], buffer.data)
+        self.cache.add(frame, self._generation)
+
+        return True
@@ -0,0 +1,127 @@
+# PiTiVi , Non-linear video editor
+#
+#       pitivi/imagecache.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Cache of decoded still images, ready to be shown at the project size
+"""
+
+import collections
+from threading import Lock
+
+from pitivi.log.loggable import Loggable
+
+
+class ImageCache(Loggable):
+    """
+    Decoded and scaled frames of still images, by URI and output caps, so
+    that the bins of a picture only decode its file once.
+
+    The least recently used images are evicted first when the frames take
+    more than L{max_size} bytes. Images are added from streaming threads.
+
+    @ivar max_size: The maximum size of the frames kept, in bytes. 0
+    disables the cache.
+    @ivar size: The size of the frames kept, in bytes.
+    """
+
+    def __init__(self, max_size=128 * 1024 * 1024):
+        Loggable.__init__(self)
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._queue = collections.deque()
+        self._buffers = {}
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def setMaxSize(self, max_size):
+        self._lock.acquire()
+        try:
+            self.max_size = max_size
+            self._evict()
+        finally:
+            self._lock.release()
+
+    def lookup(self, uri, caps):
+        """
+        Get the frame of C{uri} when output with C{caps}.
+
+        @type caps: C{str}
+        @return: The frame, or C{None} if it isn't cached.
+        @rtype: C{gst.Buffer}
+        """
+        key = uri, caps
+        self._lock.acquire()
+        try:
+            buf = self._buffers.get(key)
+            if buf is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._queue.remove(key)
+            self._queue.append(key)
+            return buf
+        finally:
+            self._lock.release()
+
+    def add(self, uri, caps, buf):
+        """
+        Keep the frame of C{uri} output with C{caps}.
+
+        @type caps: C{str}
+        @type buf: C{gst.Buffer}
+        @return: Whether the frame was kept.
+        @rtype: C{bool}
+        """
+        key = uri, caps
+        self._lock.acquire()
+        try:
+            if buf.size > self.max_size:
+                return False
+            if key in self._buffers:
+                self._remove(key)
+            self._buffers[key] = buf
+            self._queue.append(key)
+            self.size += buf.size
+            self._evict()
+            return True
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._queue.clear()
+            self._buffers.clear()
+            self.size = 0
+        finally:
+            self._lock.release()
+
+    def _remove(self, key):
+        self._queue.remove(key)
+        self.size -= self._buffers.pop(key).size
+
+    def _evict(self):
+        while self.size > self.max_size:
+            key = self._queue.popleft()
+            self.debug("evicting %s", key[0])
+            self.size -= self._buffers.pop(key).size
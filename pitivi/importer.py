@@ -0,0 +1,294 @@
+# PiTiVi , Non-linear video editor
+#
+#       pitivi/importer.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Folder import: finds the media files in a set of folders
+"""
+
+import os
+import threading
+from urllib import quote, unquote
+
+import gobject
+
+from pitivi.signalinterface import Signallable
+from pitivi.log.loggable import Loggable
+from pitivi.threads import CallbackJob, BULK
+
+# files with these extensions are imported without looking at them
+MEDIA_EXTENSIONS = frozenset([
+    "3g2", "3gp", "aac", "ac3", "aif", "aiff", "amr", "asf", "au", "avi",
+    "bmp", "dv", "flac", "flv", "gif", "jpeg", "jpg", "m2t", "m2ts", "m2v",
+    "m4a", "m4v", "mka", "mkv", "mod", "mov", "mp2", "mp3", "mp4", "mpe",
+    "mpeg", "mpg", "mts", "mxf", "nut", "oga", "ogg", "ogv", "ogx", "png",
+    "qt", "rm", "rmvb", "spx", "svg", "tif", "tiff", "tod", "ts", "vob",
+    "wav", "webm", "wma", "wmv", "y4m"])
+
+# files with these extensions are never imported
+NON_MEDIA_EXTENSIONS = frozenset([
+    "7z", "a", "bak", "bz2", "c", "cfg", "conf", "cpp", "css", "csv", "cue",
+    "db", "dll", "doc", "docx", "exe", "gz", "h", "htm", "html", "idx",
+    "ini", "iso", "js", "json", "lnk", "log", "m3u", "md", "nfo", "o", "odp",
+    "ods", "odt", "part", "pdf", "pls", "ppt", "pptx", "ptv", "py", "pyc",
+    "rar", "rtf", "sh", "so", "srt", "sub", "tar", "thm", "tmp", "torrent",
+    "txt", "xls", "xlsx", "xml", "xmp", "xptv", "xz", "zip"])
+
+# (offset, bytes) signatures of container and image formats
+MEDIA_MAGIC = [
+    (0, "RIFF"), (0, "OggS"), (0, "\x1a\x45\xdf\xa3"), (0, "ID3"),
+    (0, "fLaC"), (0, "FLV"), (0, "FORM"), (0, ".snd"), (0, "#!AMR"),
+    (0, ".RMF"), (0, "\x00\x00\x01\xba"), (0, "\x00\x00\x01\xb3"),
+    (0, "\x30\x26\xb2\x75\x8e\x66\xcf\x11"), (0, "\x06\x0e\x2b\x34"),
+    (0, "\xff\xd8\xff"), (0, "\x89PNG"), (0, "GIF8"), (0, "BM"),
+    (0, "II*\x00"), (0, "MM\x00*"),
+    (4, "ftyp"), (4, "moov"), (4, "mdat"), (4, "wide"), (4, "free"),
+    (4, "skip"), (4, "pnot")]
+
+# (offset, bytes) signatures of common formats GStreamer can't import
+NON_MEDIA_MAGIC = [
+    (0, "%PDF"), (0, "PK\x03\x04"), (0, "\x7fELF"), (0, "MZ"), (0, "<?xml"),
+    (0, "<!DOCTYPE"), (0, "<html"), (0, "\x1f\x8b"), (0, "BZh"),
+    (0, "7z\xbc\xaf"), (0, "Rar!"), (0, "#!")]
+
+MAGIC_SIZE = 200
+TS_PACKET_SIZE = 188
+TEXT_CHARACTERS = frozenset([chr(c) for c in range(32, 127)] +
+        ["\t", "\n", "\r", "\f"])
+
+
+def path_to_uri(path):
+    return "file://" + quote(path)
+
+
+def _match_magic(header, signatures):
+    for offset, magic in signatures:
+        if header[offset:offset + len(magic)] == magic:
+            return True
+    return False
+
+
+def is_media_header(header):
+    """
+    Looks at the first bytes of a file to guess whether it can be a media
+    file. Unknown formats are accepted, only files that are obviously
+    something else are rejected.
+
+    @param header: The first bytes of the file.
+    @type header: C{str}
+    @returns: C{False} if the file is known not to be a media file.
+    """
+    if not header:
+        return False
+
+    if _match_magic(header, MEDIA_MAGIC):
+        return True
+
+    # MPEG transport streams, with and without the timecode prefix
+    for start in (0, 4):
+        if header[start:start + 1] == "\x47" and \
+                header[start + TS_PACKET_SIZE:start + TS_PACKET_SIZE + 1] == "\x47":
+            return True
+
+    # MPEG audio frame sync
+    if header[0] == "\xff" and len(header) > 1 and \
+            ord(header[1]) & 0xe0 == 0xe0:
+        return True
+
+    if _match_magic(header, NON_MEDIA_MAGIC):
+        return False
+
+    # plain text
+    for character in header:
+        if character not in TEXT_CHARACTERS:
+            return True
+
+    return False
+
+
+def is_media_file(path):
+    """
+    Cheap check run before handing a file over to the discoverer. It only
+    reads the first bytes of the file when the extension is unknown.
+
+    @param path: The path of the file.
+    @type path: C{str}
+    @returns: C{False} if the file is known not to be a media file.
+    """
+    filename = os.path.basename(path)
+    if filename.startswith("."):
+        return False
+
+    extension = os.path.splitext(filename)[1][1:].lower()
+    if extension in MEDIA_EXTENSIONS:
+        return True
+    if extension in NON_MEDIA_EXTENSIONS:
+        return False
+
+    try:
+        media_file = open(path, "rb")
+        try:
+            header = media_file.read(MAGIC_SIZE)
+        finally:
+            media_file.close()
+    except IOError:
+        return False
+
+    return is_media_header(header)
+
+
+class FolderImporter(Signallable, Loggable):
+    """
+    Recursively searches a list of folders for media files.
+
+    Each folder is listed by a C{BULK} job of the given L{JobExecutor}, so
+    that several folders are listed concurrently, and files that are
+    obviously not media files are filtered out with L{is_media_file}. The
+    URIs that are found are handed back to the main loop in batches.
+
+    Signals:
+     - C{uris-found} : A batch of media file URIs was found.
+     - C{done} : The search is over, or was aborted.
+    """
+
+    __signals__ = {
+        "uris-found": ["uris"],
+        "done": [],
+    }
+
+    def __init__(self, folders, executor, batch_interval=100):
+        """
+        @param folders: The folders to import, as paths or file:// URIs.
+        @type folders: C{list} of C{str}
+        @param executor: The executor running the jobs listing folders.
+        @type executor: L{JobExecutor}
+        @param batch_interval: The time in milliseconds during which found
+        URIs are accumulated before being handed back to the main loop.
+        @type batch_interval: C{int}
+        """
+        Loggable.__init__(self)
+        self.folders = folders
+        self.executor = executor
+        self.batch_interval = batch_interval
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._batch = []
+        self._flush_scheduled = False
+        self._finished = False
+        self._aborted = threading.Event()
+
+    def start(self):
+        # hold a reference so that we can't finish before all the folders
+        # are queued
+        self._lock.acquire()
+        self._pending += 1
+        self._lock.release()
+
+        for folder in self.folders:
+            if folder.startswith("file://"):
+                folder = unquote(folder[len("file://"):])
+            self._addFolder(folder)
+
+        self._folderDone()
+
+    def abort(self):
+        """ Stop the search. C{done} is emitted anyway. """
+        self._aborted.set()
+
+    def _addFolder(self, folder):
+        self._lock.acquire()
+        self._pending += 1
+        self._lock.release()
+        self.executor.submit(CallbackJob(self._listFolderJob, folder,
+                priority=BULK))
+
+    def _folderDone(self):
+        self._lock.acquire()
+        self._pending -= 1
+        finished = not self._pending
+        self._lock.release()
+
+        if finished:
+            self._finish()
+
+    def _listFolderJob(self, folder):
+        # runs in a worker thread
+        try:
+            if not self._aborted.isSet():
+                self._listFolder(folder)
+        finally:
+            self._folderDone()
+
+    def _listFolder(self, folder):
+        self.log("folder %s", folder)
+        try:
+            names = os.listdir(folder)
+        except OSError, e:
+            self.warning("couldn't list %s: %s", folder, e)
+            return
+
+        names.sort()
+        uris = []
+        for name in names:
+            if self._aborted.isSet():
+                break
+
+            path = os.path.join(folder, name)
+            if os.path.isdir(path):
+                # don't follow links, they may loop
+                if not os.path.islink(path):
+                    self._addFolder(path)
+            elif is_media_file(path):
+                uris.append(path_to_uri(path))
+
+        if uris:
+            self._lock.acquire()
+            self._batch.extend(uris)
+            schedule = not self._flush_scheduled
+            self._flush_scheduled = True
+            self._lock.release()
+
+            if schedule:
+                gobject.timeout_add(self.batch_interval, self._flushCb)
+
+    def _finish(self):
+        self._lock.acquire()
+        self._finished = True
+        schedule = not self._flush_scheduled
+        self._flush_scheduled = True
+        self._lock.release()
+
+        if schedule:
+            gobject.idle_add(self._flushCb)
+
+    def _flushCb(self):
+        # runs in the main loop
+        self._lock.acquire()
+        uris = self._batch
+        self._batch = []
+        self._flush_scheduled = False
+        finished = self._finished
+        self._lock.release()
+
+        if uris and not self._aborted.isSet():
+            self.emit("uris-found", uris)
+
+        if finished:
+            self.emit("done")
+
+        return False
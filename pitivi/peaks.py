@@ -0,0 +1,319 @@
+# PiTiVi , Non-linear video editor
+#
+#       pitivi/peaks.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Waveform peaks of whole audio streams, extracted in a single pass
+"""
+
+import array
+import math
+import threading
+
+import gobject
+import gst
+
+from pitivi.signalinterface import Signallable
+from pitivi.log.loggable import Loggable
+from pitivi.elements.peaksink import PeakSink
+import pitivi.utils as utils
+
+# the finest level has one peak per millisecond, which is what the timeline
+# shows at its maximum zoom
+BINS_PER_SECOND = 1000
+
+# peaks are stored as signed bytes, which is plenty for a waveform a few tens
+# of pixels high
+PEAK_SCALE = 127
+
+# milliseconds between two progress notifications while extracting
+PROGRESS_INTERVAL = 500
+
+
+def _quantize(value):
+    return int(max(-1.0, min(1.0, value)) * PEAK_SCALE)
+
+
+class PeakPyramid(object):
+    """
+    Min/max peaks of a mono audio stream at several resolutions.
+
+    Level 0 has a peak for every C{bin_size} samples, and every level above
+    merges pairs of peaks of the level below, so a peak covers
+    C{bin_size * 2 ** level} samples. Samples can be added while the pyramid
+    is read from another thread.
+
+    @ivar rate: The sample rate of the stream, 0 until known.
+    @ivar bin_size: The number of samples per peak of level 0.
+    @ivar levels: The (mins, maxs) arrays of each level.
+    @ivar complete: Whether the whole stream has been added.
+    """
+
+    def __init__(self):
+        self.rate = 0
+        self.bin_size = 0
+        self.levels = [(array.array('b'), array.array('b'))]
+        self.complete = False
+        self._pending = array.array('f')
+        self._lock = threading.Lock()
+
+    def setRate(self, rate):
+        self.rate = rate
+        self.bin_size = max(1, rate // BINS_PER_SECOND)
+
+    def _getDuration(self):
+        if not self.rate:
+            return 0
+        return len(self.levels[0][0]) * self.bin_size * gst.SECOND / self.rate
+
+    duration = property(_getDuration, doc="The time covered by level 0")
+
+    def addSamples(self, samples):
+        """
+        Add the next samples of the stream.
+
+        @type samples: C{array.array} of floats.
+        """
+        self._lock.acquire()
+        try:
+            pending = self._pending
+            pending.extend(samples)
+            size = self.bin_size
+            used = len(pending) // size * size
+            mins, maxs = self.levels[0]
+            for index in xrange(0, used, size):
+                chunk = pending[index:index + size]
+                mins.append(_quantize(min(chunk)))
+                maxs.append(_quantize(max(chunk)))
+            del pending[:used]
+            self._propagate()
+        finally:
+            self._lock.release()
+
+    def finish(self):
+        """
+        Add the samples left over at the end of the stream and complete the
+        upper levels.
+        """
+        self._lock.acquire()
+        try:
+            mins, maxs = self.levels[0]
+            if self._pending:
+                mins.append(_quantize(min(self._pending)))
+                maxs.append(_quantize(max(self._pending)))
+                self._pending = array.array('f')
+            self.complete = True
+            self._propagate()
+        finally:
+            self._lock.release()
+
+    def _propagate(self):
+        # merge the pairs completed in each level into the level above. Once
+        # the stream is complete, a trailing odd peak is carried up alone.
+        level = 0
+        while True:
+            mins, maxs = self.levels[level]
+            if level + 1 == len(self.levels):
+                if len(mins) < 2:
+                    break
+                self.levels.append((array.array('b'), array.array('b')))
+            upper_mins, upper_maxs = self.levels[level + 1]
+            stop = len(mins)
+            if not self.complete:
+                stop -= stop % 2
+            for index in xrange(len(upper_mins) * 2, stop, 2):
+                upper_mins.append(min(mins[index:index + 2]))
+                upper_maxs.append(max(maxs[index:index + 2]))
+            level += 1
+
+    def getPeaks(self, start, stop, count):
+        """
+        Sample the peaks for C{count} columns evenly covering the time range
+        [C{start}, C{stop}), from the coarsest level that still has a peak
+        per column.
+
+        @return: A (min, max) pair between -1.0 and 1.0 for each column, or
+        C{None} for the columns not extracted yet.
+        @rtype: C{list}
+        """
+        if count <= 0:
+            return []
+        if not self.rate or stop <= start:
+            return [None] * count
+
+        self._lock.acquire()
+        try:
+            step = float(stop - start) / count
+            bins = step * self.rate / (self.bin_size * gst.SECOND)
+            level = 0
+            while level + 1 < len(self.levels) and 2 ** (level + 1) <= bins:
+                level += 1
+            mins, maxs = self.levels[level]
+            length = len(mins)
+            bin_duration = (float(self.bin_size * 2 ** level) * gst.SECOND /
+                    self.rate)
+
+            peaks = []
+            for column in xrange(count):
+                first = int((start + column * step) / bin_duration)
+                if first < 0 or first >= length:
+                    peaks.append(None)
+                    continue
+                last = int(math.ceil((start + (column + 1) * step) /
+                        bin_duration))
+                last = min(length, max(first + 1, last))
+                peaks.append((min(mins[first:last]) / float(PEAK_SCALE),
+                        max(maxs[first:last]) / float(PEAK_SCALE)))
+            return peaks
+        finally:
+            self._lock.release()
+
+
+class PeakExtractor(Signallable, Loggable):
+    """
+    Decodes an audio stream once, from start to end and as fast as possible,
+    into a L{PeakPyramid}.
+
+    Signals:
+     - C{progress} : More of the stream has been extracted.
+     - C{done} : The whole stream has been extracted.
+     - C{error} : The stream couldn't be decoded.
+
+    @ivar pyramid: The peaks extracted so far.
+    @type pyramid: L{PeakPyramid}
+    """
+
+    __signals__ = {
+        "progress": ["duration"],
+        "done": [],
+        "error": ["message"],
+    }
+
+    def __init__(self, bin):
+        """
+        @param bin: An element with a single source pad, producing the
+        decoded audio stream.
+        """
+        Loggable.__init__(self)
+        self.pyramid = PeakPyramid()
+        self.sink = PeakSink(self.pyramid)
+        conv = gst.element_factory_make("audioconvert")
+        self.pipeline = utils.pipeline({
+            bin : conv,
+            conv : self.sink,
+            self.sink : None})
+        self._timeout = None
+
+    def start(self):
+        bus = self.pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message", self._busMessageCb)
+        self._timeout = gobject.timeout_add(PROGRESS_INTERVAL,
+                self._progressCb)
+        self.pipeline.set_state(gst.STATE_PLAYING)
+
+    def stop(self):
+        if self.pipeline is None:
+            return
+        if self._timeout is not None:
+            gobject.source_remove(self._timeout)
+            self._timeout = None
+        bus = self.pipeline.get_bus()
+        bus.disconnect_by_func(self._busMessageCb)
+        bus.remove_signal_watch()
+        self.pipeline.set_state(gst.STATE_NULL)
+        self.pipeline = None
+
+    def _progressCb(self):
+        self.emit("progress", self.pyramid.duration)
+        return True
+
+    def _busMessageCb(self, bus, message):
+        if message.type == gst.MESSAGE_EOS:
+            self.stop()
+            self.pyramid.finish()
+            self.debug("extracted %s of peaks",
+                    gst.TIME_ARGS(self.pyramid.duration))
+            self.emit("done")
+        elif message.type == gst.MESSAGE_ERROR:
+            error, debug = message.parse_error()
+            self.warning("couldn't extract peaks: %s %s", error, debug)
+            self.stop()
+            self.emit("error", str(error))
+
+
+class PeakExtractorQueue(Loggable):
+    """
+    Runs L{PeakExtractor}s one after the other, so that a project with many
+    audio clips doesn't decode all of them at full speed at the same time.
+
+    @ivar running: The extractor being run, if any.
+    @type running: L{PeakExtractor}
+    """
+
+    def __init__(self):
+        Loggable.__init__(self)
+        self.running = None
+        self._pending = []
+        self._sigids = []
+
+    def add(self, extractor):
+        """
+        Queue the given extractor, it's started once the ones queued before
+        it are over.
+        """
+        if extractor is self.running or extractor in self._pending:
+            return
+        self._pending.append(extractor)
+        self._next()
+
+    def remove(self, extractor):
+        """
+        Remove the given extractor from the queue. An extractor which was
+        already started is left running.
+
+        @returns: Whether the extractor was waiting in the queue.
+        """
+        if extractor not in self._pending:
+            return False
+        self._pending.remove(extractor)
+        return True
+
+    def _next(self):
+        if self.running is not None or not self._pending:
+            return
+        self.running = self._pending.pop(0)
+        self.debug("starting %r, %d extractors left", self.running,
+                len(self._pending))
+        self._sigids = [
+            self.running.connect("done", self._extractorDoneCb),
+            self.running.connect("error", self._extractorErrorCb)]
+        self.running.start()
+
+    def _finished(self, extractor):
+        for sigid in self._sigids:
+            extractor.disconnect(sigid)
+        self._sigids = []
+        self.running = None
+        self._next()
+
+    def _extractorDoneCb(self, extractor):
+        self._finished(extractor)
+
+    def _extractorErrorCb(self, extractor, message):
+        self._finished(extractor)
@@ -22,6 +22,7 @@
 """
 High-level pipelines
 """
+import time
 from threading import Lock
 from pitivi.signalinterface import Signallable
 from pitivi.factories.base import SourceFactory, SinkFactory
@@ -30,6 +31,8 @@ from pitivi.stream import get_src_pads_for_stream, \
      get_sink_pads_for_stream, get_stream_for_caps, \
      match_stream, get_stream_for_pad
 from pitivi.log.loggable import Loggable
+from pitivi.positiontracker import PositionTracker
+from pitivi.pipelineprofiler import PipelineProfiler
 import gobject
 import gst
 
@@ -93,7 +96,7 @@ class Pipeline(Signallable, Loggable):
      - State changes
      - Position seeking
      - Position Querying
-       - Along with an periodic callback (optional)
+       - Along with position updates while playing (optional)
 
     You can set L{Action}s on it, which are responsible for choosing which
     C{ObjectFactories} should be used, and how they should be linked.
@@ -105,6 +108,11 @@ class Pipeline(Signallable, Loggable):
      - C{factory-removed} : An L{ObjectFactory} was removed.
      - C{state-changed} : The state of the pipeline changed.
      - C{position} : The current position of the pipeline changed.
+     - C{seek-done} : The pipeline prerolled after a seek. The time the seek
+       took, in nanoseconds, is given.
+     - C{cached-frame} : The frame at the position sought to was in the
+       L{frame_cache} and should be shown instead of the output of the video
+       sink. Emitted with C{None} once the video sink is current again.
      - C{unhandled-stream} : A factory produced a stream which wasn't handled
        by any of the L{Action}s.
      - C{eos} : The Pipeline has finished playing.
@@ -120,6 +128,8 @@ class Pipeline(Signallable, Loggable):
     @type tees: Dictionnary of (L{SourceFactory},L{MultimediaStream}) to C{gst.Element}
     @ivar queues: The queues used before consumers, FOR ACTION USAGE ONLY
     @type queues: Dictionnary of (L{SinkFactory},L{MultimediaStream}) to C{gst.Element}
+    @ivar frame_cache: The frames seeks can be answered from while paused.
+    @type frame_cache: L{FrameCache}
     """
 
     __signals__ = {
@@ -129,6 +139,8 @@ class Pipeline(Signallable, Loggable):
         "factory-removed" : ["factory"],
         "state-changed" : ["state"],
         "position" : ["position"],
+        "seek-done" : ["duration"],
+        "cached-frame" : ["frame"],
         "duration-changed" : ["duration"],
         "unhandled-stream" : ["factory", "stream"],
         "eos" : [],
@@ -147,9 +159,16 @@ class Pipeline(Signallable, Loggable):
         self.factories = {}
         self.actions = []
         self._listening = False # for the position handler
-        self._listeningInterval = 300 # default 300ms
-        self._listeningSigId = 0
+        self._position_tracker = PositionTracker(self._queryPosition,
+                self._getClockTime)
+        self._position_tracker.connect("position", self._positionTrackerCb)
         self._stream_entry_from_pad = {}
+        self._seek_time = None
+        self.profiler = None
+        self.frame_cache = None
+        # the position of the cached frame shown, the gst.Pipeline is still
+        # where it was before
+        self._cached_position = None
 
     def release(self):
         """
@@ -162,6 +181,8 @@ class Pipeline(Signallable, Loggable):
         @postcondition: The L{Pipeline} will no longer be usable.
         """
         self._listenToPosition(False)
+        self.stopProfiling()
+        self.setFrameCache(None)
         self._bus.disconnect_by_func(self._busMessageCb)
         self._bus.remove_signal_watch()
         self._bus.set_sync_handler(None)
@@ -294,6 +315,14 @@ class Pipeline(Signallable, Loggable):
         """
         Sets the L{Pipeline} to PLAYING
         """
+        position = self._cached_position
+        if position is not None:
+            # play from the cached frame shown
+            self._clearCachedFrame()
+            try:
+                self._seek(position, gst.FORMAT_TIME, True)
+            except PipelineError:
+                self.warning("couldn't seek to the cached frame position")
         self.setState(STATE_PLAYING)
 
     def pause(self):
@@ -302,10 +331,9 @@ class Pipeline(Signallable, Loggable):
         """
         self.setState(STATE_PAUSED)
 
-        # When the pipeline has been paused we need to update the
-        # timeline/playhead position, as the 'position' signal
-        # is only emitted every 300ms and the playhead jumps
-        # during the playback.
+        # position updates stop when the pipeline is paused, report the exact
+        # position it stopped at
+        self._listenToPosition(False)
         try:
             self.emit("position", self.getPosition())
         except PipelineError:
@@ -316,6 +344,7 @@ class Pipeline(Signallable, Loggable):
         """
         Sets the L{Pipeline} to READY
         """
+        self._clearCachedFrame()
         self.setState(STATE_READY)
 
     def togglePlayback(self):
@@ -337,6 +366,8 @@ class Pipeline(Signallable, Loggable):
         @raise PipelineError: If the position couldn't be obtained.
         """
         self.log("format %r", format)
+        if format == gst.FORMAT_TIME and self._cached_position is not None:
+            return self._cached_position
         try:
             cur, format = self._pipeline.query_position(format)
         except Exception, e:
@@ -359,24 +390,29 @@ class Pipeline(Signallable, Loggable):
         self.emit("duration-changed", dur)
         return dur
 
-    def activatePositionListener(self, interval=300):
+    def activatePositionListener(self, rate=None):
         """
         Activate the position listener.
 
-        When activated, the Pipeline will emit the 'position' signal at the
-        specified interval when it is the PLAYING or PAUSED state.
+        When activated, the Pipeline will emit the 'position' signal about
+        C{rate} times per second while it is in the PLAYING state. The
+        position is estimated from the pipeline clock between occasional
+        position queries. Nothing is emitted while the pipeline is paused,
+        except after seeks.
 
         @see: L{deactivatePositionListener}
-        @param interval: Interval between position queries in milliseconds
-        @type interval: L{int} milliseconds
+        @param rate: The number of position updates per second, or C{None}
+        to use the default rate.
+        @type rate: L{int}
         @return: Whether the position listener was activated or not
         @rtype: L{bool}
         """
+        if rate is not None:
+            self._position_tracker.update_rate = rate
         if self._listening == True:
             return True
         self._listening = True
-        self._listeningInterval = interval
-        # if we're in paused or playing, switch it on
+        # if we're playing, switch it on
         self._listenToPosition(self.getState() == STATE_PLAYING)
         return True
 
@@ -389,26 +425,63 @@ class Pipeline(Signallable, Loggable):
         self._listenToPosition(False)
         self._listening = False
 
-    def _positionListenerCb(self):
+    def startProfiling(self):
+        """
+        Start measuring the buffers going through each element of the
+        pipeline.
+
+        @see: L{stopProfiling}
+        @return: The profiler collecting the measures.
+        @rtype: L{PipelineProfiler}
+        """
+        self.stopProfiling()
+        self.profiler = PipelineProfiler()
+        self.profiler.start(self._pipeline)
+        return self.profiler
+
+    def stopProfiling(self):
+        """
+        Stop measuring the elements of the pipeline.
+
+        @return: The profiler holding the measures, or C{None} if profiling
+        wasn't started.
+        @rtype: L{PipelineProfiler}
+        """
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.stop()
+            self.profiler = None
+        return profiler
+
+    def _queryPosition(self):
         try:
             cur = self.getPosition()
-            if cur != gst.CLOCK_TIME_NONE:
-                self.emit('position', cur)
-        finally:
-            return True
+        except PipelineError:
+            return None
+
+        if cur == gst.CLOCK_TIME_NONE:
+            return None
+        return cur
+
+    def _getClockTime(self):
+        clock = self._pipeline.get_clock()
+        if clock is None:
+            return None
+        return clock.get_time()
+
+    def _positionTrackerCb(self, tracker, position):
+        self.emit('position', position)
 
     def _listenToPosition(self, listen=True):
         # stupid and dumm method, not many checks done
         # i.e. it does NOT check for current state
         if listen == True:
-            if self._listening == True and self._listeningSigId == 0:
-                self._listeningSigId = gobject.timeout_add(self._listeningInterval,
-                                                           self._positionListenerCb)
-        elif self._listeningSigId != 0:
-            gobject.source_remove(self._listeningSigId)
-            self._listeningSigId = 0
+            if self._listening == True:
+                self._position_tracker.start()
+        else:
+            self._position_tracker.stop()
 
-    def seek(self, position, format=gst.FORMAT_TIME):
+    def seek(self, position, format=gst.FORMAT_TIME, accurate=True):
         """
         Seeks in the L{Pipeline} to the given position.
 
@@ -416,28 +489,89 @@ class Pipeline(Signallable, Loggable):
         @type position: L{long}
         @param format: The C{Format} of the seek position
         @type format: C{gst.Format}
+        @param accurate: If C{False}, seek to the closest keyframe instead,
+        which is much faster with long-GOP formats. Used when scrubbing.
+        @type accurate: C{bool}
         @raise PipelineError: If seek failed
         """
         if format == gst.FORMAT_TIME:
             self.debug("position : %s", gst.TIME_ARGS (position))
         else:
             self.debug("position : %d , format:%d", position, format)
-        # FIXME : temporarily deactivate position listener
-        #self._listenToPosition(False)
-
         # clamp between [0, duration]
         if format==gst.FORMAT_TIME:
             position = max(0, min(position, self.getDuration()))
+            if self._showCachedFrame(position):
+                return
+
+        self._clearCachedFrame()
+        self._seek(position, format, accurate)
+
+    def _seek(self, position, format, accurate):
+        flags = gst.SEEK_FLAG_FLUSH
+        if accurate:
+            flags |= gst.SEEK_FLAG_ACCURATE
+        else:
+            flags |= gst.SEEK_FLAG_KEY_UNIT
 
-        res = self._pipeline.seek(1.0, format, gst.SEEK_FLAG_FLUSH,
+        res = self._pipeline.seek(1.0, format, flags,
                                   gst.SEEK_TYPE_SET, position,
                                   gst.SEEK_TYPE_NONE, -1)
         if not res:
             self.debug("seeking failed")
+            self._seek_time = None
             raise PipelineError("seek failed")
+        self._seek_time = time.time()
         self.debug("seeking succesfull")
+        self._position_tracker.resync()
         self.emit('position', position)
 
+    def setFrameCache(self, frame_cache):
+        """
+        Set the cache seeks are answered from while the pipeline is paused.
+
+        @type frame_cache: L{FrameCache} or C{None}
+        """
+        if self.frame_cache is not None:
+            self.frame_cache.disconnect_by_function(
+                    self._frameCacheInvalidatedCb)
+            self._clearCachedFrame()
+        self.frame_cache = frame_cache
+        if frame_cache is not None:
+            frame_cache.connect("invalidated", self._frameCacheInvalidatedCb)
+
+    def _showCachedFrame(self, position):
+        # a seek in flight would show its frame after the cached one
+        if self.frame_cache is None or self._seek_time is not None or \
+                self.getState() != gst.STATE_PAUSED:
+            return False
+
+        frame = self.frame_cache.lookup(position)
+        if frame is None:
+            return False
+
+        self.debug("showing cached frame at %s", gst.TIME_ARGS(position))
+        self._cached_position = position
+        self.emit("cached-frame", frame)
+        self.emit("position", position)
+        self.emit("seek-done", 0L)
+        return True
+
+    def _clearCachedFrame(self):
+        if self._cached_position is not None:
+            self._cached_position = None
+            self.emit("cached-frame", None)
+
+    def _frameCacheInvalidatedCb(self, frame_cache, start, stop):
+        position = self._cached_position
+        if position is not None and start <= position < stop:
+            # the frame shown changed, get the new one
+            self._clearCachedFrame()
+            try:
+                self._seek(position, gst.FORMAT_TIME, True)
+            except PipelineError:
+                self.warning("couldn't seek to the cached frame position")
+
     def seekRelative(self, time):
         seekvalue = max(0, min(self.getPosition() + time,
             self.getDuration()))
@@ -834,6 +968,12 @@ class Pipeline(Signallable, Loggable):
         elif message.type == gst.MESSAGE_ERROR:
             error, detail = message.parse_error()
             self._handleErrorMessage(error, detail, message.src)
+        elif message.type == gst.MESSAGE_ASYNC_DONE:
+            if message.src == self._pipeline and self._seek_time is not None:
+                duration = long((time.time() - self._seek_time) * gst.SECOND)
+                self._seek_time = None
+                self.debug("seek done in %s", gst.TIME_ARGS(duration))
+                self.emit('seek-done', duration)
         elif message.type == gst.MESSAGE_DURATION:
             self.debug("Duration might have changed, querying it")
             gobject.idle_add(self._queryDurationAsync)
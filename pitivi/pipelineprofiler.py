@@ -0,0 +1,313 @@
+# PiTiVi , Non-linear video editor
+#
+#       pitivi/pipelineprofiler.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Per-element throughput measurements of a running pipeline
+"""
+
+import time
+import thread
+from threading import Lock
+
+import gst
+
+from pitivi.log.loggable import Loggable
+
+QUEUE_FACTORIES = ("queue", "queue2")
+
+
+class ElementStats(object):
+    """
+    What went through an element.
+
+    Processing times are measured from a buffer entering the element to the
+    first buffer it pushes in the same thread. Elements pushing from their
+    own thread, like queues, have no processing time.
+
+    @ivar name: The name of the element.
+    @ivar factory_name: The name of the factory of the element.
+    @ivar buffers: The number of buffers the element pushed.
+    @ivar bytes: The size of these buffers.
+    @ivar media_duration: Their total duration, in nanoseconds.
+    @ivar processing_time: The time spent in the element, in seconds.
+    @ivar max_processing_time: The longest time a buffer took, in seconds.
+    @ivar first_time: When the first buffer was pushed.
+    @ivar last_time: When the last buffer was pushed.
+    @ivar level_samples: The number of times the fill level of a queue was
+    sampled.
+    @ivar level_buffers: The sum of the sampled levels, in buffers.
+    @ivar max_level_buffers: The highest sampled level, in buffers.
+    @ivar max_level_time: The highest sampled level, in nanoseconds.
+    """
+
+    def __init__(self, name, factory_name):
+        self.name = name
+        self.factory_name = factory_name
+        self.buffers = 0
+        self.bytes = 0
+        self.media_duration = 0
+        self.processing_time = 0.0
+        self.max_processing_time = 0.0
+        self.first_time = None
+        self.last_time = None
+        self.level_samples = 0
+        self.level_buffers = 0
+        self.max_level_buffers = 0
+        self.max_level_time = 0
+        # thread id => when the last buffer entered the element
+        self._entered = {}
+
+    def isQueue(self):
+        return self.factory_name in QUEUE_FACTORIES
+
+    def getActiveTime(self):
+        """ Returns the time between the first and the last buffer. """
+        if self.first_time is None:
+            return 0.0
+        return self.last_time - self.first_time
+
+    def getBufferRate(self):
+        """ Returns the number of buffers pushed per second. """
+        active_time = self.getActiveTime()
+        if not active_time:
+            return 0.0
+        return self.buffers / active_time
+
+    def getSpeed(self):
+        """
+        Returns the media time pushed per second, 1.0 being real time.
+        """
+        active_time = self.getActiveTime()
+        if not active_time:
+            return 0.0
+        return self.media_duration / float(gst.SECOND) / active_time
+
+    def getMeanProcessingTime(self):
+        if not self.buffers:
+            return 0.0
+        return self.processing_time / self.buffers
+
+    def getMeanLevel(self):
+        """ Returns the mean fill level of a queue, in buffers. """
+        if not self.level_samples:
+            return 0.0
+        return self.level_buffers / float(self.level_samples)
+
+
+class PipelineProfiler(Loggable):
+    """
+    Measures the buffers going through the elements of a C{gst.Bin}, with
+    buffer probes on the pads of every element in it, including the ones
+    added while profiling.
+
+    Elements and pads can be added from streaming threads, so the probes and
+    signal handlers are kept under the lock, and none are added once
+    stopped.
+    """
+
+    def __init__(self):
+        Loggable.__init__(self)
+        # element => ElementStats
+        self.stats = {}
+        self.start_time = None
+        self.stop_time = None
+        self._lock = Lock()
+        self._probes = []
+        self._handlers = []
+
+    def start(self, bin):
+        """
+        Start measuring.
+
+        @param bin: The bin whose elements are measured.
+        @type bin: C{gst.Bin}
+        """
+        self.start_time = time.time()
+        self.stop_time = None
+        self._watchBin(bin)
+
+    def stop(self):
+        """ Stop measuring and remove the probes. """
+        self._lock.acquire()
+        try:
+            self.stop_time = time.time()
+            probes, self._probes = self._probes, []
+            handlers, self._handlers = self._handlers, []
+        finally:
+            self._lock.release()
+
+        for pad, probe_id in probes:
+            pad.remove_buffer_probe(probe_id)
+        for element, handler_id in handlers:
+            element.disconnect(handler_id)
+
+    def isRunning(self):
+        return self.start_time is not None and self.stop_time is None
+
+    def getWallTime(self):
+        if self.start_time is None:
+            return 0.0
+        stop_time = self.stop_time
+        if stop_time is None:
+            stop_time = time.time()
+        return stop_time - self.start_time
+
+    def getReport(self):
+        """
+        @return: The stats of the elements which pushed buffers, the ones
+        taking the most time first.
+        @rtype: C{list} of L{ElementStats}
+        """
+        self._lock.acquire()
+        try:
+            stats = [element_stats for element_stats in self.stats.itervalues()
+                    if element_stats.buffers]
+        finally:
+            self._lock.release()
+
+        stats.sort(key=lambda element_stats: (-element_stats.processing_time,
+                element_stats.name))
+        return stats
+
+    def formatReport(self):
+        """
+        @return: The report as a table.
+        @rtype: C{str}
+        """
+        wall_time = self.getWallTime()
+        lines = ["%-32s %-20s %8s %6s %8s %8s %8s %9s" % ("element",
+                "factory", "buffers", "buf/s", "speed", "time%", "mean ms",
+                "queue")]
+        for element_stats in self.getReport():
+            if element_stats.isQueue():
+                queue = "%.1f/%d" % (element_stats.getMeanLevel(),
+                        element_stats.max_level_buffers)
+            else:
+                queue = "-"
+            if wall_time:
+                share = 100 * element_stats.processing_time / wall_time
+            else:
+                share = 0.0
+            lines.append("%-32s %-20s %8d %6.1f %7.2fx %7.1f%% %8.2f %9s" % (
+                    element_stats.name[:32], element_stats.factory_name[:20],
+                    element_stats.buffers, element_stats.getBufferRate(),
+                    element_stats.getSpeed(), share,
+                    element_stats.getMeanProcessingTime() * 1000, queue))
+        lines.append("wall time: %.2fs" % wall_time)
+
+        return "\n".join(lines)
+
+    def _connect(self, element, signal, callback, *args):
+        self._lock.acquire()
+        try:
+            if self.isRunning():
+                self._handlers.append((element,
+                        element.connect(signal, callback, *args)))
+        finally:
+            self._lock.release()
+
+    def _addProbe(self, pad, callback, *args):
+        self._lock.acquire()
+        try:
+            if self.isRunning():
+                self._probes.append((pad,
+                        pad.add_buffer_probe(callback, *args)))
+        finally:
+            self._lock.release()
+
+    def _watchBin(self, bin):
+        self._connect(bin, "element-added", self._elementAddedCb)
+        for element in bin.elements():
+            self._watchElement(element)
+
+    def _watchElement(self, element):
+        if isinstance(element, gst.Bin):
+            # only measure the elements doing the work, measuring bins would
+            # count the time of their children twice
+            self._watchBin(element)
+            return
+
+        factory = element.get_factory()
+        if factory is not None:
+            factory_name = factory.get_name()
+        else:
+            factory_name = type(element).__name__
+        self._lock.acquire()
+        try:
+            element_stats = self.stats.get(element)
+            if element_stats is None:
+                element_stats = ElementStats(element.get_name(), factory_name)
+                self.stats[element] = element_stats
+        finally:
+            self._lock.release()
+
+        self._connect(element, "pad-added", self._padAddedCb, element_stats)
+        for pad in element.pads():
+            self._probePad(pad, element, element_stats)
+
+    def _probePad(self, pad, element, element_stats):
+        if pad.get_direction() == gst.PAD_SRC:
+            self._addProbe(pad, self._srcBufferCb, element, element_stats)
+        else:
+            self._addProbe(pad, self._sinkBufferCb, element_stats)
+
+    def _elementAddedCb(self, bin, element):
+        self._watchElement(element)
+
+    def _padAddedCb(self, element, pad, element_stats):
+        self._probePad(pad, element, element_stats)
+
+    def _sinkBufferCb(self, pad, buffer, element_stats):
+        element_stats._entered[thread.get_ident()] = time.time()
+        return True
+
+    def _srcBufferCb(self, pad, buffer, element, element_stats):
+        now = time.time()
+        entered = element_stats._entered.pop(thread.get_ident(), None)
+        if element_stats.isQueue():
+            level_buffers = element.props.current_level_buffers
+            level_time = element.props.current_level_time
+        else:
+            level_buffers = level_time = None
+
+        self._lock.acquire()
+        try:
+            element_stats.buffers += 1
+            element_stats.bytes += buffer.size
+            if buffer.duration != gst.CLOCK_TIME_NONE:
+                element_stats.media_duration += buffer.duration
+            if element_stats.first_time is None:
+                element_stats.first_time = now
+            element_stats.last_time = now
+            if entered is not None:
+                processing_time = now - entered
+                element_stats.processing_time += processing_time
+                element_stats.max_processing_time = max(processing_time,
+                        element_stats.max_processing_time)
+            if level_buffers is not None:
+                element_stats.level_samples += 1
+                element_stats.level_buffers += level_buffers
+                element_stats.max_level_buffers = max(level_buffers,
+                        element_stats.max_level_buffers)
+                element_stats.max_level_time = max(level_time,
+                        element_stats.max_level_time)
+        finally:
+            self._lock.release()
+
+        return True
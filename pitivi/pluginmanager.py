@@ -25,6 +25,7 @@ Plugin Manager
 
 import os
 import os.path
+import errno
 import stat
 import shutil
 import inspect
@@ -38,8 +39,120 @@ import gtk
 import zope.interface.verify
 
 from pitivi.signalinterface import Signallable
+from pitivi.log.loggable import Loggable
 import pitivi.plugincore as plugincore
 
+# bump this whenever the format of the manifest entries changes
+MANIFEST_FORMAT = 1
+
+
+def get_interface_ids(plugin_class):
+    """
+    Returns the identifiers of the interfaces implemented by C{plugin_class},
+    including the ones they extend.
+    """
+    return [interface.__identifier__ for interface in
+            zope.interface.implementedBy(plugin_class).flattened()]
+
+
+def _get_file_stamp(filename):
+    try:
+        stat_result = os.stat(filename)
+    except OSError:
+        return None
+    return stat_result.st_mtime, stat_result.st_size
+
+
+class PluginManifest(Loggable):
+    """
+    What is known about each plugin file without importing it, kept across
+    runs.
+
+    Entries are keyed by the full path of the plugin file, and are only valid
+    as long as the modification time and size of the file don't change. An
+    entry is a dictionary with the C{name}, C{category}, C{interfaces}
+    (identifiers) and C{enabled} state of the plugin.
+    """
+
+    def __init__(self, filename):
+        Loggable.__init__(self)
+        self.filename = filename
+        self._entries = {}
+        self._load()
+
+    def lookup(self, filename):
+        """
+        @return: The entry of C{filename} if it's up to date, else C{None}.
+        """
+        entry = self._entries.get(filename)
+        if entry is None or entry["stamp"] != _get_file_stamp(filename):
+            return None
+        return entry
+
+    def update(self, filename, plugin_class, enabled):
+        self._entries[filename] = {
+            "stamp": _get_file_stamp(filename),
+            "name": plugin_class.name,
+            "category": getattr(plugin_class, "category", None),
+            "interfaces": get_interface_ids(plugin_class),
+            "enabled": enabled}
+
+    def getEnabled(self, filename):
+        """
+        @return: Whether the plugin of C{filename} was last enabled, even if
+        the file changed since, or C{None} if it's unknown.
+        """
+        entry = self._entries.get(filename)
+        if entry is None:
+            return None
+        return entry["enabled"]
+
+    def setEnabled(self, filename, enabled):
+        if filename in self._entries:
+            self._entries[filename]["enabled"] = enabled
+
+    def remove(self, filename):
+        self._entries.pop(filename, None)
+
+    def _load(self):
+        try:
+            manifest_file = open(self.filename, "rb")
+            try:
+                version, entries = pickle.load(manifest_file)
+            finally:
+                manifest_file.close()
+        except (IOError, EOFError, ValueError, TypeError,
+                pickle.UnpicklingError), e:
+            self.debug("couldn't load %s: %s", self.filename, e)
+            return
+
+        if version != MANIFEST_FORMAT:
+            self.info("discarding %s, it has an old format", self.filename)
+            return
+
+        self._entries = entries
+
+    def save(self):
+        directory = os.path.dirname(self.filename)
+        temp_filename = self.filename + ".tmp"
+        try:
+            try:
+                os.makedirs(directory)
+            except OSError, e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+            manifest_file = open(temp_filename, "wb")
+            try:
+                pickle.dump((MANIFEST_FORMAT, self._entries), manifest_file,
+                        pickle.HIGHEST_PROTOCOL)
+            finally:
+                manifest_file.close()
+            os.rename(temp_filename, self.filename)
+        except (IOError, OSError), e:
+            self.warning("couldn't save %s: %s", self.filename, e)
+
+
 class PluginManager(Signallable):
     """
     Manages plugins in a centralized way.
@@ -50,6 +163,11 @@ class PluginManager(Signallable):
     application (or by plugins themself) in order to find items compatible with
     their extension points.
 
+    What is known about the plugins is kept in a L{PluginManifest}, so that
+    the disabled plugins are only imported once they are asked for with
+    L{getPlugins}. Plugins are enabled or disabled as they were left when
+    they are imported.
+
     Signals
     void plugin-enabled-changed(plugin_names)
         plugin.enabled state is changed
@@ -80,6 +198,8 @@ class PluginManager(Signallable):
 
         # plugins are collected in a bag (a structure relatng 1->many)
         # {"my_plugin":{"plugin":plugin_object, "filename":"/home/luca/plugins/my_plugin.py"}}
+        # "plugin" is None until a plugin known from the manifest is imported,
+        # its manifest entry is then in "info".
         self.pluginbag = {}
 
         # Store plugin repositiories in the instance ensuring they are expressed
@@ -87,6 +207,8 @@ class PluginManager(Signallable):
         self.local_plugin_path = os.path.abspath(local_plugin_path)
         self.plugin_paths = [ self.local_plugin_path, ]
         self.settings_path = os.path.abspath(settings_path)
+        self.manifest = PluginManifest(
+                os.path.join(self.settings_path, "plugins.manifest"))
         self.collect()
 
     def _match(self, plugin, name=None, interface=plugincore.IPlugin, category=None, only_enabled=False):
@@ -113,6 +235,23 @@ class PluginManager(Signallable):
         else:
             return True
 
+    def _matchInfo(self, info, name=None, interface=plugincore.IPlugin, category=None, only_enabled=False):
+        """
+        Check if the manifest entry of a plugin matches the search criteria,
+        like L{_match} does for plugins.
+        """
+
+        if name and info["name"] != name:
+            return False
+        elif interface and interface.__identifier__ not in info["interfaces"]:
+            return False
+        elif category and info["category"] != category:
+            return False
+        elif only_enabled and not info["enabled"]:
+            return False
+        else:
+            return True
+
     def _get_settings_filename(self, plugin):
         """
         Compute the settings filename for given plugin, by finding plugin's
@@ -240,7 +379,10 @@ class PluginManager(Signallable):
         return plugin_class
 
     def collect(self):
-        """ Scan plugin paths and load plugins """
+        """
+        Scan plugin paths and load plugins. Plugins known to be disabled from
+        the manifest are only registered, they are loaded on demand.
+        """
 
         for path in self.plugin_paths:
             if not os.path.isdir(path):
@@ -248,29 +390,73 @@ class PluginManager(Signallable):
             for filename in os.listdir(path):
                 if not(filename.endswith(".egg") or filename.endswith(".py")):
                     continue
-                # try loading the plugin from filename
-                plugin_class = self.loadPluginClass(filename, path)
-                if plugin_class and not self.alreadyLoaded(plugin_class):
-                    # insert the new plugin entry filled only with filename
-                    self.pluginbag[plugin_class.name] = {\
-                        "plugin": None, "filename": os.path.join(path,filename)}
-
-                    # create an instance of the plugin
-                    plugin = plugin_class(manager=self)
+                info = self.manifest.lookup(os.path.join(path, filename))
+                if info is not None and not info["enabled"]:
+                    if info["name"] not in self.pluginbag:
+                        self.pluginbag[info["name"]] = {"plugin": None,
+                            "filename": os.path.join(path, filename),
+                            "info": info}
+                    continue
 
-                    # complete the registration procdeure if all went well
-                    if plugin and plugincore.IPlugin.providedBy(plugin):
-                        self.pluginbag[plugin.name]["plugin"] = plugin
-                    else:
-                        del self.pluginbag[plugin.name]
+                # try loading the plugin from filename
+                self._loadPlugin(filename, path)
 
                 # process gtk events while loading plugins
                 while gtk.events_pending():
                     gtk.main_iteration()
 
+        self.manifest.save()
+
+    def _loadPlugin(self, filename, path):
+        plugin_class = self.loadPluginClass(filename, path)
+        if plugin_class and not self.alreadyLoaded(plugin_class):
+            # insert the new plugin entry filled only with filename
+            self.pluginbag[plugin_class.name] = {\
+                "plugin": None, "filename": os.path.join(path,filename)}
+
+            # create an instance of the plugin
+            plugin = plugin_class(manager=self)
+
+            # complete the registration procdeure if all went well
+            if plugin and plugincore.IPlugin.providedBy(plugin):
+                self.pluginbag[plugin.name]["plugin"] = plugin
+                fullname = os.path.join(path, filename)
+                # restore the state the plugin was left in
+                enabled = self.manifest.getEnabled(fullname)
+                if enabled is not None and plugin.enabled != enabled:
+                    plugin.enabled = enabled
+                self.manifest.update(fullname, plugin_class, plugin.enabled)
+            else:
+                del self.pluginbag[plugin.name]
+
+    def _loadMatchingPlugins(self, name, interface, category, only_enabled):
+        """ Load the plugins registered from the manifest which match """
+
+        loaded = False
+        for plugin_name, item in self.pluginbag.items():
+            if item["plugin"] is not None or \
+                    not self._matchInfo(item["info"], name, interface, category, only_enabled):
+                continue
+
+            try:
+                self._loadPlugin(os.path.basename(item["filename"]),
+                        os.path.dirname(item["filename"]))
+            except plugincore.PluginError:
+                # checked again at the next startup, like any new file
+                self.manifest.remove(item["filename"])
+            if self.pluginbag.get(plugin_name) is item:
+                # the file doesn't hold the plugin the manifest knew of, don't
+                # try again
+                del self.pluginbag[plugin_name]
+            loaded = True
+
+        if loaded:
+            self.manifest.save()
+
     def getPlugins(self, name=None, interface=plugincore.IPlugin, category=None, only_enabled=False):
         """
-        Return the list of plugins matching the search criteria
+        Return the list of plugins matching the search criteria, loading
+        them if needed
 
         @param name: the exact name of the plugin (case sensitive)
         @param interface: interface the plugin must provide
@@ -279,7 +465,9 @@ class PluginManager(Signallable):
 
         @return: the list of plugins matching all the search criteria
         """
+        self._loadMatchingPlugins(name, interface, category, only_enabled)
         return [item["plugin"] for item in self.pluginbag.itervalues() if \
+                item["plugin"] is not None and \
                 self._match(item["plugin"], name, interface, category, only_enabled)]
 
     def enablePlugins(self, name=None, interface=plugincore.IPlugin, category=None):
@@ -294,6 +482,7 @@ class PluginManager(Signallable):
 
         for plugin in selection:
             plugin.enabled = True
+        self._saveEnabled(selection)
 
         self.emit('plugin-enabled-changed', [plugin.name for plugin in selection])
 
@@ -310,9 +499,16 @@ class PluginManager(Signallable):
 
         for plugin in selection:
             plugin.enabled = False
+        self._saveEnabled(selection)
 
         self.emit('plugin-enabled-changed', [plugin.name for plugin in selection])
 
+    def _saveEnabled(self, plugins):
+        for plugin in plugins:
+            self.manifest.setEnabled(self.pluginbag[plugin.name]["filename"],
+                    plugin.enabled)
+        self.manifest.save()
+
     def install(self, filename, repository_path):
         """
         Install a new plugin from filename into the specified repository
@@ -349,6 +545,9 @@ class PluginManager(Signallable):
             # complete the registration procdeure if all went well
             if plugin and plugincore.IPlugin.providedBy(plugin):
                 self.pluginbag[plugin.name]["plugin"] = plugin
+                self.manifest.update(new_filename, plugin_class,
+                        plugin.enabled)
+                self.manifest.save()
                 self.emit("plugin-installed", plugin.name)
             else:
                 del self.pluginbag[plugin.name]
@@ -405,6 +604,8 @@ class PluginManager(Signallable):
             if os.path.exists(settings_filename) :
                 os.remove(settings_filename)
             del self.pluginbag[plugin.name]
+            self.manifest.remove(item["filename"])
+            self.manifest.save()
             self.emit("plugin-uninstalled", name)
         except:
             raise plugincore.RemovePluginError(item["filename"])
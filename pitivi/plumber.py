@@ -35,8 +35,13 @@ Convenience functions for creating the output media sinks
 import gst
 from gst import interfaces
 from pitivi.factories.base import SinkFactory
+from pitivi.framecache import FrameCapture
 
 class DefaultVideoSink(SinkFactory):
+    """
+    @ivar frame_cache: If set, the frames shown are also added to it.
+    @type frame_cache: L{FrameCache}
+    """
 
     def __init__(self, *args, **kwargs):
         SinkFactory.__init__(self, *args, **kwargs)
@@ -45,6 +50,7 @@ class DefaultVideoSink(SinkFactory):
         self._realsink = None
         self.sync = True
         self.qos = True
+        self.frame_cache = None
 
     def _makeBin(self, input_stream=None):
         """ Returns a video sink bin"""
@@ -62,7 +68,15 @@ class DefaultVideoSink(SinkFactory):
         bin.add(ffmpegcolorspace, videoscale, autovideosink)
         ffmpegcolorspace.link(videoscale)
         videoscale.link(autovideosink)
-        pad = ffmpegcolorspace.get_pad("sink")
+        if self.frame_cache is not None and self.frame_cache.max_size:
+            tee = gst.element_factory_make("tee")
+            capture = FrameCapture(self.frame_cache).makeBin()
+            bin.add(tee, capture)
+            tee.link(ffmpegcolorspace)
+            tee.link(capture)
+            pad = tee.get_pad("sink")
+        else:
+            pad = ffmpegcolorspace.get_pad("sink")
         ghost = gst.GhostPad("sink", pad)
         bin.add_pad(ghost)
 
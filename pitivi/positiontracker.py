@@ -0,0 +1,173 @@
+# PiTiVi , Non-linear video editor
+#
+#       pitivi/positiontracker.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Playhead position reporting driven by the pipeline clock
+"""
+
+import gobject
+
+from pitivi.signalinterface import Signallable
+from pitivi.log.loggable import Loggable
+
+SECOND = 1000000000
+
+# updates are delivered at about the refresh rate of the display
+DEFAULT_UPDATE_RATE = 30
+# real position queries are done this often while interpolating
+DEFAULT_RESYNC_INTERVAL = SECOND / 2
+# above this difference between the estimated and the real position, the
+# estimate is anchored again on the real position
+DRIFT_TOLERANCE = SECOND / 10
+# after this many drifts in a row, stop interpolating until the next seek:
+# the pipeline isn't running in real time (ie: rendering)
+MAX_DRIFTS = 3
+
+
+class PositionTracker(Signallable, Loggable):
+    """
+    Reports the position of a running pipeline.
+
+    The position is only queried every C{resync_interval}. In between, it is
+    estimated from the time elapsed on the pipeline clock since the last
+    query, and reported C{update_rate} times per second. Nothing runs while
+    the tracker is stopped, which should be the case whenever the pipeline
+    isn't playing.
+
+    Signals:
+     - C{position} : The estimated position changed.
+    """
+
+    __signals__ = {
+        "position": ["position"],
+    }
+
+    def __init__(self, query_position, get_clock_time,
+            update_rate=DEFAULT_UPDATE_RATE,
+            resync_interval=DEFAULT_RESYNC_INTERVAL):
+        """
+        @param query_position: Callable returning the real position in
+        nanoseconds, or C{None} if it isn't known.
+        @param get_clock_time: Callable returning the current time of the
+        pipeline clock in nanoseconds, or C{None} if there's no clock.
+        @param update_rate: The number of updates per second.
+        @type update_rate: C{int}
+        @param resync_interval: The time in nanoseconds between real queries.
+        @type resync_interval: C{long}
+        """
+        Loggable.__init__(self)
+        self._query_position = query_position
+        self._get_clock_time = get_clock_time
+        self.update_rate = update_rate
+        self.resync_interval = resync_interval
+        self._source_id = 0
+        self._interpolate = True
+        self._drifts = 0
+        self._anchor_position = None
+        self._anchor_time = None
+        self._last_query_time = None
+        self.position = None
+
+    def isRunning(self):
+        return self._source_id != 0
+
+    def start(self):
+        """ Start reporting the position. """
+        if self._source_id:
+            return
+
+        self.resync()
+        interval = max(1, 1000 / self.update_rate)
+        self._source_id = gobject.timeout_add(interval, self._updateCb)
+
+    def stop(self):
+        """ Stop reporting the position. """
+        if not self._source_id:
+            return
+
+        gobject.source_remove(self._source_id)
+        self._source_id = 0
+
+    def resync(self):
+        """
+        Forget the last real position, the next update will query it. Call
+        this after seeking.
+        """
+        self._interpolate = True
+        self._drifts = 0
+        self._anchor_position = None
+        self._anchor_time = None
+        self._last_query_time = None
+
+    def update(self):
+        """
+        Compute the position and emit C{position} if it changed.
+
+        @return: The position, or C{None} if it isn't known.
+        """
+        now = self._get_clock_time()
+        position = self._estimate(now)
+
+        if position is None or self._needsQuery(now):
+            real_position = self._query_position()
+            if real_position is None:
+                return position
+
+            self._last_query_time = now
+            if self._interpolate and position is not None and \
+                    abs(real_position - position) > DRIFT_TOLERANCE:
+                self._drifts += 1
+                if self._drifts >= MAX_DRIFTS:
+                    self.debug("drifted by %d, not interpolating until the "
+                            "next seek", real_position - position)
+                    self._interpolate = False
+                else:
+                    self.debug("drifted by %d", real_position - position)
+            else:
+                self._drifts = 0
+
+            position = real_position
+            if self._interpolate and now is not None:
+                self._anchor_position = real_position
+                self._anchor_time = now
+
+        if position != self.position:
+            self.position = position
+            self.emit("position", position)
+
+        return position
+
+    def _estimate(self, now):
+        if not self._interpolate:
+            return self.position
+
+        if now is None or self._anchor_time is None:
+            return None
+
+        return self._anchor_position + max(0, now - self._anchor_time)
+
+    def _needsQuery(self, now):
+        if now is None or self._last_query_time is None:
+            return True
+
+        return now - self._last_query_time >= self.resync_interval
+
+    def _updateCb(self):
+        self.update()
+        return True
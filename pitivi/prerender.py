@@ -0,0 +1,634 @@
+# PiTiVi , Non-linear video editor
+#
+#       pitivi/prerender.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Background rendering of the timeline regions too heavy to play in real time
+"""
+
+import os
+from hashlib import sha1
+
+import gobject
+import gst
+
+from pitivi.signalinterface import Signallable
+from pitivi.log.loggable import Loggable
+from pitivi.settings import xdg_cache_home, get_dir
+from pitivi.stream import VideoStream
+from pitivi.timeline.track import Track, TrackEffect
+
+# Estimated cost of playing each kind of object, in percent of real time. A
+# region is heavy when what plays at the same time adds up to more than
+# REALTIME, a plain transition between two sources plays in real time.
+SOURCE_COST = 40
+EFFECT_COST = 35
+TRANSITION_COST = 20
+REALTIME = 100
+
+# shorter regions aren't worth a file of their own
+MIN_DURATION = gst.SECOND
+
+# milliseconds without playback, seeking or editing before rendering
+IDLE_TIMEOUT = 2000
+
+
+class Region(object):
+    """
+    A time range of a track, with the objects playing in it.
+
+    @ivar track: The track.
+    @ivar start: The start of the region, in the timeline.
+    @ivar stop: The end of the region, in the timeline.
+    @ivar track_objects: The objects of C{track} overlapping the region.
+    @ivar key: The L{get_region_key} of the region, once computed.
+    @ivar filename: Where the region is rendered to.
+    """
+
+    def __init__(self, track, start, stop):
+        self.track = track
+        self.start = start
+        self.stop = stop
+        self.track_objects = []
+        self.key = None
+        self.filename = None
+
+    def _getDuration(self):
+        return self.stop - self.start
+
+    duration = property(_getDuration)
+
+    def overlaps(self, start, stop):
+        return self.start < stop and start < self.stop
+
+
+def find_heavy_regions(track):
+    """
+    Find the regions of C{track} whose estimated cost is above real time.
+
+    Transitions are never split between regions, a region touching one is
+    extended to contain all of it.
+
+    @param track: The track.
+    @type track: L{Track}
+    @return: The regions, in time order.
+    @rtype: C{list} of L{Region}
+    """
+    events = []
+    for track_object in track.track_objects:
+        if not track_object.active:
+            continue
+        if isinstance(track_object, TrackEffect):
+            cost = EFFECT_COST
+        else:
+            cost = SOURCE_COST
+        events.append((track_object.start, cost))
+        events.append((track_object.start + track_object.duration, -cost))
+    transitions = track.transitions.values()
+    for transition in transitions:
+        events.append((transition.start, TRANSITION_COST))
+        events.append((transition.start + transition.duration,
+                -TRANSITION_COST))
+    events.sort()
+
+    spans = []
+    cost = 0
+    heavy_start = None
+    index = 0
+    while index < len(events):
+        position = events[index][0]
+        while index < len(events) and events[index][0] == position:
+            cost += events[index][1]
+            index += 1
+        if cost > REALTIME and heavy_start is None:
+            heavy_start = position
+        elif cost <= REALTIME and heavy_start is not None:
+            spans.append([heavy_start, position])
+            heavy_start = None
+
+    for span in spans:
+        for transition in transitions:
+            transition_stop = transition.start + transition.duration
+            if transition.start < span[1] and span[0] < transition_stop:
+                span[0] = min(span[0], transition.start)
+                span[1] = max(span[1], transition_stop)
+
+    regions = []
+    for start, stop in sorted(spans):
+        if regions and start <= regions[-1].stop:
+            regions[-1].stop = max(regions[-1].stop, stop)
+        else:
+            regions.append(Region(track, start, stop))
+
+    regions = [region for region in regions
+            if region.duration >= MIN_DURATION]
+    for region in regions:
+        region.track_objects = [track_object
+                for track_object in track.track_objects
+                if region.overlaps(track_object.start,
+                        track_object.start + track_object.duration)]
+
+    return regions
+
+
+def _get_factory_id(factory):
+    uri = getattr(factory, "uri", None)
+    if uri is not None:
+        return uri
+    return getattr(factory, "effectname", None) or factory.name
+
+
+def get_region_key(region, caps):
+    """
+    Hash what the output of C{region} depends on: the objects playing in it
+    with their position relative to the region, their curves and the
+    properties of their effects.
+
+    Identical content gives the same key wherever it is in the timeline.
+
+    @param region: The region.
+    @type region: L{Region}
+    @param caps: The caps the region is rendered to.
+    @type caps: C{gst.Caps}
+    @return: The key, as hexadecimal digits.
+    @rtype: C{str}
+    """
+    digest = sha1()
+    digest.update("%s\n%d\n" % (caps.to_string(), region.duration))
+
+    track_objects = sorted(region.track_objects,
+            key=lambda track_object: (track_object.start,
+                    track_object.priority))
+    for track_object in track_objects:
+        digest.update("%s %s %d %d %d %d %d %d\n" % (
+                track_object.__class__.__name__,
+                _get_factory_id(track_object.factory),
+                track_object.start - region.start, track_object.duration,
+                track_object.in_point, track_object.media_duration,
+                track_object.priority, track_object.active))
+
+        for name in sorted(track_object.interpolators):
+            interpolator = track_object.interpolators[name][1]
+            digest.update("%s %r\n" % (name,
+                    [(keyframe.time, keyframe.value, int(keyframe.mode))
+                    for keyframe in interpolator.getKeyframes()]))
+
+        if isinstance(track_object, TrackEffect):
+            element = track_object.getElement()
+            for prop in gobject.list_properties(element):
+                if prop.name == "name" or \
+                        not prop.flags & gobject.PARAM_READABLE:
+                    continue
+                value = element.get_property(prop.name)
+                if isinstance(value, (int, long, float, basestring)):
+                    digest.update("%s=%r\n" % (prop.name, value))
+
+    return digest.hexdigest()
+
+
+class RegionRenderer(Signallable, Loggable):
+    """
+    Renders a L{Region} to its file, from copies of its track objects put in
+    a private track.
+
+    The file is written under a temporary name and only renamed once
+    complete, so that an existing file is always a complete render.
+
+    Signals:
+     - C{done} : The region was rendered.
+     - C{error} : The region couldn't be rendered.
+    """
+
+    __signals__ = {
+        "done": [],
+        "error": ["message"],
+    }
+
+    def __init__(self, region):
+        Loggable.__init__(self)
+        self.region = region
+        self.track = None
+        self.pipeline = None
+        self.paused = False
+        self._seeked = False
+        self._ready = False
+
+    def start(self):
+        self.debug("rendering %s - %s to %s",
+                gst.TIME_ARGS(self.region.start),
+                gst.TIME_ARGS(self.region.stop), self.region.filename)
+        queue = gst.element_factory_make("queue")
+        colorspace = gst.element_factory_make("ffmpegcolorspace")
+        encoder = gst.element_factory_make("jpegenc")
+        muxer = gst.element_factory_make("matroskamux")
+        sink = gst.element_factory_make("filesink")
+        sink.props.location = self._getPartialFilename()
+
+        self.track = Track(self.region.track.stream)
+        self.track.disableUpdates()
+        for track_object in self.region.track_objects:
+            self._copyTrackObject(track_object)
+        self.track.enableUpdates()
+
+        self.pipeline = gst.Pipeline("prerender")
+        self.pipeline.add(self.track.composition, queue, colorspace,
+                encoder, muxer, sink)
+        gst.element_link_many(queue, colorspace, encoder, muxer, sink)
+        self.track.composition.connect("pad-added",
+                self._compositionPadAddedCb, queue)
+
+        bus = self.pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect("message", self._busMessageCb)
+        self.pipeline.set_state(gst.STATE_PAUSED)
+
+    def pause(self):
+        self.paused = True
+        if self._ready:
+            self.pipeline.set_state(gst.STATE_PAUSED)
+
+    def resume(self):
+        self.paused = False
+        if self._ready:
+            self.pipeline.set_state(gst.STATE_PLAYING)
+
+    def cancel(self):
+        self._cleanUp()
+        self._removePartialFile()
+
+    def _copyTrackObject(self, track_object):
+        region_start = self.region.start
+        other = track_object.__class__(track_object.factory,
+                track_object.stream, start=track_object.start,
+                duration=track_object.duration,
+                in_point=track_object.in_point,
+                media_duration=track_object.media_duration,
+                priority=track_object.priority)
+        self.track.addTrackObject(other)
+        track_object.copyProperties(other)
+
+        if track_object.start < region_start:
+            # the curves start where the region does
+            in_point = track_object.in_point + \
+                    region_start - track_object.start
+            other.trimObjectStart(region_start)
+            for name, (prop, interpolator) in \
+                    other.interpolators.iteritems():
+                original = track_object.interpolators[name][1]
+                interpolator.start.setValue(original.valueAt(in_point))
+                for keyframe in list(interpolator.keyframesInRange(0,
+                        in_point)):
+                    interpolator.removeKeyframe(keyframe)
+
+        other.setObjectStart(other.start - region_start)
+
+    def _getPartialFilename(self):
+        return self.region.filename + ".part"
+
+    def _removePartialFile(self):
+        try:
+            os.remove(self._getPartialFilename())
+        except OSError:
+            pass
+
+    def _cleanUp(self):
+        if self.pipeline is None:
+            return
+
+        bus = self.pipeline.get_bus()
+        bus.disconnect_by_func(self._busMessageCb)
+        bus.remove_signal_watch()
+        self.pipeline.set_state(gst.STATE_NULL)
+        self.track.removeAllTrackObjects()
+        self.pipeline = None
+        self.track = None
+
+    def _compositionPadAddedCb(self, composition, pad, queue):
+        sinkpad = queue.get_pad("sink")
+        if not sinkpad.is_linked():
+            pad.link(sinkpad)
+
+    def _busMessageCb(self, bus, message):
+        if message.type == gst.MESSAGE_ASYNC_DONE:
+            self._asyncDone()
+        elif message.type == gst.MESSAGE_EOS:
+            self._cleanUp()
+            os.rename(self._getPartialFilename(), self.region.filename)
+            self.emit("done")
+        elif message.type == gst.MESSAGE_ERROR:
+            error, unused_debug = message.parse_error()
+            self.cancel()
+            self.emit("error", error.message)
+
+    def _asyncDone(self):
+        if not self._seeked:
+            # the copies start at 0, but whatever is after the region isn't
+            # needed
+            self._seeked = True
+            self.pipeline.seek(1.0, gst.FORMAT_TIME,
+                    gst.SEEK_FLAG_FLUSH | gst.SEEK_FLAG_ACCURATE,
+                    gst.SEEK_TYPE_SET, 0,
+                    gst.SEEK_TYPE_SET, self.region.duration)
+        elif not self._ready:
+            self._ready = True
+            if not self.paused:
+                self.pipeline.set_state(gst.STATE_PLAYING)
+
+
+class PrerenderCache(Signallable, Loggable):
+    """
+    Renders the heavy regions of the video tracks of a project while the user
+    is idle, and puts the files in the tracks in place of the objects they
+    were rendered from.
+
+    The files sit above the top level mixer, so that the compositions only
+    decode them where they are. They are named after their L{get_region_key},
+    a region is rendered again only if something in it changes, and undoing
+    an edit finds the previous file again.
+
+    The files take at most C{max_size} bytes on disk. Past that, the least
+    recently used files the timeline doesn't need any more are removed, and
+    no more regions are rendered until enough of them can be. Partial files
+    left by renders which were interrupted are removed on creation.
+
+    Signals:
+     - C{region-rendered} : A region was rendered.
+
+    @ivar directory: Where the rendered files are kept.
+    @ivar max_size: The maximum size of the rendered files, in bytes.
+    @ivar enabled: Whether the regions are rendered and substituted.
+    @ivar idle: Whether nothing happened for L{IDLE_TIMEOUT}.
+    """
+
+    __signals__ = {
+        "region-rendered": ["region"],
+    }
+
+    numobjs = 0
+    caps = gst.Caps("video/x-raw-yuv;video/x-raw-rgb")
+
+    def __init__(self, project, directory=None,
+            max_size=2 * 1024 * 1024 * 1024):
+        Loggable.__init__(self)
+        if directory is None:
+            directory = get_dir(os.path.join(xdg_cache_home(), "pitivi",
+                    "prerender"))
+        self.project = project
+        self.directory = directory
+        self.max_size = max_size
+        self.enabled = True
+        self.idle = False
+        self.renderer = None
+        # (track, start, key) => gnlfilesource
+        self._substitutions = {}
+        self._pending = []
+        self._failed = set()
+        self._idle_id = None
+
+        self._removePartialFiles()
+
+        project.frame_cache.connect("invalidated",
+                self._frameCacheInvalidatedCb)
+        project.pipeline.connect("state-changed",
+                self._pipelineStateChangedCb)
+        project.pipeline.connect("position", self._pipelinePositionCb)
+        self._setBusy()
+
+    def release(self):
+        self.suspend()
+        self.project.frame_cache.disconnect_by_function(
+                self._frameCacheInvalidatedCb)
+        self.project.pipeline.disconnect_by_function(
+                self._pipelineStateChangedCb)
+        self.project.pipeline.disconnect_by_function(
+                self._pipelinePositionCb)
+        self.project = None
+
+    def suspend(self):
+        """
+        Stop rendering and put the original objects back, until L{resume}.
+        """
+        self.enabled = False
+        self.idle = False
+        if self._idle_id is not None:
+            gobject.source_remove(self._idle_id)
+            self._idle_id = None
+        self._cancelRenderer()
+        for substitution in self._substitutions.keys():
+            self._unsubstitute(substitution)
+
+    def resume(self):
+        self.enabled = True
+        self._setBusy()
+
+    def scan(self):
+        """
+        Find the heavy regions, substitute the ones already rendered and
+        queue the others.
+        """
+        caps = self.project.getSettings().getVideoCaps()
+        wanted = {}
+        for track in self.project.timeline.tracks:
+            if not isinstance(track.stream, VideoStream):
+                continue
+            for region in find_heavy_regions(track):
+                region.key = get_region_key(region, caps)
+                region.filename = os.path.join(self.directory,
+                        region.key + ".mkv")
+                wanted[track, region.start, region.key] = region
+
+        for substitution in self._substitutions.keys():
+            if substitution not in wanted:
+                self._unsubstitute(substitution)
+
+        if self.renderer is not None:
+            region = self.renderer.region
+            if (region.track, region.start, region.key) not in wanted:
+                self._cancelRenderer()
+
+        size = self.evict(set(region.filename
+                for region in wanted.itervalues()))
+        if size >= self.max_size:
+            self.debug("the rendered files are over %d bytes, not "
+                    "rendering any more", self.max_size)
+
+        self._pending = []
+        regions = sorted(wanted.iteritems(), key=lambda item: item[0][1])
+        for substitution, region in regions:
+            if substitution in self._substitutions:
+                continue
+            if os.path.exists(region.filename):
+                self._substitute(substitution, region)
+            elif region.key not in self._failed and size < self.max_size:
+                self._pending.append(region)
+
+        self._maybeRenderNext()
+
+    def evict(self, wanted=()):
+        """
+        Remove the least recently used files not in C{wanted} until the
+        rendered files fit in C{max_size}.
+
+        @param wanted: The files to keep whatever their size.
+        @type wanted: C{set} of C{str}
+        @return: The size of the files left, in bytes.
+        @rtype: C{int}
+        """
+        size = 0
+        unwanted = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".mkv"):
+                continue
+            filename = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            size += stat.st_size
+            if filename not in wanted:
+                unwanted.append((stat.st_mtime, stat.st_size, filename))
+
+        unwanted.sort()
+        for unused_mtime, file_size, filename in unwanted:
+            if size <= self.max_size:
+                break
+            self.debug("removing %s", filename)
+            try:
+                os.remove(filename)
+            except OSError, e:
+                self.warning("couldn't remove %s: %s", filename, e)
+                continue
+            size -= file_size
+
+        return size
+
+    def _removePartialFiles(self):
+        for name in os.listdir(self.directory):
+            if not name.endswith(".part"):
+                continue
+            filename = os.path.join(self.directory, name)
+            self.debug("removing the interrupted render %s", filename)
+            try:
+                os.remove(filename)
+            except OSError, e:
+                self.warning("couldn't remove %s: %s", filename, e)
+
+    def _setBusy(self):
+        self.idle = False
+        if self.renderer is not None:
+            self.renderer.pause()
+        if self._idle_id is not None:
+            gobject.source_remove(self._idle_id)
+            self._idle_id = None
+        if self.enabled:
+            self._idle_id = gobject.timeout_add(IDLE_TIMEOUT, self._idleCb)
+
+    def _idleCb(self):
+        self._idle_id = None
+        if self.project.pipeline.getState() == gst.STATE_PLAYING:
+            self._setBusy()
+            return False
+
+        self.idle = True
+        if self.renderer is not None:
+            self.renderer.resume()
+        else:
+            self.scan()
+        return False
+
+    def _maybeRenderNext(self):
+        if self.renderer is not None or not self._pending or \
+                not (self.enabled and self.idle):
+            return
+
+        region = self._pending.pop(0)
+        self.renderer = RegionRenderer(region)
+        self.renderer.connect("done", self._rendererDoneCb)
+        self.renderer.connect("error", self._rendererErrorCb)
+        try:
+            self.renderer.start()
+        except gst.ElementNotFoundError, e:
+            self.warning("can't pre-render: %s", e)
+            self._cancelRenderer()
+            self._failed.add(region.key)
+
+    def _cancelRenderer(self):
+        renderer, self.renderer = self.renderer, None
+        if renderer is not None:
+            renderer.disconnect_by_function(self._rendererDoneCb)
+            renderer.disconnect_by_function(self._rendererErrorCb)
+            renderer.cancel()
+
+    def _substitute(self, substitution, region):
+        self.debug("substituting %s - %s with %s",
+                gst.TIME_ARGS(region.start), gst.TIME_ARGS(region.stop),
+                region.filename)
+        source = gst.element_factory_make("gnlfilesource",
+                "prerendered: %d" % PrerenderCache.numobjs)
+        PrerenderCache.numobjs += 1
+        source.props.location = region.filename
+        try:
+            # keep track of when it was last used, for evict()
+            os.utime(region.filename, None)
+        except OSError:
+            pass
+        source.props.caps = self.caps
+        source.props.start = region.start
+        source.props.duration = region.duration
+        source.props.media_start = 0
+        source.props.media_duration = region.duration
+        # above the top level mixer
+        source.props.priority = 0
+        region.track.composition.add(source)
+        self._substitutions[substitution] = source
+
+    def _unsubstitute(self, substitution):
+        track = substitution[0]
+        source = self._substitutions.pop(substitution)
+        track.composition.remove(source)
+        source.set_state(gst.STATE_NULL)
+
+    def _frameCacheInvalidatedCb(self, frame_cache, start, stop):
+        # what is shown must follow the edit right away
+        for substitution, source in self._substitutions.items():
+            if source.props.start < stop and \
+                    start < source.props.start + source.props.duration:
+                self._unsubstitute(substitution)
+        if self.renderer is not None and \
+                self.renderer.region.overlaps(start, stop):
+            self._cancelRenderer()
+        self._setBusy()
+
+    def _pipelineStateChangedCb(self, pipeline, state):
+        self._setBusy()
+
+    def _pipelinePositionCb(self, pipeline, position):
+        self._setBusy()
+
+    def _rendererDoneCb(self, renderer):
+        self.renderer = None
+        self.emit("region-rendered", renderer.region)
+        if self.idle:
+            self.scan()
+
+    def _rendererErrorCb(self, renderer, message):
+        self.warning("couldn't pre-render %s: %s", renderer.region.filename,
+                message)
+        self.renderer = None
+        self._failed.add(renderer.region.key)
+        self._maybeRenderNext()
@@ -34,6 +34,7 @@ from pitivi.settings import ExportSettings
 from pitivi.signalinterface import Signallable
 from pitivi.action import ViewAction
 from pitivi.utils import Seeker
+from pitivi.framecache import FrameCache
 import gst
 
 class ProjectError(Exception):
@@ -55,6 +56,11 @@ class Project(Signallable, Loggable):
     @type pipeline: L{Pipeline}
     @ivar factory: The timeline factory
     @type factory: L{TimelineSourceFactory}
+    @ivar frame_cache: The frames of the timeline shown recently
+    @type frame_cache: L{FrameCache}
+    @ivar prerender: If set, renders the heavy regions of the timeline in
+    the background.
+    @type prerender: L{PrerenderCache}
     @ivar format: The format under which the project is currently stored.
     @type format: L{FormatterClass}
     @ivar loaded: Whether the project is fully loaded or not.
@@ -96,10 +102,20 @@ class Project(Signallable, Loggable):
         self.view_action.addProducers(self.factory)
         self.seeker = Seeker(80)
 
+        self.frame_cache = FrameCache()
+        self.frame_cache.connectToTimeline(self.timeline)
+        self.pipeline.setFrameCache(self.frame_cache)
+        self.view_action.frame_cache = self.frame_cache
+        self.prerender = None
+
         settings = self.getSettings()
         self._videocaps = settings.getVideoCaps()
 
     def release(self):
+        if self.prerender is not None:
+            self.prerender.release()
+            self.prerender = None
+        self.frame_cache.disconnectFromTimeline()
         self.pipeline.release()
         self.pipeline = None
 
@@ -197,6 +213,7 @@ class Project(Signallable, Loggable):
 
         for fact in self.sources.getSources():
             fact.setFilterCaps(self._videocaps)
+        self.frame_cache.clear()
         if self.pipeline.getState() != gst.STATE_NULL:
             self.pipeline.stop()
             self.pipeline.pause()
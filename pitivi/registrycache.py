@@ -0,0 +1,164 @@
+# PiTiVi , Non-linear video editor
+#
+#       pitivi/registrycache.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Persistent cache of the data PiTiVi extracts from the GStreamer registry.
+"""
+
+import os
+import errno
+import hashlib
+import cPickle
+
+import gst
+import xdg.BaseDirectory as xdg_dirs
+
+from pitivi.log.loggable import Loggable
+
+# bump this whenever the format of a cached entry changes
+CACHE_FORMAT = 1
+
+
+def get_registry_key(registry=None):
+    """
+    Returns a C{str} identifying the set of installed plugins. It changes
+    whenever a plugin is added, removed or upgraded.
+    """
+    if registry is None:
+        registry = gst.registry_get_default()
+
+    plugins = [(plugin.get_name(), plugin.get_version(),
+            plugin.get_filename() or "")
+            for plugin in registry.get_plugin_list()]
+    plugins.sort()
+
+    md5sum = hashlib.md5()
+    md5sum.update(str(CACHE_FORMAT))
+    for plugin in plugins:
+        md5sum.update("\0".join(plugin) + "\n")
+
+    return md5sum.hexdigest()
+
+
+class RegistryCache(Loggable):
+    """
+    Keeps values computed from the GStreamer registry across runs.
+
+    Values are built by a callable the first time they are requested and
+    saved to disk along with the registry key. They are rebuilt as soon as
+    the set of installed plugins changes.
+
+    Values must be picklable, so store element factory names rather than
+    the factories themselves.
+    """
+
+    def __init__(self, filename=None, registry=None):
+        Loggable.__init__(self)
+        if filename is None:
+            filename = os.path.join(xdg_dirs.xdg_cache_home, "pitivi",
+                    "registry.cache")
+        if registry is None:
+            registry = gst.registry_get_default()
+
+        self.filename = filename
+        self._registry = registry
+        self._registry.connect("feature-added", self._registryFeatureAddedCb)
+        self._key = None
+        self._entries = None
+
+    def get(self, name, builder):
+        """
+        Returns the cached value for name, calling builder to compute it if
+        it's not in the cache yet.
+
+        @param name: The name of the entry.
+        @type name: C{str}
+        @param builder: A callable taking no argument and returning the value.
+        """
+        if self._entries is None:
+            self._load()
+
+        try:
+            return self._entries[name]
+        except KeyError:
+            pass
+
+        self.debug("building %s", name)
+        value = builder()
+        self._entries[name] = value
+        self._save()
+
+        return value
+
+    def invalidate(self):
+        """Forget all the cached values."""
+        self._key = None
+        self._entries = None
+
+    def _load(self):
+        self._key = get_registry_key(self._registry)
+        self._entries = {}
+
+        try:
+            cache_file = open(self.filename, "rb")
+            try:
+                key, entries = cPickle.load(cache_file)
+            finally:
+                cache_file.close()
+        except (IOError, EOFError, ValueError, TypeError,
+                cPickle.UnpicklingError), e:
+            self.debug("couldn't load %s: %s", self.filename, e)
+            return
+
+        if key != self._key:
+            self.info("registry changed, discarding %s", self.filename)
+            return
+
+        self._entries = entries
+
+    def _save(self):
+        directory = os.path.dirname(self.filename)
+        temp_filename = self.filename + ".tmp"
+        try:
+            try:
+                os.makedirs(directory)
+            except OSError, e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+            cache_file = open(temp_filename, "wb")
+            try:
+                cPickle.dump((self._key, self._entries), cache_file,
+                        cPickle.HIGHEST_PROTOCOL)
+            finally:
+                cache_file.close()
+            os.rename(temp_filename, self.filename)
+        except (IOError, OSError), e:
+            self.warning("couldn't save %s: %s", self.filename, e)
+
+    def _registryFeatureAddedCb(self, registry, feature):
+        self.invalidate()
+
+
+_registry_cache = None
+def registrycache():
+    global _registry_cache
+    if _registry_cache is None:
+        _registry_cache = RegistryCache()
+    return _registry_cache
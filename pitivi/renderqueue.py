@@ -0,0 +1,441 @@
+# PiTiVi , Non-linear video editor
+#
+#       pitivi/renderqueue.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Headless rendering of a queue of projects.
+
+This module must not import gtk or anything from pitivi.ui, it's used on
+machines without a display.
+"""
+
+import os
+import sys
+import time
+import shlex
+from gettext import gettext as _
+from optparse import OptionParser
+from urllib import quote
+
+import gobject
+
+from pitivi.signalinterface import Signallable
+from pitivi.log.loggable import Loggable
+from pitivi.actioner import Renderer
+from pitivi.effects import EffectsHandler
+from pitivi.projectmanager import ProjectManager
+
+(JOB_PENDING,
+ JOB_LOADING,
+ JOB_RENDERING,
+ JOB_DONE,
+ JOB_FAILED) = range(5)
+
+STATE_NAMES = ["pending", "loading", "rendering", "done", "failed"]
+
+# exit codes of the jobs
+EXIT_OK = 0
+EXIT_LOAD_ERROR = 2
+EXIT_RENDER_ERROR = 3
+
+
+class ManifestError(Exception):
+    pass
+
+
+def path_to_uri(path):
+    if "://" in path:
+        return path
+    return "file://" + quote(os.path.abspath(path))
+
+
+def parse_manifest(lines):
+    """
+    Parses a render manifest.
+
+    Each line holds a project file and the file to render it to, separated
+    by whitespace. Paths containing spaces must be quoted. Empty lines and
+    lines starting with C{#} are ignored.
+
+    @param lines: The lines of the manifest.
+    @type lines: iterable of C{str}
+    @return: The (project URI, output URI) pairs.
+    @rtype: C{list} of C{tuple}
+    @raise ManifestError: If a line is invalid.
+    """
+    entries = []
+    for number, line in enumerate(lines):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+
+        try:
+            fields = shlex.split(line)
+        except ValueError, e:
+            raise ManifestError("line %d: %s" % (number + 1, e))
+        if len(fields) != 2:
+            raise ManifestError("line %d: expected a project and an output"
+                    % (number + 1))
+
+        entries.append((path_to_uri(fields[0]), path_to_uri(fields[1])))
+
+    return entries
+
+
+class RenderLog(object):
+    """
+    Writes render events to a file, one per line, as tab separated
+    C{key=value} fields. The first two fields are always C{time}, the wall
+    clock time, and C{event}.
+    """
+
+    def __init__(self, output):
+        self.output = output
+
+    def write(self, event, **fields):
+        items = [("time", "%.3f" % time.time()), ("event", event)]
+        items.extend(sorted(fields.iteritems()))
+        line = "\t".join("%s=%s" % (key, self._formatValue(value))
+                for key, value in items)
+        self.output.write(line + "\n")
+        self.output.flush()
+
+    def _formatValue(self, value):
+        if value is None:
+            return ""
+        if isinstance(value, float):
+            return "%.3f" % value
+        return str(value).replace("\t", " ").replace("\n", " ")
+
+
+class RenderJob(Signallable, Loggable):
+    """
+    Loads a project and renders it.
+
+    Signals:
+     - C{started} : The job started.
+     - C{progress} : The render progressed.
+     - C{done} : The job is over, successful or not.
+
+    @ivar exit_code: C{EXIT_OK}, C{EXIT_LOAD_ERROR} or C{EXIT_RENDER_ERROR}.
+    @ivar fraction: The rendered fraction of the project.
+    @ivar eta: The estimated remaining time in seconds, or C{None}.
+    @ivar profiler: The measures of the pipeline elements, if profiling.
+    @type profiler: L{PipelineProfiler}
+    """
+
+    __signals__ = {
+        "started": [],
+        "progress": [],
+        "done": [],
+    }
+
+    def __init__(self, number, project_uri, output_uri, effects,
+            profile=False):
+        Loggable.__init__(self)
+        self.number = number
+        self.project_uri = project_uri
+        self.output_uri = output_uri
+        self.effects = effects
+        self.profile = profile
+        self.profiler = None
+        self.state = JOB_PENDING
+        self.exit_code = None
+        self.error = None
+        self.fraction = 0.0
+        self.eta = None
+        self.start_time = None
+        self.render_start_time = None
+        self.end_time = None
+        self.project = None
+        self.renderer = None
+        self._project_manager = None
+
+    def getWallTime(self):
+        if self.start_time is None:
+            return None
+        end_time = self.end_time
+        if end_time is None:
+            end_time = time.time()
+        return end_time - self.start_time
+
+    def getLoadTime(self):
+        if self.start_time is None or self.render_start_time is None:
+            return None
+        return self.render_start_time - self.start_time
+
+    def start(self):
+        self.state = JOB_LOADING
+        self.start_time = time.time()
+        self.emit("started")
+
+        self._project_manager = ProjectManager(self.effects)
+        self._project_manager.connect("new-project-loaded",
+                self._projectLoadedCb)
+        self._project_manager.connect("new-project-failed",
+                self._projectFailedCb)
+        self._project_manager.loadProject(self.project_uri)
+
+    def _projectLoadedCb(self, manager, project):
+        self.project = project
+        self.state = JOB_RENDERING
+        self.render_start_time = time.time()
+        self.renderer = HeadlessRenderer(self, project,
+                outfile=self.output_uri, profile=self.profile)
+        if not (self.renderer.have_video or self.renderer.have_audio):
+            self._finish(EXIT_RENDER_ERROR, "nothing to render")
+            return
+
+        project.pipeline.connect("error", self._pipelineErrorCb)
+        self.renderer.connect("eos", self._rendererEosCb)
+        self.renderer.connect("profile", self._rendererProfileCb)
+        project.pipeline.activatePositionListener()
+        self.renderer.startAction()
+
+    def _projectFailedCb(self, manager, uri, exception):
+        self._finish(EXIT_LOAD_ERROR, exception)
+
+    def _pipelineErrorCb(self, pipeline, error, detail):
+        self.error = error
+
+    def _rendererEosCb(self, renderer):
+        self.fraction = 1.0
+        self.eta = 0.0
+        self._finish(EXIT_OK)
+
+    def _rendererProfileCb(self, renderer, profiler):
+        self.profiler = profiler
+
+    def _renderFailed(self):
+        self._finish(EXIT_RENDER_ERROR, self.error)
+
+    def _renderProgressed(self, fraction):
+        self.fraction = fraction
+        elapsed = time.time() - self.render_start_time
+        if fraction > 0:
+            self.eta = elapsed / fraction - elapsed
+        self.emit("progress")
+
+    def _finish(self, exit_code, error=None):
+        if self.state in (JOB_DONE, JOB_FAILED):
+            return
+
+        self.end_time = time.time()
+        self.exit_code = exit_code
+        if error is not None:
+            self.error = error
+        if exit_code == EXIT_OK:
+            self.state = JOB_DONE
+        else:
+            self.state = JOB_FAILED
+
+        if self.project is not None:
+            self.project.pipeline.disconnect_by_function(
+                    self._pipelineErrorCb)
+            self.project.release()
+            self.project = None
+        self.renderer = None
+        self._project_manager = None
+
+        self.emit("done")
+
+
+class HeadlessRenderer(Renderer):
+    """ A L{Renderer} reporting to a L{RenderJob} instead of a UI. """
+
+    def __init__(self, job, project, pipeline=None, outfile=None,
+            profile=None):
+        self.job = job
+        Renderer.__init__(self, project, pipeline, outfile, profile)
+
+    def updatePosition(self, fraction, text):
+        self.job._renderProgressed(fraction)
+
+    def updateUIOnError(self):
+        self.job._renderFailed()
+
+
+class RenderQueue(Signallable, Loggable):
+    """
+    Runs L{RenderJob}s, at most C{max_jobs} at a time, and writes what
+    happens to a L{RenderLog}.
+
+    Signals:
+     - C{done} : All the jobs are over.
+    """
+
+    __signals__ = {
+        "done": [],
+    }
+
+    def __init__(self, entries, effects, max_jobs=1, log=None,
+            progress_interval=1.0, profile=False):
+        """
+        @param entries: The (project URI, output URI) pairs to render.
+        @param effects: The effects known to the formatter.
+        @type effects: L{EffectsHandler}
+        @param max_jobs: The number of renders to run concurrently.
+        @type max_jobs: C{int}
+        @param log: Where to write the events.
+        @type log: L{RenderLog}
+        @param progress_interval: The minimal time in seconds between two
+        progress events of a job in the log.
+        @type progress_interval: C{float}
+        @param profile: Whether to log the measures of the pipeline elements
+        of each job.
+        @type profile: C{bool}
+        """
+        Loggable.__init__(self)
+        self.jobs = [RenderJob(number, project_uri, output_uri, effects,
+                profile) for number, (project_uri, output_uri) in enumerate(entries)]
+        self.max_jobs = max(1, max_jobs)
+        self.log_ = log
+        self.progress_interval = progress_interval
+        self.start_time = None
+        self.end_time = None
+        self._pending = list(self.jobs)
+        self._running = []
+        self._last_progress = {}
+
+    def start(self):
+        self.start_time = time.time()
+        self._log("queue-started", jobs=len(self.jobs),
+                max_jobs=self.max_jobs)
+        gobject.idle_add(self._startJobs)
+
+    def getExitCode(self):
+        """ Returns 0 if all the jobs succeeded, 1 otherwise. """
+        for job in self.jobs:
+            if job.exit_code != EXIT_OK:
+                return 1
+        return 0
+
+    def _startJobs(self):
+        while self._pending and len(self._running) < self.max_jobs:
+            job = self._pending.pop(0)
+            self._running.append(job)
+            job.connect("progress", self._jobProgressCb)
+            job.connect("done", self._jobDoneCb)
+            self._log("job-started", job=job.number,
+                    project=job.project_uri, output=job.output_uri)
+            job.start()
+
+        if not self._pending and not self._running and \
+                self.end_time is None:
+            self._finish()
+
+        return False
+
+    def _jobProgressCb(self, job):
+        now = time.time()
+        last = self._last_progress.get(job, 0)
+        if now - last < self.progress_interval:
+            return
+
+        self._last_progress[job] = now
+        self._log("job-progress", job=job.number, fraction=job.fraction,
+                eta=job.eta)
+
+    def _jobDoneCb(self, job):
+        job.disconnect_by_function(self._jobProgressCb)
+        job.disconnect_by_function(self._jobDoneCb)
+        self._running.remove(job)
+        self._last_progress.pop(job, None)
+        self._log("job-done", job=job.number, state=STATE_NAMES[job.state],
+                exit_code=job.exit_code, error=job.error,
+                wall_time=job.getWallTime(), load_time=job.getLoadTime())
+        if job.profiler is not None:
+            self._logProfile(job)
+        # don't start the next job from the signal handlers of this one
+        gobject.idle_add(self._startJobs)
+
+    def _logProfile(self, job):
+        for stats in job.profiler.getReport():
+            self._log("job-profile", job=job.number, element=stats.name,
+                    factory=stats.factory_name, buffers=stats.buffers,
+                    bytes=stats.bytes, buffer_rate=stats.getBufferRate(),
+                    speed=stats.getSpeed(),
+                    processing_time=stats.processing_time,
+                    max_processing_time=stats.max_processing_time,
+                    mean_level=stats.getMeanLevel(),
+                    max_level=stats.max_level_buffers)
+
+    def _finish(self):
+        self.end_time = time.time()
+        failed = len([job for job in self.jobs if job.exit_code != EXIT_OK])
+        wall_times = [job.getWallTime() for job in self.jobs
+                if job.getWallTime() is not None]
+        self._log("queue-done", jobs=len(self.jobs),
+                succeeded=len(self.jobs) - failed, failed=failed,
+                wall_time=self.end_time - self.start_time,
+                job_wall_time=sum(wall_times),
+                max_job_wall_time=max(wall_times or [0.0]))
+        self.emit("done")
+
+    def _log(self, event, **fields):
+        if self.log_ is not None:
+            self.log_.write(event, **fields)
+
+
+usage = _("""
+      %prog --render-queue [-j JOBS] [-l LOG_FILE] [-p] MANIFEST""")
+
+description = _("""Renders the projects listed in MANIFEST without any user
+interface. Each line of MANIFEST holds a project file and the file to render it
+to. Events are written to LOG_FILE, or to the standard output.""")
+
+
+def main(argv):
+    parser = OptionParser(usage, description=description)
+    parser.add_option("--render-queue", action="store_true", default=False,
+            help=_("Run the render queue"))
+    parser.add_option("-j", "--jobs", type="int", default=1,
+            help=_("Number of projects rendered at the same time"))
+    parser.add_option("-l", "--log", dest="log_file", default=None,
+            help=_("File the events are written to"))
+    parser.add_option("-p", "--profile", action="store_true", default=False,
+            help=_("Log the throughput of each element of the pipelines"))
+    options, args = parser.parse_args(argv[1:])
+    if len(args) != 1:
+        parser.error("a manifest is required")
+
+    try:
+        manifest = open(args[0])
+        try:
+            entries = parse_manifest(manifest)
+        finally:
+            manifest.close()
+    except (IOError, ManifestError), e:
+        parser.error("couldn't read the manifest: %s" % e)
+
+    if options.log_file is None:
+        output = sys.stdout
+    else:
+        output = open(options.log_file, "a")
+
+    mainloop = gobject.MainLoop()
+    queue = RenderQueue(entries, EffectsHandler(), options.jobs,
+            RenderLog(output), profile=options.profile)
+    queue.connect("done", lambda queue: mainloop.quit())
+    queue.start()
+    mainloop.run()
+
+    if output is not sys.stdout:
+        output.close()
+
+    return queue.getExitCode()
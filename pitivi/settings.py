@@ -26,6 +26,7 @@ Settings
 
 import os
 import platform
+import weakref
 import gst
 from ConfigParser import SafeConfigParser, ParsingError
 import xdg.BaseDirectory as xdg_dirs  # Freedesktop directories spec
@@ -140,13 +141,18 @@ class GlobalSettings(Signallable):
     addConfigOption() class method during initialization.
 
     @cvar options: A dictionnary of available settings.
+    @cvar environment_options: The settings which are only read from an
+    environment variable, as they aren't saved.
     @cvar environment: A list of the controlled environment variables.
     """
 
     options = {}
+    environment_options = {}
     environment = set()
     defaults = {}
     __signals__ = {}
+    # the settings read so far, which get the options added afterwards
+    _instances = weakref.WeakKeyDictionary()
 
     def __init__(self, **kwargs):
         Signallable.__init__(self)
@@ -154,6 +160,7 @@ class GlobalSettings(Signallable):
         self._readSettingsFromGlobalConfiguration()
         self._readSettingsFromConfigurationFile()
         self._readSettingsFromEnvironmentVariables()
+        self._instances[self] = True
 
     def _readSettingsFromGlobalConfiguration(self):
         # ideally, this should read settings from GConf for ex
@@ -172,31 +179,48 @@ class GlobalSettings(Signallable):
 
         for (section, attrname, typ, key, env,
             value) in self.iterAllOptions():
-            if not self._config.has_section(section):
-                continue
-            if key and self._config.has_option(section, key):
-                if typ == int or typ == long:
-                    # WARNING/FIXME : This try/except is for a small cockup in previous
-                    # configurations where we stored a float value... but declared it
-                    # as an integer.
-                    try:
-                        value = self._config.getint(section, key)
-                    except ValueError:
-                        value = int(self._config.getfloat(section, key))
-                elif typ == float:
-                    value = self._config.getfloat(section, key)
-                elif typ == bool:
-                    value = self._config.getboolean(section, key)
-                else:
-                    value = self._config.get(section, key)
-                setattr(self, attrname, value)
+            self._readOption(section, attrname, typ, key)
+
+    def _readOption(self, section, attrname, typ, key):
+        if not self._config.has_section(section):
+            return
+        if key and self._config.has_option(section, key):
+            if typ == int or typ == long:
+                # WARNING/FIXME : This try/except is for a small cockup in previous
+                # configurations where we stored a float value... but declared it
+                # as an integer.
+                try:
+                    value = self._config.getint(section, key)
+                except ValueError:
+                    value = int(self._config.getfloat(section, key))
+            elif typ == float:
+                value = self._config.getfloat(section, key)
+            elif typ == bool:
+                value = self._config.getboolean(section, key)
+            else:
+                value = self._config.get(section, key)
+            setattr(self, attrname, value)
 
     def _readSettingsFromEnvironmentVariables(self):
         for (section, attrname, typ, key, env,
             value) in self.iterAllOptions():
-            var = get_env_by_type(typ, env)
-            if var is not None:
-                setattr(self, attrname, value)
+            self._readEnvironmentOption(attrname, typ, env)
+        for attrname, (typ, env) in self.environment_options.iteritems():
+            self._readEnvironmentOption(attrname, typ, env)
+
+    def _readEnvironmentOption(self, attrname, typ, env):
+        var = get_env_by_type(typ, env)
+        if var is not None:
+            setattr(self, attrname, var)
+
+    def _readLateOption(self, attrname, typ, section, key, env, notify):
+        # the option was registered by a module imported after the settings
+        # were read
+        if notify and hasattr(self, "_signal_group"):
+            self._signal_group.handlers[attrname + "Changed"] = []
+        if section and key:
+            self._readOption(section, attrname, typ, key)
+        self._readEnvironmentOption(attrname, typ, env)
 
     def _writeSettingsToConfigurationFile(self):
         pitivi_path = self.get_local_settings_path()
@@ -301,9 +325,9 @@ class GlobalSettings(Signallable):
         """
         Add a configuration option.
 
-        This function should be called during module initialization, before
-        the config file is read. Only options registered before the config
-        file is read will be loaded.
+        This function should be called during module initialization. Options
+        registered by modules imported after the config file is read are
+        loaded into the existing settings when they are added.
 
         see pitivi/ui/mainwindow.py, pitivi/ui/sourcelist.py for examples of
         usage.
@@ -349,8 +373,13 @@ class GlobalSettings(Signallable):
             setattr(cls, attrname, default)
         if section and key:
             cls.options[section][attrname] = type_, key, environment
+        elif environment:
+            cls.environment_options[attrname] = type_, environment
         cls.environment.add(environment)
         cls.defaults[attrname] = default
+        for settings in cls._instances.keys():
+            settings._readLateOption(attrname, type_, section, key,
+                    environment, notify)
 
     @classmethod
     def addConfigSection(cls, section):
@@ -43,7 +43,11 @@ class SourceList(Signallable, Loggable):
 
     Signals:
      - C{source-added} : A source has been discovered and added to the SourceList.
+     - C{uris-added} : A batch of uris was queued for discovery by
+       L{addUriBatch}.
      - C{source-removed} : A source was removed from the SourceList.
+     - C{thumbnail-done} : The thumbnail of a source was made after the source
+       was added.
      - C{missing-plugins} : A source has been discovered but some plugins are
        missing in order to decode all of its streams.
      - C{discovery-error} : The given uri is not a media file.
@@ -56,7 +60,9 @@ class SourceList(Signallable, Loggable):
         "starting" : [],
         "missing-plugins": ["uri", "factory", "details", "descriptions"],
         "source-added" : ["factory"],
+        "uris-added" : ["uris"],
         "source-removed" : ["uri"],
+        "thumbnail-done" : ["factory"],
         "discovery-error" : ["uri", "reason"],
         }
 
@@ -69,6 +75,7 @@ class SourceList(Signallable, Loggable):
         self.discoverer = self.discovererClass()
         self.discoverer.connect("discovery-error", self._discoveryErrorCb)
         self.discoverer.connect("discovery-done", self._discoveryDoneCb)
+        self.discoverer.connect("thumbnail-done", self._thumbnailDoneCb)
         self.discoverer.connect("starting", self._discovererStartingCb)
         self.discoverer.connect("ready", self._discovererReadyCb)
         self.discoverer.connect("missing-plugins",
@@ -97,6 +104,28 @@ class SourceList(Signallable, Loggable):
         for uri in uris:
             self.addUri(uri)
 
+    def addUriBatch(self, uris):
+        """
+        Add the c{uris} that aren't in the source list yet.
+
+        Unlike L{addUris}, uris that are already present are skipped, the
+        discoverer is fed the whole batch at once and C{uris-added} is
+        emitted once for the batch.
+
+        @returns: The list of uris that were added.
+        """
+        added = []
+        for uri in uris:
+            if uri not in self._sources:
+                self._sources[uri] = None
+                added.append(uri)
+
+        if added:
+            self.discoverer.addUris(added)
+            self.emit("uris-added", added)
+
+        return added
+
     def removeUri(self, uri):
         """
         Remove the factory for c{uri} from the source list.
@@ -151,6 +180,13 @@ class SourceList(Signallable, Loggable):
 
         self.addFactory(factory)
 
+    def _thumbnailDoneCb(self, discoverer, uri, factory):
+        if self._sources.get(uri) is not factory:
+            # the source was removed since
+            return
+
+        self.emit("thumbnail-done", factory)
+
     def _discoveryErrorCb(self, discoverer, uri, reason, extra):
         try:
             del self._sources[uri]
@@ -0,0 +1,68 @@
+# PiTiVi , Non-linear video editor
+#
+#       pitivi/startuptimer.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Timing of the startup phases
+"""
+
+import time
+
+
+class StartupTimer(object):
+    """
+    Measures how long each phase of the startup takes. Phases can be nested,
+    for instance when a subsystem is initialized on first use by another one.
+
+    @ivar start_time: When the startup began.
+    @ivar phases: The (depth, name, seconds) of each finished phase, a phase
+    coming before the ones nested in it.
+    """
+
+    def __init__(self, start_time=None, clock=time.time):
+        self._clock = clock
+        if start_time is None:
+            start_time = clock()
+        self.start_time = start_time
+        self.phases = []
+        self._stack = []
+
+    def begin(self, name):
+        self._stack.append((name, self._clock(), len(self.phases)))
+
+    def end(self):
+        name, start, index = self._stack.pop()
+        self.phases.insert(index,
+                (len(self._stack), name, self._clock() - start))
+
+    def getReport(self):
+        """
+        @return: The time taken by each phase, and since the startup began.
+        @rtype: C{str}
+        """
+        lines = []
+        for depth, name, seconds in self.phases:
+            lines.append("%-40s %8.1f ms" % ("  " * depth + name,
+                    seconds * 1000))
+        lines.append("%-40s %8.1f ms" % ("total",
+                (self._clock() - self.start_time) * 1000))
+        return "\n".join(lines)
+
+
+# the timer of the running application, started as soon as possible
+startup_timer = StartupTimer()
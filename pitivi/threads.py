@@ -23,91 +23,295 @@ Threading support
 """
 
 import threading
+import time
+from collections import deque
+
+import gobject
+
 from pitivi.signalinterface import Signallable
 from pitivi.log.loggable import Loggable
 
-#
-# Following code was freely adapted by code from:
-#   John Stowers <john.stowers@gmail.com>
-#
+# job priority classes, from the most to the least urgent
+(INTERACTIVE, BACKGROUND, BULK) = range(3)
+
+PRIORITY_NAMES = {
+    INTERACTIVE: "interactive",
+    BACKGROUND: "background",
+    BULK: "bulk",
+}
+
+(JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_CANCELLED) = range(4)
+
 
-class Thread(threading.Thread, Signallable, Loggable):
+def cpu_count():
+    """ Returns the number of CPUs, or 1 if it can't be found """
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return 1
+
+
+class Job(Signallable, Loggable):
     """
-    Event-powered thread
+    A unit of work run by a L{JobExecutor} in one of its worker threads.
+
+    Subclasses implement L{process}. Long jobs should check L{isCancelled}
+    regularly and return early once it is set, cancellation is cooperative.
+
+    Signals:
+     - C{done} : The job finished, failed or was cancelled. Always emitted
+       from the main loop.
+
+    @ivar priority: One of C{INTERACTIVE}, C{BACKGROUND} or C{BULK}.
+    @ivar state: One of C{JOB_PENDING}, C{JOB_RUNNING}, C{JOB_DONE} or
+    C{JOB_CANCELLED}.
+    @ivar result: What L{process} returned.
+    @ivar error: The exception L{process} raised, if any.
     """
 
     __signals__ = {
-        "done" : None
-        }
+        "done": [],
+    }
 
-    def __init__(self):
-        threading.Thread.__init__(self)
+    def __init__(self, priority=BACKGROUND):
         Loggable.__init__(self)
-
-    def stop(self):
-        """ stop the thread, do not override """
-        self.abort()
-        self.emit("done")
-
-    def run(self):
-        """ thread processing """
-        self.process()
-        self.emit("done")
+        self.priority = priority
+        self.state = JOB_PENDING
+        self.result = None
+        self.error = None
+        self._cancelled = threading.Event()
 
     def process(self):
-        """ Implement this in subclasses """
+        """ Implement this in subclasses. Runs in a worker thread. """
         raise NotImplementedError
 
     def abort(self):
-        """ Abort the thread. Subclass have to implement this method ! """
+        """ Called when the job is cancelled, override to interrupt it """
         pass
 
-class CallbackThread(Thread):
+    def cancel(self):
+        """ Cancel the job. Pending jobs are never run. """
+        self._cancelled.set()
+        self.abort()
+
+    def isCancelled(self):
+        return self._cancelled.isSet()
+
+
+class CallbackJob(Job):
+    """ A L{Job} calling the given function with the given arguments """
 
     def __init__(self, callback, *args, **kwargs):
+        priority = kwargs.pop("priority", BACKGROUND)
+        Job.__init__(self, priority)
         self.callback = callback
         self.args = args
         self.kwargs = kwargs
-        Thread.__init__(self)
 
     def process(self):
-        self.callback(*self.args, **self.kwargs)
+        return self.callback(*self.args, **self.kwargs)
 
-class ThreadMaster(Loggable):
+
+class JobQueueStats(object):
     """
-    Controls all thread existing in pitivi
+    Counters of a L{JobExecutor} queue. Times are in seconds.
     """
 
     def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.running = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    def getMeanWait(self):
+        started = self.completed + self.failed + self.running
+        if not started:
+            return 0.0
+        return self.total_wait / started
+
+    def getMeanRun(self):
+        finished = self.completed + self.failed
+        if not finished:
+            return 0.0
+        return self.total_run / finished
+
+
+class JobExecutor(Loggable):
+    """
+    Runs L{Job}s on a fixed number of worker threads.
+
+    Jobs are picked by priority class, then in submission order. Only
+    C{workers - 1} jobs of the lower classes can run at the same time (and
+    half the workers for C{BULK} jobs) so that there's always a thread
+    ready for interactive work. There are at least two workers, even with a
+    single CPU, for the same reason.
+    """
+
+    def __init__(self, workers=None):
         Loggable.__init__(self)
-        self.threads = []
-
-    def addThread(self, threadclass, *args):
-        """ Start the given Thread """
-        # IDEA : We might need a limit of concurrent threads ?
-        # ... or some priorities ?
-        # FIXME : we should only accept subclasses of our Thread class
-        self.log("Adding thread of type %r", threadclass)
-        thread = threadclass(*args)
-        thread.connect("done", self._threadDoneCb)
-        self.threads.append(thread)
-        self.log("starting it...")
+        if workers is None:
+            workers = cpu_count()
+        self.workers = max(2, workers)
+        self.limits = {
+            INTERACTIVE: self.workers,
+            BACKGROUND: self.workers - 1,
+            BULK: max(1, self.workers / 2),
+        }
+        self._condition = threading.Condition()
+        self._queues = dict((priority, deque()) for priority in PRIORITY_NAMES)
+        self._stats = dict((priority, JobQueueStats())
+                for priority in PRIORITY_NAMES)
+        self._running = set()
+        self._threads = []
+        self._stopping = False
+
+    def submit(self, job):
+        """
+        Queue the given job. Its C{done} signal will be emitted from the main
+        loop once it's over.
+
+        @type job: L{Job}
+        @returns: The job.
+        """
+        self._condition.acquire()
+        try:
+            if self._stopping:
+                raise RuntimeError("executor is shut down")
+
+            job._submit_time = time.time()
+            self._queues[job.priority].append(job)
+            self._stats[job.priority].submitted += 1
+            if len(self._threads) < self.workers:
+                self._startWorker()
+            self._condition.notify()
+        finally:
+            self._condition.release()
+
+        return job
+
+    def getStats(self, priority):
+        """
+        @returns: The L{JobQueueStats} of the given priority class.
+        """
+        return self._stats[priority]
+
+    def getQueueDepth(self, priority):
+        """
+        @returns: The number of jobs of the given class waiting to run.
+        """
+        self._condition.acquire()
+        try:
+            return len(self._queues[priority])
+        finally:
+            self._condition.release()
+
+    def shutdown(self):
+        """ Cancel all the jobs and stop the worker threads """
+        self.log("stopping all jobs")
+        self._condition.acquire()
+        try:
+            self._stopping = True
+            for queue in self._queues.itervalues():
+                for job in queue:
+                    job.cancel()
+            for job in self._running:
+                job.cancel()
+            self._condition.notifyAll()
+        finally:
+            self._condition.release()
+
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _startWorker(self):
+        thread = threading.Thread(target=self._work)
+        thread.setDaemon(True)
+        self._threads.append(thread)
         thread.start()
-        self.log("started !")
-
-    def _threadDoneCb(self, thread):
-        self.log("thread %r is done", thread)
-        self.threads.remove(thread)
-
-    def stopAllThreads(self):
-        """ Stop all running Thread(s) controlled by this master """
-        self.log("stopping all threads")
-        joinedthreads = 0
-        while(joinedthreads < len(self.threads)):
-            for thread in self.threads:
-                self.log("Trying to stop thread %r", thread)
-                try:
-                    thread.join()
-                    joinedthreads += 1
-                except:
-                    self.warning("what happened ??")
+
+    def _nextJob(self):
+        # called with the lock held
+        for priority in sorted(self._queues):
+            queue = self._queues[priority]
+            stats = self._stats[priority]
+
+            # drop jobs that were cancelled while waiting
+            while queue and queue[0].isCancelled():
+                job = queue.popleft()
+                job.state = JOB_CANCELLED
+                stats.cancelled += 1
+                gobject.idle_add(self._jobDoneCb, job)
+
+            if not queue:
+                continue
+
+            running = sum(self._stats[other].running
+                    for other in self._queues if other >= priority)
+            if running >= self.limits[priority]:
+                continue
+
+            return queue.popleft()
+
+        return None
+
+    def _work(self):
+        while True:
+            self._condition.acquire()
+            try:
+                job = self._nextJob()
+                while job is None:
+                    if self._stopping:
+                        return
+                    self._condition.wait()
+                    job = self._nextJob()
+
+                stats = self._stats[job.priority]
+                wait = time.time() - job._submit_time
+                stats.total_wait += wait
+                stats.max_wait = max(stats.max_wait, wait)
+                stats.running += 1
+                job.state = JOB_RUNNING
+                self._running.add(job)
+            finally:
+                self._condition.release()
+
+            self._runJob(job)
+
+    def _runJob(self, job):
+        start = time.time()
+        try:
+            job.result = job.process()
+        except Exception, e:
+            self.warning("job %r failed: %s", job, e)
+            job.error = e
+
+        self._condition.acquire()
+        try:
+            stats = self._stats[job.priority]
+            stats.running -= 1
+            stats.total_run += time.time() - start
+            if job.error is not None:
+                stats.failed += 1
+            else:
+                stats.completed += 1
+            if job.isCancelled():
+                job.state = JOB_CANCELLED
+            else:
+                job.state = JOB_DONE
+            self._running.discard(job)
+            # a slot was freed for the lower classes
+            self._condition.notifyAll()
+        finally:
+            self._condition.release()
+
+        gobject.idle_add(self._jobDoneCb, job)
+
+    def _jobDoneCb(self, job):
+        job.emit("done")
+        return False
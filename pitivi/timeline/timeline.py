@@ -20,7 +20,7 @@
 # Free Software Foundation, Inc., 59 Temple Place - Suite 330,
 # Boston, MA 02111-1307, USA.
 
-from bisect import bisect_left
+from bisect import bisect_left, bisect_right, insort
 
 from pitivi.signalinterface import Signallable
 from pitivi.log.loggable import Loggable
@@ -687,6 +687,8 @@ class TimelineEdges(object):
         self.by_object = {}
         self.changed_objects = {}
         self.enable_updates = True
+        # objects whose values are left out of self.edges
+        self.hidden = set()
 
     def addTimelineObject(self, timeline_object):
         """
@@ -756,7 +758,10 @@ class TimelineEdges(object):
             start = track_object.start
             end = track_object.start + track_object.duration
 
-        self.removeStartEnd(start, end)
+        if track_object in self.hidden:
+            self.hidden.remove(track_object)
+        else:
+            self.removeStartEnd(start, end)
 
         # remove start and end from self.by_start, self.by_end and self.by_time
         for time, time_dict in ((start, self.by_start), (end, self.by_end),
@@ -840,6 +845,10 @@ class TimelineEdges(object):
                     del time_dict[old_time]
                 time_dict.setdefault(time, []).append(track_object)
 
+            self.by_object[track_object] = (start, end)
+            if track_object in self.hidden:
+                continue
+
             old_edges = []
             new_edges = []
             if start != old_start:
@@ -855,11 +864,30 @@ class TimelineEdges(object):
             if new_edges:
                 self.addStartEnd(*new_edges)
 
-            self.by_object[track_object] = (start, end)
-
     def disableUpdates(self):
         self.enable_updates = False
 
+    def hideTrackObjects(self, track_objects):
+        """
+        Leave the start/stop values of the given objects out of the edges
+        until L{showTrackObjects} is called.
+
+        @type track_objects: iterable of L{TrackObject}
+        """
+        for track_object in track_objects:
+            if track_object in self.hidden:
+                continue
+            self.hidden.add(track_object)
+            self.removeStartEnd(*self.by_object[track_object])
+
+    def showTrackObjects(self):
+        """
+        Put back the values of the objects given to L{hideTrackObjects}.
+        """
+        hidden, self.hidden = self.hidden, set()
+        for track_object in hidden:
+            self.addStartEnd(*self.by_object[track_object])
+
     def snapToEdge(self, start, end=None):
         """
         Returns:
@@ -918,6 +946,177 @@ class TimelineEdges(object):
             return self.by_start[end]
         return []
 
+class TimelineEditPoints(object):
+    """
+    Sorted index of the positions the playhead can jump to: the start and end
+    of every L{TrackObject} and the position of every interpolator keyframe.
+
+    Changes to track objects and their interpolators are only recorded when
+    they happen, the affected positions are recomputed the next time the index
+    is queried. Queries are done by bisection.
+    """
+    def __init__(self):
+        self.positions = []
+        self.by_object = {}
+        self.interpolators = {}
+        self.changed_objects = set()
+
+    def addTimelineObject(self, timeline_object):
+        """
+        Add the edit points of this object to the index.
+
+        @param timeline_object: The object whose edit points we want to track.
+        @type timeline_object: L{TimelineObject}
+        """
+        for obj in timeline_object.track_objects:
+            self.addTrackObject(obj)
+
+        timeline_object.connect("track-object-added", self._trackObjectAddedCb)
+        timeline_object.connect("track-object-removed",
+                self._trackObjectRemovedCb)
+
+    def removeTimelineObject(self, timeline_object):
+        """
+        Remove the edit points of this object from the index.
+
+        @param timeline_object: The object whose edit points we no longer want
+        to track.
+        @type timeline_object: L{TimelineObject}
+        """
+        timeline_object.disconnect_by_func(self._trackObjectAddedCb)
+        timeline_object.disconnect_by_func(self._trackObjectRemovedCb)
+        for obj in timeline_object.track_objects:
+            self.removeTrackObject(obj)
+
+    def _trackObjectAddedCb(self, timeline_object, track_object):
+        self.addTrackObject(track_object)
+
+    def _trackObjectRemovedCb(self, timeline_object, track_object):
+        self.removeTrackObject(track_object)
+
+    def addTrackObject(self, track_object):
+        if track_object in self.by_object:
+            raise TimelineError("TrackObject already controlled by this index")
+
+        self.by_object[track_object] = []
+        self.changed_objects.add(track_object)
+
+        self._connectToInterpolators(track_object)
+        track_object.connect("start-changed", self._trackObjectChangedCb)
+        track_object.connect("duration-changed", self._trackObjectChangedCb)
+        track_object.connect("in-point-changed", self._trackObjectChangedCb)
+        track_object.connect("interpolators-changed",
+                self._interpolatorsChangedCb)
+
+    def removeTrackObject(self, track_object):
+        try:
+            positions = self.by_object.pop(track_object)
+        except KeyError:
+            raise TimelineError("TrackObject not controlled by this index")
+
+        self._removePositions(positions)
+        self.changed_objects.discard(track_object)
+
+        self._disconnectFromInterpolators(track_object)
+        del self.interpolators[track_object]
+        track_object.disconnect_by_func(self._trackObjectChangedCb)
+        track_object.disconnect_by_func(self._interpolatorsChangedCb)
+
+    def _connectToInterpolators(self, track_object):
+        try:
+            interpolators = [interpolator for prop, interpolator in
+                    track_object.getInterpolators().itervalues()]
+        except TrackError:
+            # the object has no bin, we'll get interpolators-changed once
+            # it gets one
+            interpolators = []
+
+        for interpolator in interpolators:
+            interpolator.connect("keyframe-added", self._keyframeChangedCb,
+                    track_object)
+            interpolator.connect("keyframe-removed", self._keyframeChangedCb,
+                    track_object)
+            interpolator.connect("keyframe-moved", self._keyframeChangedCb,
+                    track_object)
+        self.interpolators[track_object] = interpolators
+
+    def _disconnectFromInterpolators(self, track_object):
+        for interpolator in self.interpolators[track_object]:
+            interpolator.disconnect_by_func(self._keyframeChangedCb)
+        self.interpolators[track_object] = []
+
+    def _trackObjectChangedCb(self, track_object, unused_value):
+        self.changed_objects.add(track_object)
+
+    def _interpolatorsChangedCb(self, track_object):
+        self._disconnectFromInterpolators(track_object)
+        self._connectToInterpolators(track_object)
+        self.changed_objects.add(track_object)
+
+    def _keyframeChangedCb(self, interpolator, keyframe, *args):
+        # the track object is always the last argument
+        self.changed_objects.add(args[-1])
+
+    def _getTrackObjectPositions(self, track_object):
+        start = track_object.start
+        offset = start - track_object.in_point
+        positions = [start, start + track_object.duration]
+        for interpolator in self.interpolators[track_object]:
+            positions.extend(kf.time + offset
+                    for kf in interpolator.getInteriorKeyframes())
+        return positions
+
+    def _removePositions(self, positions):
+        for position in positions:
+            index = bisect_left(self.positions, position)
+            del self.positions[index]
+
+    def _processChanges(self):
+        if not self.changed_objects:
+            return
+
+        changed, self.changed_objects = self.changed_objects, set()
+        for track_object in changed:
+            self._removePositions(self.by_object[track_object])
+            positions = self._getTrackObjectPositions(track_object)
+            for position in positions:
+                insort(self.positions, position)
+            self.by_object[track_object] = positions
+
+    def getPrevious(self, position):
+        """
+        Returns the closest edit point strictly before position, or C{None}.
+        """
+        self._processChanges()
+        index = bisect_left(self.positions, position)
+        if index == 0:
+            return None
+        return self.positions[index - 1]
+
+    def getNext(self, position):
+        """
+        Returns the closest edit point strictly after position, or C{None}.
+        """
+        self._processChanges()
+        index = bisect_right(self.positions, position)
+        if index == len(self.positions):
+            return None
+        return self.positions[index]
+
+    def getInRange(self, start, end):
+        """
+        Returns the sorted list of distinct edit points between start and end
+        (inclusive).
+        """
+        self._processChanges()
+        positions = self.positions[bisect_left(self.positions, start):
+                bisect_right(self.positions, end)]
+        res = []
+        for position in positions:
+            if not res or res[-1] != position:
+                res.append(position)
+        return res
+
 class EditingContext(object):
 
     DEFAULT = 0
@@ -958,6 +1157,8 @@ class EditingContext(object):
         self._mode = self.DEFAULT
         self._last_position = focus.start
         self._last_priority = focus.priority
+        self._ripple_originals = None
+        self._ripple_offset = (0, 0)
 
         self.timeline.disableUpdates()
 
@@ -991,9 +1192,38 @@ class EditingContext(object):
     def _getSpan(self, earliest, objs):
         return max((obj.start + obj.duration for obj in objs)) - earliest
 
+    def _setRipple(self, originals, offset, priority_offset=0):
+        # Rippled objects are not moved while editing: they keep the values
+        # saved in originals and the timeline carries a single group offset
+        # for all of them, which is applied for real by _commitRipple().
+        if self._ripple_originals is not originals:
+            self._clearRipple()
+            self._ripple_originals = originals
+            self.timeline.beginRipple(originals.keys())
+        self._ripple_offset = (offset, priority_offset)
+        self.timeline.setRippleOffset(offset, priority_offset)
+
+    def _clearRipple(self):
+        if self._ripple_originals is not None:
+            self._ripple_originals = None
+            self._ripple_offset = (0, 0)
+            self.timeline.endRipple()
+
+    def _commitRipple(self):
+        if self._ripple_originals is None:
+            return
+
+        originals = self._ripple_originals
+        offset, priority_offset = self._ripple_offset
+        self._clearRipple()
+        for timeline_object, values in originals.iteritems():
+            timeline_object.setStart(values[0] + offset)
+            timeline_object.priority = values[-1] + priority_offset
+
     def finish(self):
         """Clean up timeline for normal editing"""
         # TODO: post undo / redo action here
+        self._commitRipple()
         self.timeline.enableUpdates()
 
     def setMode(self, mode):
@@ -1117,8 +1347,6 @@ class MoveContext(EditingContext):
         self.default_span = latest - earliest
 
         ripple = timeline.getObjsAfterTime(latest)
-        self.ripple_offsets = self._getOffsets(self.focus.start,
-            self.focus.priority, ripple)
 
         # get the span over all clips for ripple editing
         for timeline_object in ripple:
@@ -1131,6 +1359,12 @@ class MoveContext(EditingContext):
 
         self.timeline_objects_plus_ripple = set(self.timeline_objects)
         self.timeline_objects_plus_ripple.update(ripple)
+        self.plus_ripple_originals = dict(self.default_originals)
+        self.plus_ripple_originals.update(self.ripple_originals)
+
+        # nothing moves for real in ripple mode, so the gaps around the
+        # rippled objects only depend on the priority
+        self._ripple_gaps = {}
 
     def _getGapsAtPriority(self, priority):
         if self._mode == self.RIPPLE:
@@ -1199,6 +1433,7 @@ class MoveContext(EditingContext):
         return True
 
     def finish(self):
+        self._commitRipple()
 
         if isinstance(self.focus, TrackObject):
             focus_timeline_object = self.focus.timeline_object
@@ -1277,15 +1512,27 @@ class MoveContext(EditingContext):
         return position, priority
 
     def _finishRipple(self):
-        self._restoreValues(self.ripple_originals)
+        self._clearRipple()
+
+    def _getRippleGapsAtPriority(self, priority):
+        try:
+            return self._ripple_gaps[priority]
+        except KeyError:
+            gaps = EditingContext._getGapsAtPriority(self, priority,
+                    self.timeline_objects_plus_ripple, self.tracks)
+            self._ripple_gaps[priority] = gaps
+            return gaps
 
     def _rippleTo(self, position, priority):
+        # start rippling before snapping, so that the rippled objects don't
+        # snap to their own original edges
+        self._setRipple(self.plus_ripple_originals, *self._ripple_offset)
         if self._snap:
             position = self.timeline.snapToEdge(position,
                 position + self.ripple_span)
 
         priority = max(self.min_priority, priority)
-        left_gap, right_gap = self._getGapsAtPriority(priority)
+        left_gap, right_gap = self._getRippleGapsAtPriority(priority)
 
         if left_gap is invalid_gap or right_gap is invalid_gap:
             if priority == self._last_priority:
@@ -1293,22 +1540,21 @@ class MoveContext(EditingContext):
                 return self._last_position, self._last_priority
 
             # try to do the same time move, using the current priority
-            return self._defaultTo(position, self._last_priority)
+            priority = self._last_priority
+            left_gap, right_gap = self._getRippleGapsAtPriority(priority)
+            if left_gap is invalid_gap or right_gap is invalid_gap:
+                return self._last_position, self._last_priority
 
+        # the focus and the rippled objects are still at their original
+        # positions, only the group offset changes
         delta = position - self.focus.start
         if delta > 0 and right_gap.duration < delta:
             position = self.focus.start + right_gap.duration
         elif delta < 0 and left_gap.duration < abs(delta):
             position = self.focus.start - left_gap.duration
 
-        self.focus.setStart(position)
-        self.focus.priority = priority
-        for obj, (s_offset, p_offset) in self.offsets.iteritems():
-            obj.setStart(position + s_offset)
-            obj.priority = priority + p_offset
-        for obj, (s_offset, p_offset) in self.ripple_offsets.iteritems():
-            obj.setStart(position + s_offset)
-            obj.priority = priority + p_offset
+        self._setRipple(self.plus_ripple_originals,
+                position - self.focus.start, priority - self.focus.priority)
 
         return position, priority
 
@@ -1333,8 +1579,7 @@ class TrimStartContext(EditingContext):
         ripple = self.timeline.getObjsBeforeTime(focus.start)
         assert not focus.timeline_object in ripple or focus.duration == 0
         self.ripple_originals = self._saveValues(ripple)
-        self.ripple_offsets = self._getOffsets(focus.start, focus.priority,
-            ripple)
+        self.ripple_reference = focus.start
         if ripple:
             self.ripple_min = focus.start - min((obj.start for obj in ripple))
         else:
@@ -1355,19 +1600,23 @@ class TrimStartContext(EditingContext):
         earliest = self.focus.start - self.focus.in_point
         latest = earliest + self.focus.factory.duration
 
+        if self.ripple_originals:
+            # don't snap to the original edges of the rippled objects
+            self._setRipple(self.ripple_originals, *self._ripple_offset)
         if self.snap:
             position = self.timeline.snapToEdge(position)
 
         position = min(latest, max(position, earliest))
         self.focus.trimStart(position)
         r_position = max(position, self.ripple_min)
-        for obj, (s_offset, p_offset) in self.ripple_offsets.iteritems():
-            obj.setStart(r_position + s_offset)
+        if self.ripple_originals:
+            self._setRipple(self.ripple_originals,
+                    r_position - self.ripple_reference)
 
         return position, priority
 
     def _finishRipple(self):
-        self._restoreValues(self.ripple_originals)
+        self._clearRipple()
 
     def _defaultTo(self, position, priority):
         earliest = max(0, self.focus.start - self.focus.in_point)
@@ -1410,9 +1659,8 @@ class TrimEndContext(EditingContext):
         reference = focus.start + focus.duration
         ripple = self.timeline.getObjsAfterTime(reference)
 
+        self.ripple_reference = reference
         self.ripple_originals = self._saveValues(ripple)
-        self.ripple_offsets = self._getOffsets(reference, self.focus.priority,
-            ripple)
 
     def _rollTo(self, position, priority):
         if self._snap:
@@ -1429,18 +1677,22 @@ class TrimEndContext(EditingContext):
     def _rippleTo(self, position, priority):
         earliest = self.focus.start - self.focus.in_point
         latest = earliest + self.focus.factory.duration
+        if self.ripple_originals:
+            # don't snap to the original edges of the rippled objects
+            self._setRipple(self.ripple_originals, *self._ripple_offset)
         if self.snap:
             position = self.timeline.snapToEdge(position)
         position = min(latest, max(position, earliest))
         duration = position - self.focus.start
         self.focus.setDuration(duration)
-        for obj, (s_offset, p_offset) in self.ripple_offsets.iteritems():
-            obj.setStart(position + s_offset)
+        if self.ripple_originals:
+            self._setRipple(self.ripple_originals,
+                    position - self.ripple_reference)
 
         return position, priority
 
     def _finishRipple(self):
-        self._restoreValues(self.ripple_originals)
+        self._clearRipple()
 
     def _defaultTo(self, position, priority):
         duration = max(0, position - self.focus.start)
@@ -1474,6 +1726,9 @@ class Timeline(Signallable, Loggable):
      - C{track-added} : A L{timeline.Track} was added.
      - C{track-removed} : A L{timeline.Track} was removed.
      - C{selection-changed} : The current selection changed.
+     - C{ripple-started} : Objects are being rippled by an editing context.
+     - C{ripple-offset-changed} : The pending ripple offset changed.
+     - C{ripple-ended} : The rippled objects are back to their own positions.
 
     @ivar tracks: list of Tracks controlled by the Timeline
     @type tracks: List of L{timeline.Track}
@@ -1481,6 +1736,12 @@ class Timeline(Signallable, Loggable):
     @type duration: C{long}
     @ivar selection: The currently selected TimelineObjects
     @type selection: L{Selection}
+    @ivar ripple_objects: The TimelineObjects being rippled
+    @type ripple_objects: C{frozenset}
+    @ivar ripple_offset: Pending start offset of L{ripple_objects}
+    @type ripple_offset: C{long}
+    @ivar ripple_priority_offset: Pending priority offset of L{ripple_objects}
+    @type ripple_priority_offset: C{int}
     """
     __signals__ = {
         'duration-changed': ['duration'],
@@ -1489,7 +1750,10 @@ class Timeline(Signallable, Loggable):
         'track-added': ['track'],
         'track-removed': ['track'],
         'selection-changed': [],
-        'disable-updates': ['bool']
+        'disable-updates': ['bool'],
+        'ripple-started': ['timeline_objects'],
+        'ripple-offset-changed': ['offset', 'priority_offset'],
+        'ripple-ended': [],
     }
 
     def __init__(self):
@@ -1503,7 +1767,11 @@ class Timeline(Signallable, Loggable):
         # FIXME : What's the unit of dead_band ?
         self.dead_band = 10
         self.edges = TimelineEdges()
+        self.edit_points = TimelineEditPoints()
         self.property_trackers = {}
+        self.ripple_objects = frozenset()
+        self.ripple_offset = 0
+        self.ripple_priority_offset = 0
 
     def addTrack(self, track):
         """
@@ -1581,6 +1849,7 @@ class Timeline(Signallable, Loggable):
         obj.timeline = self
 
         self.edges.addTimelineObject(obj)
+        self.edit_points.addTimelineObject(obj)
 
         self.emit("timeline-object-added", obj)
 
@@ -1607,6 +1876,7 @@ class Timeline(Signallable, Loggable):
         obj.timeline = None
 
         self.edges.removeTimelineObject(obj)
+        self.edit_points.removeTimelineObject(obj)
 
         self.emit("timeline-object-removed", obj)
 
@@ -1980,6 +2250,55 @@ class Timeline(Signallable, Loggable):
 
         self.emit("disable-updates", False)
 
+    def beginRipple(self, timeline_objects):
+        """
+        Start a ripple of the given objects. While rippling, the objects keep
+        their own start and priority and are shifted as a group by
+        L{setRippleOffset}, so that a drag costs the same whatever the number
+        of objects downstream of the edit.
+
+        Their edges are left out of snapping until L{endRipple}, since they
+        aren't where the objects are shown.
+
+        @param timeline_objects: The objects to ripple.
+        @type timeline_objects: iterable of L{TimelineObject}
+        """
+        self.ripple_objects = frozenset(timeline_objects)
+        self.edges.hideTrackObjects([track_object
+                for timeline_object in self.ripple_objects
+                for track_object in timeline_object.track_objects])
+        self.ripple_offset = 0
+        self.ripple_priority_offset = 0
+        self.emit("ripple-started", self.ripple_objects)
+
+    def setRippleOffset(self, offset, priority_offset=0):
+        """
+        Set the pending offset of the objects given to L{beginRipple}.
+
+        @param offset: The start offset, in nanoseconds.
+        @type offset: C{long}
+        @param priority_offset: The priority offset.
+        @type priority_offset: C{int}
+        """
+        if (offset, priority_offset) == \
+                (self.ripple_offset, self.ripple_priority_offset):
+            return
+
+        self.ripple_offset = offset
+        self.ripple_priority_offset = priority_offset
+        self.emit("ripple-offset-changed", offset, priority_offset)
+
+    def endRipple(self):
+        """
+        Stop rippling. Editing contexts apply the offset to the objects
+        themselves before calling this if the ripple is to be kept.
+        """
+        self.edges.showTrackObjects()
+        self.ripple_objects = frozenset()
+        self.ripple_offset = 0
+        self.ripple_priority_offset = 0
+        self.emit("ripple-ended")
+
     def getObjsAtTime(self, time):
         objects = []
         for obj in self.timeline_objects:
@@ -2027,60 +2346,22 @@ class Timeline(Signallable, Loggable):
         return objects
 
     def getPrevKeyframe(self, time):
-        tl_objs = []
-
-        # Exclude objects that start after current position.
-        for obj in self.timeline_objects:
-                tl_objs.append(obj)
-                if obj.start > time:
-                    break
-
-        keyframe_positions = self._getKeyframePositions(tl_objs)
-        for n in range(len(keyframe_positions) -1, -1, -1):
-            if keyframe_positions[n] < time:
-                return keyframe_positions[n]
-        return None
+        """
+        Returns the closest clip edge or keyframe before time, or C{None}.
+        """
+        return self.edit_points.getPrevious(time)
 
     def getNextKeyframe(self, time):
-        tl_objs = []
-
-        # Include from first object whose end is after the current
-        # position onward.
-        for obj in self.timeline_objects:
-            if (obj.start + obj.duration) > time:
-                n = self.timeline_objects.index(obj)
-                tl_objs.extend(self.timeline_objects[n:])
-                break
+        """
+        Returns the closest clip edge or keyframe after time, or C{None}.
+        """
+        return self.edit_points.getNext(time)
 
-        keyframe_positions = self._getKeyframePositions(tl_objs)
-        for n in range(0, len(keyframe_positions)):
-                if keyframe_positions[n] > time:
-                    return keyframe_positions[n]
-
-        return None
-
-    def _getKeyframePositions(self, timeline_objects):
-        keyframe_positions = set([])
-        for tl_obj in timeline_objects:
-            first_track = True
-            for track_obj in tl_obj.track_objects:
-                start = track_obj.start
-                in_point = track_obj.in_point
-                if first_track:
-                    keyframe_positions.add(start)
-                    keyframe_positions.add(start + track_obj.duration)
-                    first_track = False
-
-                interpolators = track_obj.getInterpolators()
-                for value in interpolators:
-                    interpolator = track_obj.getInterpolator(value)
-                    keyframes = interpolator.getInteriorKeyframes()
-                    for kf in keyframes:
-                        position_in_obj = kf.getTime() + start - in_point
-                        keyframe_positions.add(position_in_obj)
-        keyframe_positions = list(keyframe_positions)
-        keyframe_positions.sort()
-        return keyframe_positions
+    def getKeyframesInRange(self, start, end):
+        """
+        Returns the sorted clip edges and keyframes between start and end.
+        """
+        return self.edit_points.getInRange(start, end)
 
     def getObjsToAddEffectTo(self, point, priority):
         timeline_objects = []
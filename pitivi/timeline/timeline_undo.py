@@ -26,8 +26,8 @@ from pitivi.utils import PropertyChangeTracker
 from pitivi.undo import UndoableAction
 from pitivi.timeline.track import TrackEffect
 
-from pitivi.ui.effectsconfiguration import PROPS_TO_IGNORE
-from pitivi.effects import EffectGstElementPropertyChangeTracker
+from pitivi.effects import EffectGstElementPropertyChangeTracker, \
+        PROPS_TO_IGNORE
 
 class TimelineObjectPropertyChangeTracker(PropertyChangeTracker):
     # no out-point
@@ -122,6 +122,13 @@ class TimelineObjectPropertyChanged(UndoableAction):
                 self.property_name.replace("-", "_"), self.old_value)
         self._undone()
 
+    def getCoalesceKey(self):
+        return (TimelineObjectPropertyChanged, self.timeline_object,
+                self.property_name)
+
+    def coalesce(self, action):
+        self.new_value = action.new_value
+
 class TimelineObjectAdded(UndoableAction):
     def __init__(self, timeline, timeline_object):
         self.timeline = timeline
@@ -307,6 +314,13 @@ class InterpolatorKeyframeChanged(UndoableAction):
         self._setSnapshot(self.old_snapshot)
         self._undone()
 
+    def getCoalesceKey(self):
+        # Keyframe.__cmp__ compares times, use the identity instead
+        return (InterpolatorKeyframeChanged, id(self.keyframe))
+
+    def coalesce(self, action):
+        self.new_snapshot = action.new_snapshot
+
     def _setSnapshot(self, snapshot):
         mode, time, value = snapshot
         self.keyframe.setMode(mode)
@@ -21,10 +21,11 @@
 
 import gst
 import gobject
+from bisect import bisect_left, bisect_right
 
 from pitivi.signalinterface import Signallable
 from pitivi.utils import get_controllable_properties, getPreviousObject, \
-        getNextObject, start_insort_right, between
+        getNextObject, start_insort_right
 from pitivi.log.loggable import Loggable
 from pitivi.stream import VideoStream, AudioStream
 from pitivi.factories.test import VideoTestSourceFactory, \
@@ -129,6 +130,10 @@ class Interpolator(Signallable, Loggable):
     Timestamps given are assumed to be relative to the start of the clip. This
     seems to be the normal behavior when the element being controlled is
     internal to the gnlsource or gnloperation.
+
+    Interior keyframes are kept sorted by time, along with a parallel list of
+    their timestamps, so that lookups and range queries can use bisection
+    instead of scanning (or sorting) the whole curve.
     """
 
     __signals__ = {
@@ -142,6 +147,7 @@ class Interpolator(Signallable, Loggable):
         Loggable.__init__(self)
         self.debug("track:%r, element:%r, property:%r", trackobject, element, prop)
         self._keyframes = []
+        self._keyframe_times = []
         self.trackobject = trackobject
 
         if minimum is None:
@@ -209,8 +215,7 @@ class Interpolator(Signallable, Loggable):
         self.debug("time:%s, value:%r, mode:%r",
                    gst.TIME_ARGS(keyframe.time), keyframe.value, keyframe.mode)
 
-        self._keyframes.append(keyframe)
-        self._keyframes.sort()
+        self._insertKeyframe(keyframe)
 
         self._controller.set(self._property.name, keyframe.time, keyframe.value)
 
@@ -222,9 +227,29 @@ class Interpolator(Signallable, Loggable):
         old_value = self._controller.get(self._property.name, keyframe.time)
         self._controller.unset(self._property.name, keyframe.time)
         if keyframe is not self.start and keyframe is not self.end:
-            self._keyframes.remove(keyframe)
+            index = self._findKeyframe(keyframe)
+            if index is None:
+                raise ValueError("keyframe not in interpolator")
+            del self._keyframes[index]
+            del self._keyframe_times[index]
             self.emit("keyframe-removed", keyframe, old_value)
 
+    def _insertKeyframe(self, keyframe):
+        index = bisect_right(self._keyframe_times, keyframe.time)
+        self._keyframes.insert(index, keyframe)
+        self._keyframe_times.insert(index, keyframe.time)
+
+    def _findKeyframe(self, keyframe):
+        # keyframes can share the same timestamp, so check for identity
+        # between all the keyframes at keyframe.time
+        times = self._keyframe_times
+        index = bisect_left(times, keyframe.time)
+        while index < len(times) and times[index] == keyframe.time:
+            if self._keyframes[index] is keyframe:
+                return index
+            index += 1
+        return None
+
     def setKeyframeMode(self, kf, mode):
         # FIXME: currently InterpolationSourceControllers only support a
         # single mode. Suporting per-keyframe modes would require implementing
@@ -238,7 +263,16 @@ class Interpolator(Signallable, Loggable):
     def setKeyframeTime(self, kf, time):
         time = max(self.start.time, min(self.end.time, time))
         self._keyframeTimeValueChanged(kf, time, kf.value)
+        index = self._findKeyframe(kf)
+        if index is None:
+            kf.setObjectTime(time)
+            return
+
+        # keep the keyframe list sorted
+        del self._keyframes[index]
+        del self._keyframe_times[index]
         kf.setObjectTime(time)
+        self._insertKeyframe(kf)
 
     def setKeyframeValue(self, kf, value):
         value = max(self.lower, min(self.upper, value))
@@ -266,14 +300,30 @@ class Interpolator(Signallable, Loggable):
         for kf in self._keyframes:
             yield kf
 
-    def getVisibleKeyframes(self):
-        """Return start, end and any keyframes included in between"""
+    def keyframesInRange(self, start, end):
+        """Return the interior keyframes whose time is between start and end
+        (inclusive), in time order"""
+        times = self._keyframe_times
+        return self._keyframes[bisect_left(times, start):
+                bisect_right(times, end)]
+
+    def getVisibleKeyframes(self, start=None, end=None):
+        """Return start, end and any keyframes included in between.
+
+        If start and/or end are given, only the interior keyframes needed to
+        draw the curve between those two times are returned: the ones inside
+        the range plus the closest one on each side of it."""
+        times = self._keyframe_times
+        low = bisect_left(times, self.start.time)
+        high = bisect_right(times, self.end.time)
+        if start is not None:
+            low = max(low, bisect_left(times, start) - 1)
+        if end is not None:
+            high = min(high, bisect_right(times, end) + 1)
+
         yield self.start
-        start_time = self.start.time
-        end_time = self.end.time
-        for kf in sorted(self._keyframes):
-            if between(start_time, kf.time, end_time):
-                yield kf
+        for kf in self._keyframes[low:high]:
+            yield kf
         yield self.end
 
     def updateMediaStart(self, start):
@@ -304,6 +354,7 @@ class TrackObject(Signallable, Loggable):
         'selected-changed' : ['state'],
         'stagger-changed' : ['stagger'],
         'active-changed' : ['active'],
+        'interpolators-changed' : [],
     }
 
     def __init__(self, factory, stream, start=0,
@@ -403,6 +454,8 @@ class TrackObject(Signallable, Loggable):
             self.interpolators[gst_object_property.name] = \
                     (gst_object_property, interpolator)
 
+        self.emit("interpolators-changed")
+
     def release(self):
         self._disconnectFromSignals()
         self.releaseBin()
@@ -417,6 +470,19 @@ class TrackObject(Signallable, Loggable):
 
         if self.track is not None:
             self.track.addTrackObject(other)
+        self.copyProperties(other)
+
+        return other
+
+    def copyProperties(self, other):
+        """
+        Copy the active state and the interpolation curves of this object to
+        C{other}, which must already be in a track for them to be copied.
+
+        @param other: The object to copy the properties to.
+        @type other: L{TrackObject}
+        """
+        if other.track is not None:
             other.gnl_object.set_property("active",
                                           self.gnl_object.get_property("active"))
 
@@ -432,8 +498,6 @@ class TrackObject(Signallable, Loggable):
                     kf.value,
                     kf.mode)
 
-        return other
-
     def snapStartDurationTime(self, *args):
         return
 
@@ -541,11 +605,11 @@ class TrackObject(Signallable, Loggable):
         # TrackObject to timeline
         if type(self) is TrackEffect:
             if self.stream_type is VideoStream:
-                true_priority = 2 + self._stagger + (3 * priority)
+                true_priority = 3 + self._stagger + (3 * priority)
             elif self.stream_type is AudioStream:
                 true_priority  = 3 + (2 * self._stagger) + (4 * priority)
         elif self.stream_type is VideoStream:
-            true_priority = 3 + self._stagger + (3 * priority)
+            true_priority = 4 + self._stagger + (3 * priority)
         elif self.stream_type is AudioStream:
             true_priority  = 3 + (2 * self._stagger) + (4 * priority)
 
@@ -680,7 +744,7 @@ class TrackObject(Signallable, Loggable):
     def _notifyPriorityCb(self, obj, pspec):
         if self.stream_type is VideoStream:
             true_priority = obj.props.priority
-            public_priority = (true_priority - 2 - self._stagger) // 3
+            public_priority = (true_priority - 3 - self._stagger) // 3
         elif self.stream_type is AudioStream:
             true_priority = obj.props.priority
             public_priority = (true_priority - 2 - (2 * self._stagger))// 4
@@ -745,10 +809,10 @@ class TrackEffect(TrackObject):
         TrackEffect.numobjs += 1
         return effect
 
-    def copy(self):
-        other = TrackObject.copy(self)
+    def copyProperties(self, other):
+        TrackObject.copyProperties(self, other)
 
-        if self.track is not None:
+        if self.track is not None and other.track is not None:
             element = self.getElement()
             new_element = other.getElement()
             for prop in gobject.list_properties(element):
@@ -756,8 +820,6 @@ class TrackEffect(TrackObject):
                 if value != prop.default_value:
                     new_element.set_property(prop.name, value)
 
-        return other
-
     def getElement(self):
         """
         Permit to get the gst.Element inside the gnl_object that correspond
@@ -871,7 +933,7 @@ class VideoTransition(Transition):
         self.operation.props.media_duration = duration
 
     def _updateOperationPriority(self, priority):
-        self.operation.props.priority = 1 + 3 * priority
+        self.operation.props.priority = 2 + 3 * priority
 
     def _updateController(self):
         if self.a.stagger > self.b.stagger:
@@ -1015,23 +1077,57 @@ class Track(Signallable, Loggable):
                 t(source.props.start + source.props.duration))
 
     def _updateDefaultSourcesUnchecked(self):
+        gaps = [(gap.start, gap.initial_duration)
+                for gap in Gap.findAllGaps(self.track_objects)]
+
+        # default sources already filling a gap are left untouched
+        sources = {}
         for source in self.default_sources:
+            sources.setdefault((source.props.start, source.props.duration),
+                    []).append(source)
+        default_sources = []
+        new_gaps = []
+        for gap in gaps:
+            matching = sources.get(gap)
+            if matching:
+                default_sources.append(matching.pop())
+            else:
+                new_gaps.append(gap)
+
+        # the others are moved to fill the new gaps, sources are only made or
+        # removed when the number of gaps changes
+        spare = [source for fillers in sources.itervalues()
+                for source in fillers]
+        spare.sort(key=lambda source: source.props.start)
+        for start, duration in new_gaps:
+            if spare:
+                gnl_object = spare.pop(0)
+                self.debug("moving default source %s",
+                        self._sourceDebug(gnl_object))
+                gnl_object.props.start = start
+                gnl_object.props.duration = duration
+            else:
+                gnl_object = self._makeDefaultSource(start, duration)
+            default_sources.append(gnl_object)
+
+        for source in spare:
             self.debug("removing default source %s", self._sourceDebug(source))
             self._shutdownDefaultSource(source)
             self.composition.remove(source)
             source.set_state(gst.STATE_NULL)
-        gaps = Gap.findAllGaps(self.track_objects)
 
-        self.default_sources = []
-        for gap in gaps:
-            source = self._getDefaultTrackObjectForStream(self.stream)
-            gnl_object = source.gnl_object
-            gnl_object.props.start = gap.start
-            gnl_object.props.duration = gap.initial_duration
-            self.debug("adding default source %s",
-                    self._sourceDebug(source.gnl_object))
-            self.composition.add(gnl_object)
-            self.default_sources.append(gnl_object)
+        default_sources.sort(key=lambda source: source.props.start)
+        self.default_sources = default_sources
+
+    def _makeDefaultSource(self, start, duration):
+        source = self._getDefaultTrackObjectForStream(self.stream)
+        gnl_object = source.gnl_object
+        gnl_object.props.start = start
+        gnl_object.props.duration = duration
+        self.debug("adding default source %s", self._sourceDebug(gnl_object))
+        self.composition.add(gnl_object)
+
+        return gnl_object
 
     def updateDefaultSources(self):
         if not self.composition.props.update:
@@ -1061,7 +1157,9 @@ class Track(Signallable, Loggable):
             m = SmartVideomixerBin(self)
             gnl.add(m)
             gnl.props.expandable = True
-            gnl.props.priority = 0
+            # priority 0 is left for pre-rendered segments, which replace
+            # the whole mixed output where they are placed
+            gnl.props.priority = 1
             gnl.connect("input-priority-changed",
                         self._videoInputPriorityChangedCb, m)
             return gnl
@@ -39,6 +39,22 @@ def intersect(b1, b2):
     return goocanvas.Bounds(max(b1.x1, b2.x1), max(b1.y1, b2.y1),
         min(b1.x2, b2.x2), min(b1.y2, b2.y2))
 
+def segment_distance(p, a, b):
+    """Returns the distance between point p and the segment [a, b]"""
+    px, py = p
+    ax, ay = a
+    bx, by = b
+    dx = bx - ax
+    dy = by - ay
+    length = float(dx * dx + dy * dy)
+    if length:
+        t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length))
+    else:
+        t = 0.0
+    x = ax + t * dx - px
+    y = ay + t * dy - py
+    return (x * x + y * y) ** 0.5
+
 KW_WIDTH = 10
 KW_HEIGHT = 10
 KW_WIDTH2 = KW_WIDTH / 2
@@ -54,6 +70,7 @@ KW_LABEL_VPAD = 4
 KW_LABEL_HPAD2 = KW_LABEL_VPAD / 2
 KW_LABEL_VPAD2 = KW_LABEL_VPAD / 2
 CURVE_STROKE_WIDTH = 2.0
+CURVE_MOUSE_WIDTH = 5.0
 HAND = gtk.gdk.Cursor(gtk.gdk.HAND2)
 
 class Curve(goocanvas.ItemSimple, goocanvas.Item, View, Zoomable):
@@ -70,13 +87,14 @@ class Curve(goocanvas.ItemSimple, goocanvas.Item, View, Zoomable):
             self._view.app.action_log.begin("volume change")
             initial = self.from_item_event(item, event)
             if self._kf:
-                self._mousedown = self._view.keyframes[self._kf] - initial
+                self._mousedown = self._view._getKeyframeXY(self._kf) - initial
             if not self._kf:
                 # we are moving the entire curve, so we need to know the
                 # inital position of each keyframe
-                self._offsets = dict(self._view.keyframes)
                 self._segment = self._view.findSegment(
                     self.xyToTimeValue(initial)[0])
+                self._offsets = dict((kf, self._view._getKeyframeXY(kf))
+                    for kf in self._segment)
 
         def drag_end(self, item, target, event):
             self._view.app.action_log.commit()
@@ -138,7 +156,6 @@ class Curve(goocanvas.ItemSimple, goocanvas.Item, View, Zoomable):
         View.__init__(self)
         Zoomable.__init__(self)
         self.app = instance
-        self.keyframes = {}
         self.height = float(height)
         self.element = element
         self.props.pointer_events = goocanvas.EVENTS_STROKE
@@ -174,10 +191,8 @@ class Curve(goocanvas.ItemSimple, goocanvas.Item, View, Zoomable):
 
     @handler(interpolator, "keyframe-removed")
     def keyframeRemoved(self, unused_interpolator, keyframe, old_value=None):
-        if keyframe in self.keyframes:
-            del self.keyframes[keyframe]
-            if keyframe is self._focused_kf:
-                self._focused_kf = None
+        if keyframe is self._focused_kf:
+            self._focused_kf = None
         self.changed(False)
 
     @handler(interpolator, "keyframe-added")
@@ -211,10 +226,36 @@ class Curve(goocanvas.ItemSimple, goocanvas.Item, View, Zoomable):
         return point.Point(x + self.bounds.x1, y + self.bounds.y1 + self._min)
 
     def _controlPoint(self, cr, kf):
-        pos = self._getKeyframeXY(kf)
-        x, y = pos
+        x, y = self._getKeyframeXY(kf)
+        self._controlPointAt(cr, x, y)
+
+    def _controlPointAt(self, cr, x, y):
         cr.rectangle(x - KW_WIDTH2, y - KW_HEIGHT2, KW_WIDTH, KW_HEIGHT)
-        self.keyframes[kf] = pos
+
+    def _getColumns(self, start=None, end=None):
+        """Decimate the visible keyframes to the pixel grid.
+
+        Yields an (x, first, low, high, last) tuple for each pixel column
+        containing at least one keyframe, where first and last are the y
+        coordinates of the first and last keyframe in the column and low and
+        high the extent of all of them. This bounds the amount of drawing to
+        the width of the curve, however dense the keyframes are."""
+        iterator = self.interpolator.getVisibleKeyframes(start, end)
+        column, y = self._getKeyframeXY(iterator.next())
+        first = last = low = high = y
+        for kf in iterator:
+            x, y = self._getKeyframeXY(kf)
+            if x == column:
+                last = y
+                low = min(low, y)
+                high = max(high, y)
+                continue
+
+            yield column, first, low, high, last
+            column = x
+            first = last = low = high = y
+
+        yield column, first, low, high, last
 
     def do_simple_paint(self, cr, bounds):
         cr.identity_matrix()
@@ -230,11 +271,13 @@ class Curve(goocanvas.ItemSimple, goocanvas.Item, View, Zoomable):
             cr.rectangle(vis_bounds.x1, vis_bounds.y1, vis_width, vis_height)
             cr.clip()
 
-            self.make_curve(cr)
+            start, end = self._xRangeToTimeRange(vis_bounds.x1 - KW_WIDTH2,
+                vis_bounds.x2 + KW_WIDTH2)
+            self.make_curve(cr, start, end)
             cr.set_line_width(self.line_width)
             cr.set_source_rgb(1, 0, 0)
             cr.stroke()
-            self.make_keyframes(cr)
+            self.make_keyframes(cr, start, end)
             cr.set_line_width(1.0)
             cr.set_source_rgb(1, 1, 1)
             cr.fill_preserve()
@@ -250,7 +293,7 @@ class Curve(goocanvas.ItemSimple, goocanvas.Item, View, Zoomable):
                 cr.set_source_rgb(1, 1, 1)
                 cr.stroke()
 
-                x, y = self.keyframes[self._focused_kf]
+                x, y = self._getKeyframeXY(self._focused_kf)
                 x += KW_LABEL_X_OFFSET
                 y += KW_LABEL_Y_OFFSET
                 text = self.interpolator.formatValue(self._focused_kf.value)
@@ -276,18 +319,27 @@ class Curve(goocanvas.ItemSimple, goocanvas.Item, View, Zoomable):
             else:
                 cr.restore()
 
-    def make_curve(self, cr):
+    def _xRangeToTimeRange(self, x1, x2):
+        in_point = self.element.in_point
+        return (Zoomable.pixelToNs(max(0, x1 - self.bounds.x1)) + in_point,
+            Zoomable.pixelToNs(max(0, x2 - self.bounds.x1)) + in_point)
+
+    def make_curve(self, cr, start=None, end=None):
         if not self.interpolator:
             return
-        iterator = self.interpolator.getVisibleKeyframes()
-        cr.move_to(*self._getKeyframeXY(iterator.next()))
-        for kf in iterator:
-            cr.line_to(*self._getKeyframeXY(kf))
-        cr.line_to(*self._getKeyframeXY(self.interpolator.end))
-
-    def make_keyframes(self, cr):
-        for kf in self.interpolator.getVisibleKeyframes():
-            self._controlPoint(cr, kf)
+        cr.move_to(*self._getKeyframeXY(self.interpolator.start))
+        for x, first, low, high, last in self._getColumns(start, end):
+            cr.line_to(x, first)
+            if low != high:
+                cr.line_to(x, low)
+                cr.line_to(x, high)
+                cr.line_to(x, last)
+
+    def make_keyframes(self, cr, start=None, end=None):
+        for x, first, low, high, last in self._getColumns(start, end):
+            self._controlPointAt(cr, x, low)
+            if low != high:
+                self._controlPointAt(cr, x, high)
 
     def do_simple_is_item_at(self, x, y, cr, pointer_event):
         if (between(0, x, self.visible_width) and
@@ -295,11 +347,22 @@ class Curve(goocanvas.ItemSimple, goocanvas.Item, View, Zoomable):
             KW_LABEL_Y_OVERFLOW)):
             x += self.bounds.x1
             y += self.bounds.y1
-            cr.new_path()
-            self.make_curve(cr)
-            self.make_keyframes(cr)
-            cr.set_line_width(10.0)
-            return cr.in_stroke(x, y) or bool(self.findKeyframe((x, y)))
+            return (bool(self.findKeyframe((x, y))) or
+                self._isOnCurve((x, y)))
+        return False
+
+    def _isOnCurve(self, pos):
+        # only the few segments around pos can be close enough to it
+        x, y = pos
+        start, end = self._xRangeToTimeRange(x - CURVE_MOUSE_WIDTH,
+            x + CURVE_MOUSE_WIDTH)
+        iterator = self.interpolator.getVisibleKeyframes(start, end)
+        prev = self._getKeyframeXY(iterator.next())
+        for kf in iterator:
+            point = self._getKeyframeXY(kf)
+            if segment_distance(pos, prev, point) <= CURVE_MOUSE_WIDTH:
+                return True
+            prev = point
         return False
 
 ## public
@@ -320,8 +383,16 @@ class Curve(goocanvas.ItemSimple, goocanvas.Item, View, Zoomable):
 
     def findKeyframe(self, pos):
         x, y = pos
-        for keyframe, value in self.keyframes.iteritems():
-            kx, ky = value
+        # keyframes are sorted by time, and so by x coordinate: look up the
+        # ones in the pixel columns around pos instead of testing all of them
+        start, end = self._xRangeToTimeRange(x - KW_MOUSE_WIDTH - 1,
+            x + KW_MOUSE_WIDTH + 1)
+        interpolator = self.interpolator
+        candidates = [interpolator.start]
+        candidates.extend(interpolator.keyframesInRange(start, end))
+        candidates.append(interpolator.end)
+        for keyframe in candidates:
+            kx, ky = self._getKeyframeXY(keyframe)
             if (between(kx - KW_MOUSE_WIDTH, x, kx + KW_MOUSE_WIDTH) and
                 between(ky - KW_MOUSE_HEIGHT, y, ky + KW_MOUSE_HEIGHT)):
                 return keyframe
@@ -330,7 +401,7 @@ class Curve(goocanvas.ItemSimple, goocanvas.Item, View, Zoomable):
     def findSegment(self, time):
         before = self.interpolator.start
         after = self.interpolator.end
-        for keyframe in self.keyframes.iterkeys():
+        for keyframe in self.interpolator.getVisibleKeyframes(time, time):
             if between(before.time, keyframe.time, time):
                 before = keyframe
             if between(time, keyframe.time, after.time):
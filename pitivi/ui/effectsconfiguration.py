@@ -28,8 +28,7 @@ import gobject
 
 from pitivi.ui.gstwidget import GstElementSettingsWidget
 from pitivi.ui.dynamic import FractionWidget
-
-PROPS_TO_IGNORE = ['name', 'qos', 'silent', 'message']
+from pitivi.effects import PROPS_TO_IGNORE
 
 class EffectsPropertiesHandling:
     def __init__(self, action_log):
@@ -62,6 +62,8 @@ from pitivi.ui.clipproperties import ClipProperties
 from pitivi.ui.common import beautify_factory
 from pitivi.utils import beautify_length
 from pitivi.ui.zoominterface import Zoomable
+from pitivi.prerender import PrerenderCache
+from pitivi.factories.file import PictureFileSourceFactory
 
 if HAVE_GCONF:
     D_G_INTERFACE = "/desktop/gnome/interface"
@@ -125,6 +127,27 @@ GlobalSettings.addConfigOption('elementSettingsDialogHeight',
     section='export',
     key='element-settings-dialog-height',
     default = 460)
+GlobalSettings.addConfigSection("viewer")
+GlobalSettings.addConfigOption('viewerFrameCacheSize',
+    section="viewer",
+    key="frame-cache-size",
+    environment="PITIVI_FRAME_CACHE_SIZE",
+    default=64)
+GlobalSettings.addConfigOption('viewerPrerender',
+    section="viewer",
+    key="prerender",
+    environment="PITIVI_PRERENDER",
+    default=True)
+GlobalSettings.addConfigOption('viewerPrerenderCacheSize',
+    section="viewer",
+    key="prerender-cache-size",
+    environment="PITIVI_PRERENDER_CACHE_SIZE",
+    default=2048)
+GlobalSettings.addConfigOption('viewerImageCacheSize',
+    section="viewer",
+    key="image-cache-size",
+    environment="PITIVI_IMAGE_CACHE_SIZE",
+    default=128)
 GlobalSettings.addConfigSection("effect-configuration")
 GlobalSettings.addConfigOption('effectVPanedPosition',
     section='effect-configuration',
@@ -779,6 +802,15 @@ class PitiviMainWindow(gtk.Window, Loggable):
         self.log("A NEW project is loaded, update the UI!")
         self.project = project
         self._connectToProjectSources(project.sources)
+        # in MiB, 0 disables the caches
+        project.frame_cache.setMaxSize(
+                self.settings.viewerFrameCacheSize * 1024 * 1024)
+        PictureFileSourceFactory.image_cache.setMaxSize(
+                self.settings.viewerImageCacheSize * 1024 * 1024)
+        if self.settings.viewerPrerender:
+            project.prerender = PrerenderCache(project,
+                    max_size=self.settings.viewerPrerenderCacheSize
+                    * 1024 * 1024)
         can_render = project.timeline.duration > 0
         self.render_button.set_sensitive(can_render)
         self._syncDoUndo(self.app.action_log)
@@ -789,6 +821,7 @@ class PitiviMainWindow(gtk.Window, Loggable):
             self._zoom_duration_changed = True
 
         self.project.seeker.connect("seek", self._timelineSeekCb)
+        self.project.seeker.connect("scrub", self._timelineSeekCb, False)
 
         # preliminary seek to ensure the project pipeline is configured
         self.project.seeker.seek(0)
@@ -1065,6 +1098,10 @@ class PitiviMainWindow(gtk.Window, Loggable):
         self.timeline.timelinePositionChanged(position)
         self.timelinepos = position
 
+    @handler(project_pipeline, "seek-done")
+    def _timelinePipelineSeekDoneCb(self, pipeline, duration):
+        self.project.seeker.seekDone(duration)
+
     @handler(project_pipeline, "state-changed")
     def _timelinePipelineStateChangedCb(self, pipeline, state):
         self.timeline.stateChanged(state)
@@ -1166,8 +1203,9 @@ class PitiviMainWindow(gtk.Window, Loggable):
         self.viewer.setPipeline(pipeline)
         self.viewer.play()
 
-    def _timelineSeekCb(self, ruler, position, format):
-        self.debug("position:%s", gst.TIME_ARGS (position))
+    def _timelineSeekCb(self, ruler, position, format, accurate=True):
+        self.debug("position:%s accurate:%r", gst.TIME_ARGS (position),
+                accurate)
         if self.viewer.action != self.project.view_action:
             self.viewer.setPipeline(None)
             self.viewer.hideSlider()
@@ -1180,6 +1218,7 @@ class PitiviMainWindow(gtk.Window, Loggable):
         # set to the pipeline.
         self.project.pipeline.pause()
         try:
-            self.project.pipeline.seek(position, format)
+            self.project.pipeline.seek(position, format, accurate)
         except:
             self.debug("Seeking failed")
+            self.project.seeker.seekFailed()
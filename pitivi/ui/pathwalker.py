@@ -19,44 +19,11 @@
 # Free Software Foundation, Inc., 59 Temple Place - Suite 330,
 # Boston, MA 02111-1307, USA.
 
-import os
-import threading
-from urllib import quote, unquote
+from urllib import quote
 from urlparse import urlsplit, urlunsplit
-from pitivi.threads import Thread
 
 def quote_uri(uri):
     parts = list(urlsplit(uri, allow_fragments=False))
     parts[2] = quote(parts[2])
     uri = urlunsplit(parts)
     return uri
-
-class PathWalker(Thread):
-    """
-    Thread for recursively searching in a list of directories
-    """
-
-    def __init__(self, paths, callback):
-        Thread.__init__(self)
-        self.log("New PathWalker for %s" % paths)
-        self.paths = paths
-        self.callback = callback
-        self.stopme = threading.Event()
-
-    def process(self):
-        for folder in self.paths:
-            self.log("folder %s" % folder)
-            if folder.startswith("file://"):
-                folder = unquote(folder[len("file://"):])
-            for path, dirs, files in os.walk(folder):
-                if self.stopme.isSet():
-                    return
-                uris = []
-                for afile in files:
-                    uris.append(quote_uri("file://%s" %
-                            os.path.join(path, afile)))
-                if uris:
-                    self.callback(uris)
-
-    def abort(self):
-        self.stopme.set()
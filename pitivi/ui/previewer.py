@@ -28,12 +28,12 @@ import gobject
 import gst
 import cairo
 import os
+import math
 from gettext import gettext as _
 import pitivi.utils as utils
 from pitivi.configure import get_pixmap_dir
 from pitivi.elements.singledecodebin import SingleDecodeBin
 from pitivi.elements.thumbnailsink import CairoSurfaceThumbnailSink
-from pitivi.elements.arraysink import ArraySink
 from pitivi.signalinterface import Signallable
 import pitivi.stream as stream
 from pitivi.settings import GlobalSettings
@@ -41,6 +41,7 @@ from pitivi.ui.zoominterface import Zoomable
 from pitivi.log.loggable import Loggable
 from pitivi.factories.file import PictureFileSourceFactory
 from pitivi.thumbnailcache import ThumbnailCache
+from pitivi.peaks import PeakExtractor, PeakExtractorQueue
 from pitivi.ui.prefs import PreferencesDialog
 from pitivi.receiver import receiver, handler
 
@@ -101,12 +102,15 @@ PreferencesDialog.addTogglePreference('showWaveforms',
 # | |_LiveAudioPreviwer          -- a continously updating level meter
 # | |_LiveVideoPreviewer         -- a continously updating video monitor
 # |_RandomAccessPreviewer        -- asynchronous fetching and caching
-#   |_RandomAccessAudioPreviewer -- audio-specific pipeline and rendering code
+#   |_RandomAccessAudioPreviewer -- draws waveforms from extracted peaks
 #   |_RandomAccessVideoPreviewer -- video-specific pipeline and rendering
 #     |_StillImagePreviewer      -- only uses one segment
 
 previewers = {}
 
+# waveforms are extracted one clip at a time
+extractor_queue = PeakExtractorQueue()
+
 def get_preview_for_object(instance, trackobject):
     factory = trackobject.factory
     stream_ = trackobject.stream
@@ -406,152 +410,66 @@ class StillImagePreviewer(RandomAccessVideoPreviewer):
 
 class RandomAccessAudioPreviewer(RandomAccessPreviewer):
 
-    def __init__(self, instance, factory, stream_):
-        self.tdur = 30 * gst.SECOND
-        self.base_width = int(Zoomable.max_zoom)
-        RandomAccessPreviewer.__init__(self, instance, factory, stream_)
-
-    @property
-    def twidth(self):
-        return Zoomable.nsToPixel(self.tdur)
+    """ Draws waveforms from a L{PeakPyramid} of the whole stream, which is
+    extracted once, in a single linear pass, the first time the waveform is
+    shown. Every zoom level and every clip cut from the stream samples the
+    same pyramid, so nothing is ever seeked or decoded twice."""
 
     def _pipelineInit(self, factory, sbin):
         self.spacing = 0
 
-        self.audioSink = ArraySink()
-        conv = gst.element_factory_make("audioconvert")
-        self.audioPipeline = utils.pipeline({
-            sbin : conv,
-            conv : self.audioSink,
-            self.audioSink : None})
-        bus = self.audioPipeline.get_bus()
-        bus.add_signal_watch()
-        bus.connect("message::segment-done", self._busMessageSegmentDoneCb)
-        bus.connect("message::error", self._busMessageErrorCb)
-
-        self._audio_cur = None
-        self.audioPipeline.set_state(gst.STATE_PAUSED)
+        self.extractor = PeakExtractor(sbin)
+        self.extractor.connect("progress", self._extractorProgressCb)
+        self.extractor.connect("done", self._extractorDoneCb)
+        self._extraction_queued = False
 
     def _spacing(self):
         return 0
 
-    def _segment_for_time(self, time):
-        # for audio files, we need to know the duration the segment spans
-        return time - (time % self.tdur), self.tdur
-
-    def _busMessageSegmentDoneCb(self, bus, message):
-        self.debug("segment done")
-        self._finishWaveform()
-
-    def _busMessageErrorCb(self, bus, message):
-        error, debug = message.parse_error()
-        print "Event bus error:", str(error), str(debug)
-
-        return gst.BUS_PASS
-
-    def _startThumbnail(self, (timestamp, duration)):
-        RandomAccessPreviewer._startThumbnail(self, (timestamp, duration))
-        self._audio_cur = timestamp, duration
-        res = self.audioPipeline.seek(1.0,
-            gst.FORMAT_TIME,
-            gst.SEEK_FLAG_FLUSH | gst.SEEK_FLAG_ACCURATE | gst.SEEK_FLAG_SEGMENT,
-            gst.SEEK_TYPE_SET, timestamp,
-            gst.SEEK_TYPE_SET, timestamp + duration)
-        if not res:
-            self.warning("seek failed %s", timestamp)
-        self.audioPipeline.set_state(gst.STATE_PLAYING)
-
-        return res
-
-    def _finishWaveform(self):
-        surfaces = []
-        surface = cairo.ImageSurface(cairo.FORMAT_A8,
-            self.base_width, self.theight)
-        cr = cairo.Context(surface)
-        self._plotWaveform(cr, self.base_width)
-        self.audioSink.reset()
-
-        for width in [25, 100, 200]:
-            scaled = cairo.ImageSurface(cairo.FORMAT_A8,
-               width, self.theight)
-            cr = cairo.Context(scaled)
-            matrix = cairo.Matrix()
-            matrix.scale(self.base_width/width, 1.0)
-            cr.set_source_surface(surface)
-            cr.get_source().set_matrix(matrix)
-            cr.rectangle(0, 0, width, self.theight)
-            cr.fill()
-            surfaces.append(scaled)
-        surfaces.append(surface)
-        gobject.idle_add(self._finishThumbnail, surfaces, self._audio_cur)
-
-    def _plotWaveform(self, cr, base_width):
-        # clear background
-        cr.set_source_rgba(1, 1, 1, 0.0)
-        cr.rectangle(0, 0, base_width, self.theight)
-        cr.fill()
+    def _extractorProgressCb(self, extractor, duration):
+        self.emit("update", None)
 
-        samples = self.audioSink.samples
+    def _extractorDoneCb(self, extractor):
+        self.emit("update", None)
 
-        if not samples:
+    def render_cairo(self, cr, bounds, element, hscroll_pos, y1):
+        if not self._view:
+            return
+        if not self._extraction_queued:
+            self._extraction_queued = True
+            extractor_queue.add(self.extractor)
+        x1 = int(bounds.x1)
+        x2 = int(math.ceil(bounds.x2))
+        if x2 <= x1:
             return
 
-        # find the samples-per-pixel ratio
-        spp = len(samples) / base_width
-        if spp == 0:
-            spp = 1
-        channels = self.audioSink.channels
-        stride = spp * channels
-        hscale = self.theight / (2 * channels)
-
-        # plot points from min to max over a given hunk
-        chan = 0
-        y = hscale
-        while chan < channels:
-            i = chan
-            x = 0
-            while i < len(samples):
-                slice = samples[i:i + stride:channels]
-                min_ = min(slice)
-                max_ = max(slice)
+        cr.rectangle(bounds.x1, bounds.y1, bounds.x2 - bounds.x1,
+            bounds.y2 - bounds.y1)
+        cr.clip()
+
+        # sof = start of file in pixel coordinates
+        sof = Zoomable.nsToPixel(element.start - element.in_point) +\
+            hscroll_pos
+        peaks = self.extractor.pyramid.getPeaks(
+            Zoomable.pixelToNs(x1 - sof), Zoomable.pixelToNs(x2 - sof),
+            x2 - x1)
+
+        # plot a line from min to max for each column
+        hscale = self.theight / 2.0
+        y = y1 + hscale
+        x = x1 + 0.5
+        for peak in peaks:
+            if peak is not None:
+                min_, max_ = peak
                 cr.move_to(x, y - (min_ * hscale))
                 cr.line_to(x, y - (max_ * hscale))
-                i += spp
-                x += 1
-            y += 2 * hscale
-            chan += 1
+            x += 1
 
         # Draw!
+        cr.set_line_width(1.0)
         cr.set_source_rgba(0, 0, 0, 1.0)
         cr.stroke()
 
-    def _thumbForTime(self, cr, time, x, y):
-        segment = self._segment_for_time(time)
-        twidth = self.twidth
-        if segment in self._cache:
-            surfaces = self._cache[segment]
-            if twidth > 200:
-                surface = surfaces[3]
-                base_width = self.base_width
-            elif twidth <= 200:
-                surface = surfaces[2]
-                base_width = 200
-            elif twidth <= 100:
-                surface = surfaces[1]
-                base_width = 100
-            elif twidth <= 25:
-                surface = surfaces[0]
-                base_width = 25
-            x_scale = float(base_width) / self.twidth
-            cr.set_source_surface(surface)
-            matrix = cairo.Matrix()
-            matrix.scale(x_scale, 1.0)
-            matrix.translate(-x, -y)
-            cr.get_source().set_matrix(matrix)
-        else:
-            self._requestThumbnail(segment)
-            cr.set_source_rgba(0.0, 0.0, 0.0, 0.0)
-
     def _connectSettings(self, settings):
         RandomAccessPreviewer._connectSettings(self, settings)
         self._view = settings.showWaveforms
@@ -559,5 +477,6 @@ class RandomAccessAudioPreviewer(RandomAccessPreviewer):
 
     def _showWaveformsChanged(self, settings):
         self._view = settings.showWaveforms
+        if not self._view and extractor_queue.remove(self.extractor):
+            self._extraction_queued = False
         self.emit("update", None)
-
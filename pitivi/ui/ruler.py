@@ -142,12 +142,14 @@ class ScaleRuler(gtk.DrawingArea, Zoomable, Loggable):
     def do_button_release_event(self, event):
         self.debug("button released at x:%d", event.x)
         self.pressed = False
+        self.app.current.seeker.endScrub()
         return False
 
     def do_motion_notify_event(self, event):
         self.debug("motion at event.x %d", event.x)
         if self.pressed:
-            # seek at position
+            # dragging the playhead, only seek to keyframes until it stops
+            self.app.current.seeker.startScrub()
             cur = self.pixelToNs(event.x + self.pixmap_offset)
             self._doSeek(cur)
         return False
@@ -31,7 +31,8 @@ from gettext import gettext as _
 from gettext import ngettext
 
 import pitivi.ui.dnd as dnd
-from pitivi.ui.pathwalker import PathWalker, quote_uri
+from pitivi.ui.pathwalker import quote_uri
+from pitivi.importer import FolderImporter
 from pitivi.ui.filelisterrordialog import FileListErrorDialog
 from pitivi.configure import get_pixmap_dir
 from pitivi.signalgroup import SignalGroup
@@ -110,6 +111,7 @@ class SourceList(gtk.VBox, Loggable):
 
         self.app = instance
         self.settings = instance.settings
+        self._importers = []
 
         # Store
         # icon, infotext, objectfactory, uri, length
@@ -376,6 +378,8 @@ class SourceList(gtk.VBox, Loggable):
             project.sources, "source-added", None, self._sourceAddedCb)
         self.project_signals.connect(
             project.sources, "source-removed", None, self._sourceRemovedCb)
+        self.project_signals.connect(
+            project.sources, "thumbnail-done", None, self._thumbnailDoneCb)
         self.project_signals.connect(
             project.sources, "discovery-error", None, self._discoveryErrorCb)
         self.project_signals.connect(
@@ -472,9 +476,25 @@ class SourceList(gtk.VBox, Loggable):
 
     def addFolders(self, folders):
         """ walks the trees of the folders in the list and adds the files it finds """
-        self.app.threads.addThread(PathWalker, folders, self.app.current.sources.addUris)
+        importer = FolderImporter(folders, self.app.threads)
+        importer.connect("uris-found", self._importerUrisFoundCb,
+                self.app.current.sources)
+        importer.connect("done", self._importerDoneCb)
+        self._importers.append(importer)
+        importer.start()
+
+    def _importerUrisFoundCb(self, importer, uris, sources):
+        if sources is not self.app.current.sources:
+            # the project was closed since the import started
+            importer.abort()
+            return
 
-    def _addFactory(self, factory):
+        sources.addUriBatch(uris)
+
+    def _importerDoneCb(self, importer):
+        self._importers.remove(importer)
+
+    def _getThumbnails(self, factory):
         video = factory.getOutputStreams(VideoStream)
         if video and video[0].thumbnail:
             thumbnail_file = video[0].thumbnail
@@ -502,6 +522,10 @@ class SourceList(gtk.VBox, Loggable):
                 thumbnail = self.audiofilepixbuf
                 thumbnail_large = self.audiofilepixbuf
 
+        return thumbnail, thumbnail_large
+
+    def _addFactory(self, factory):
+        thumbnail, thumbnail_large = self._getThumbnails(factory)
         if not factory.duration or factory.duration == gst.CLOCK_TIME_NONE:
             duration = ''
         else:
@@ -547,6 +571,13 @@ class SourceList(gtk.VBox, Loggable):
         if not len(model):
             self._displayHelpText()
 
+    def _thumbnailDoneCb(self, unused_sourcelist, factory):
+        for row in self.storemodel:
+            if row[COL_FACTORY] is factory:
+                row[COL_ICON], row[COL_ICON_LARGE] = \
+                        self._getThumbnails(factory)
+                break
+
     def _discoveryErrorCb(self, unused_sourcelist, uri, reason, extra):
         """ The given uri isn't a media file """
         self.infostub.addErrors(uri, reason, extra)
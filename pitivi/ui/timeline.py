@@ -779,13 +779,13 @@ class Timeline(gtk.Table, Loggable, Zoomable):
             interpolators = obj.getInterpolators()
             for value in interpolators:
                 interpolator = obj.getInterpolator(value)
-                keyframes = interpolator.getInteriorKeyframes()
+                keyframes = interpolator.keyframesInRange(position_in_obj,
+                        position_in_obj)
                 for kf in keyframes:
-                    if kf.getTime() == position_in_obj:
-                        keyframe_exists = True
-                        self.app.action_log.begin("remove volume point")
-                        interpolator.removeKeyframe(kf)
-                        self.app.action_log.commit()
+                    keyframe_exists = True
+                    self.app.action_log.begin("remove volume point")
+                    interpolator.removeKeyframe(kf)
+                    self.app.action_log.commit()
                 if keyframe_exists == False:
                     self.app.action_log.begin("add volume point")
                     interpolator.newKeyframe(position_in_obj)
@@ -67,6 +67,12 @@ class PlayheadController(Controller, Zoomable):
         x += self._hadj.get_value()
         self._canvas.app.current.seeker.seek(Zoomable.pixelToNs(x))
 
+    def drag_start(self, item, target, event):
+        self._canvas.app.current.seeker.startScrub()
+
+    def drag_end(self, item, target, event):
+        self._canvas.app.current.seeker.endScrub()
+
 class TimelineCanvas(goocanvas.Canvas, Zoomable, Loggable):
 
     __gtype_name__ = 'TimelineCanvas'
@@ -323,6 +329,7 @@ class TimelineCanvas(goocanvas.Canvas, Zoomable, Loggable):
     def _trackRemoved(self, unused_timeline, position):
         track = self._tracks[position]
         del self._tracks[position]
+        track.timeline = None
         track.remove()
         self.regroupTracks()
 
@@ -63,8 +63,10 @@ class Track(goocanvas.Group, Zoomable):
         Zoomable.__init__(self)
         self.app = instance
         self.widgets = {}
-        self.timeline = timeline
+        self._ripple_group = None
+        self._rippled_widgets = []
         self.track = track
+        self.timeline = timeline
         self.max_priority = 0
         self._expanded = True
 
@@ -76,6 +78,7 @@ class Track(goocanvas.Group, Zoomable):
 
             for widget in self.widgets.itervalues():
                 widget.expanded = expanded
+            self._updateRippleGroup()
             self.get_canvas().regroupTracks()
 
     def getHeight(self):
@@ -130,3 +133,62 @@ class Track(goocanvas.Group, Zoomable):
     @handler(track, "max-priority-changed")
     def _maxPriorityChanged(self, track, max_priority):
         self.get_canvas().regroupTracks()
+
+## timeline signals
+
+    def _setTimeline(self):
+        self._rippleEnded(None)
+        if self.timeline and self.timeline.ripple_objects:
+            self._rippleStarted(None, self.timeline.ripple_objects)
+
+    timeline = receiver(_setTimeline)
+
+    @handler(timeline, "ripple-started")
+    def _rippleStarted(self, unused_timeline, timeline_objects):
+        self._rippleEnded(None)
+        if not self.track:
+            return
+
+        # rippled objects are drawn in their own group, so that moving them
+        # only means moving the group
+        self._ripple_group = goocanvas.Group()
+        self.add_child(self._ripple_group)
+        for track_object in self.track.track_objects:
+            if track_object.timeline_object in timeline_objects and \
+                    track_object in self.widgets:
+                widget = self.widgets[track_object]
+                widget.remove()
+                self._ripple_group.add_child(widget)
+                self._rippled_widgets.append(widget)
+        self._updateRippleGroup()
+
+    @handler(timeline, "ripple-offset-changed")
+    def _rippleOffsetChanged(self, unused_timeline, offset, priority_offset):
+        self._updateRippleGroup()
+
+    @handler(timeline, "ripple-ended")
+    def _rippleEnded(self, unused_timeline):
+        if self._ripple_group is None:
+            return
+
+        for widget in self._rippled_widgets:
+            widget.remove()
+            self.add_child(widget)
+        self._rippled_widgets = []
+        self._ripple_group.remove()
+        self._ripple_group = None
+
+    def _updateRippleGroup(self):
+        if self._ripple_group is None:
+            return
+
+        if self._expanded:
+            height = LAYER_HEIGHT_EXPANDED
+        else:
+            height = LAYER_HEIGHT_COLLAPSED
+        x = self.nsToPixel(self.timeline.ripple_offset)
+        y = (height + LAYER_SPACING) * self.timeline.ripple_priority_offset
+        self._ripple_group.set_simple_transform(x, y, 1, 0)
+
+    def zoomChanged(self):
+        self._updateRippleGroup()
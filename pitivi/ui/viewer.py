@@ -71,6 +71,7 @@ class PitiviViewer(gtk.VBox, Loggable):
 
         self.seeker = Seeker(80)
         self.seeker.connect('seek', self._seekerSeekCb)
+        self.seeker.connect('scrub', self._seekerSeekCb, False)
         self.action = action
         self.pipeline = pipeline
 
@@ -147,6 +148,8 @@ class PitiviViewer(gtk.VBox, Loggable):
         self.pipeline.connect('element-message', self._elementMessageCb)
         self.pipeline.connect('duration-changed', self._durationChangedCb)
         self.pipeline.connect('eos', self._eosCb)
+        self.pipeline.connect('seek-done', self._seekDoneCb)
+        self.pipeline.connect('cached-frame', self._cachedFrameCb)
         # if we have an action set it to that new pipeline
         if self.action:
             self.pipeline.setAction(self.action)
@@ -169,7 +172,10 @@ class PitiviViewer(gtk.VBox, Loggable):
         self.pipeline.disconnect_by_function(self._elementMessageCb)
         self.pipeline.disconnect_by_function(self._durationChangedCb)
         self.pipeline.disconnect_by_function(self._eosCb)
+        self.pipeline.disconnect_by_function(self._seekDoneCb)
+        self.pipeline.disconnect_by_function(self._cachedFrameCb)
         self.pipeline.stop()
+        self.drawingarea.showFrame(None)
 
         self.pipeline = None
 
@@ -335,6 +341,7 @@ class PitiviViewer(gtk.VBox, Loggable):
         event.button = 2
         self.info("button pressed")
         self.moving_slider = True
+        self.seeker.startScrub()
         self.valuechangedid = slider.connect("value-changed", self._sliderValueChangedCb)
         self.pipeline.pause()
         return False
@@ -347,6 +354,7 @@ class PitiviViewer(gtk.VBox, Loggable):
         if self.valuechangedid:
             slider.disconnect(self.valuechangedid)
             self.valuechangedid = 0
+        self.seeker.endScrub()
         # revert to previous state
         if self.currentState == gst.STATE_PAUSED:
             self.pipeline.pause()
@@ -374,11 +382,18 @@ class PitiviViewer(gtk.VBox, Loggable):
         except:
             self.warning("seek failed")
 
-    def _seekerSeekCb(self, seeker, position, format):
+    def _seekerSeekCb(self, seeker, position, format, accurate=True):
         try:
-            self.pipeline.seek(position, format)
+            self.pipeline.seek(position, format, accurate)
         except PipelineError:
             self.error("seek failed %s %s", gst.TIME_ARGS(position), format)
+            self.seeker.seekFailed()
+
+    def _seekDoneCb(self, unused_pipeline, duration):
+        self.seeker.seekDone(duration)
+
+    def _cachedFrameCb(self, unused_pipeline, frame):
+        self.drawingarea.showFrame(frame)
 
     def _newTime(self, value, frame=-1):
         self.info("value:%s, frame:%d", gst.TIME_ARGS(value), frame)
@@ -473,6 +488,9 @@ class PitiviViewer(gtk.VBox, Loggable):
 class ViewerWidget(gtk.DrawingArea, Loggable):
     """
     Widget for displaying properly GStreamer video sink
+
+    @ivar frame: The cached frame drawn over the output of the video sink.
+    @type frame: L{Frame}
     """
 
     __gsignals__ = {}
@@ -481,6 +499,7 @@ class ViewerWidget(gtk.DrawingArea, Loggable):
         gtk.DrawingArea.__init__(self)
         Loggable.__init__(self)
         self.action = action # FIXME : Check if it's a view action
+        self.frame = None
         self.unset_flags(gtk.SENSITIVE)
         for state in range(gtk.STATE_INSENSITIVE + 1):
             self.modify_bg(state, self.style.black)
@@ -492,6 +511,30 @@ class ViewerWidget(gtk.DrawingArea, Loggable):
         else:
             self.window_xid  = self.window.xid
 
+    def showFrame(self, frame):
+        """
+        Draw a cached frame until the video sink shows a new one.
+
+        @type frame: L{Frame} or C{None}
+        """
+        self.frame = frame
+        if frame is not None:
+            # the video sink draws over it when it gets a new frame
+            self.queue_draw()
+
+    def do_expose_event(self, event):
+        if self.frame is None:
+            return False
+
+        frame = self.frame
+        pixbuf = gdk.pixbuf_new_from_data(frame.data, gdk.COLORSPACE_RGB,
+                False, 8, frame.width, frame.height, frame.rowstride)
+        x, y, width, height = self.get_allocation()
+        if (width, height) != (frame.width, frame.height):
+            pixbuf = pixbuf.scale_simple(width, height, gdk.INTERP_BILINEAR)
+        self.window.draw_pixbuf(None, pixbuf, 0, 0, 0, 0)
+        return False
+
 class PlayPauseButton(gtk.Button, Loggable):
     """ Double state gtk.Button which displays play/pause """
 
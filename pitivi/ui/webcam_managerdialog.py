@@ -25,7 +25,7 @@ import tempfile
 from pitivi.settings import ExportSettings
 from pitivi.sourcelist import SourceList
 from pitivi.bin import SmartCaptureBin, SinkBin
-from pitivi.threads import CallbackThread
+from pitivi.threads import CallbackJob, INTERACTIVE
 from pitivi.ui.glade import GladeWindow
 
 class WebcamManagerDialog(GladeWindow):
@@ -75,14 +75,16 @@ class WebcamManagerDialog(GladeWindow):
         self.filepath = None
 
         self.sink = SinkBin()
-        CallbackThread(self._setupPlayer).start()
+        self.pitivi.threads.submit(
+                CallbackJob(self._setupPlayer, priority=INTERACTIVE))
 
     def show_all(self):
         self.window.show_all()
 
     # Perform record in a seperate thread
     def threaded_recording(self, w):
-        CallbackThread(self.do_recording, w).start()
+        self.pitivi.threads.submit(
+                CallbackJob(self.do_recording, w, priority=INTERACTIVE))
 
 
     # Record button action callback
@@ -245,7 +247,8 @@ class WebcamManagerDialog(GladeWindow):
         self._changeSelectedAudio(dev)
         if not hasattr(self, "player"):
             return
-        CallbackThread(self._resetPlayer).start()
+        self.pitivi.threads.submit(
+                CallbackJob(self._resetPlayer, priority=INTERACTIVE))
 
     def _vdevComboChangedCb(self, widget):
         row = widget.get_model()[widget.get_active()]
@@ -258,4 +261,5 @@ class WebcamManagerDialog(GladeWindow):
         self._changeSelectedVideo(dev)
         if not hasattr(self, "player"):
             return
-        CallbackThread(self._resetPlayer).start()
+        self.pitivi.threads.submit(
+                CallbackJob(self._resetPlayer, priority=INTERACTIVE))
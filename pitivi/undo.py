@@ -44,6 +44,30 @@ class UndoableAction(Signallable):
     def clean(self):
         pass
 
+    def getCoalesceKey(self):
+        """
+        Returns a hashable key identifying what this action changes, or
+        C{None} if the action can't be merged with others.
+
+        Consecutive actions with the same key pushed in the same stack are
+        merged with L{coalesce}.
+        """
+        return None
+
+    def coalesce(self, action):
+        """
+        Merge a newer action having the same coalesce key into this one, so
+        that undoing this action undoes both.
+
+        @param action: The newer action.
+        @type action: L{UndoableAction}
+        """
+        raise NotImplementedError()
+
+    def getActionCount(self):
+        """ Returns the number of actions this action is made of. """
+        return 1
+
     def _done(self):
         self.emit("done")
 
@@ -62,9 +86,41 @@ class UndoableActionStack(UndoableAction):
         self.done_actions = []
         self.undone_actions = []
         self.actions = []
+        self.generation = 0
+        self._coalesce = {}
 
     def push(self, action):
+        """
+        Push an action in the stack.
+
+        If the action changes the same thing as an action pushed since the
+        last action that can't be merged, the two are merged.
+
+        @return: C{True} if the action was merged with a previous one.
+        @rtype: C{bool}
+        """
+        key = action.getCoalesceKey()
+        if key is None:
+            # don't merge across actions we don't know anything about, their
+            # undo could depend on the intermediate values
+            self._coalesce.clear()
+        else:
+            previous = self._coalesce.get(key)
+            if previous is not None:
+                previous.coalesce(action)
+                return True
+
+            self._coalesce[key] = action
+
         self.done_actions.append(action)
+        return False
+
+    def getActionCount(self):
+        count = 0
+        for action in self.done_actions + self.undone_actions:
+            count += action.getActionCount()
+
+        return count
 
     def _runAction(self, action_list, method_name):
         for action in action_list[::-1]:
@@ -85,11 +141,22 @@ class UndoableActionStack(UndoableAction):
         actions = self.done_actions + self.undone_actions
         self.undone_actions = []
         self.done_actions = []
+        self._coalesce.clear()
         self._runAction(actions, "clean")
         self.emit("cleaned")
 
 
 class UndoableActionLog(Signallable):
+    """
+    Records the actions done by the user in stacks, which can then be undone
+    and redone.
+
+    @ivar max_actions: The number of actions above which the oldest undo
+    stacks are dropped, or C{None} to keep them all. The most recent stack
+    is always kept.
+    @type max_actions: C{int}
+    """
+
     __signals__ = {
         "begin": ["stack", "nested"],
         "push": ["stack", "action"],
@@ -99,11 +166,16 @@ class UndoableActionLog(Signallable):
         "redo": ["stack"],
         "cleaned": [],
     }
-    def __init__(self):
+    def __init__(self, max_actions=None):
         self.undo_stacks = []
         self.redo_stacks = []
         self.stacks = []
         self.running = False
+        self.max_actions = max_actions
+        self._action_count = 0
+        self._generation = 0
+        # the generation of the state before the oldest undo stack
+        self._base_generation = 0
         self._checkpoint = self._takeSnapshot()
 
     def begin(self, action_group_name):
@@ -147,13 +219,20 @@ class UndoableActionLog(Signallable):
             return
         nested = self._stackIsNested(stack)
         if not self.stacks:
+            self._generation += 1
+            stack.generation = self._generation
             self.undo_stacks.append(stack)
         else:
             self.stacks[-1].push(stack)
 
         if self.redo_stacks:
+            self._dropStacks(self.redo_stacks)
             self.redo_stacks = []
 
+        if not nested:
+            self._action_count += stack.getActionCount()
+            self._enforceBudget()
+
         self.emit("commit", stack, nested)
 
     def undo(self):
@@ -181,13 +260,26 @@ class UndoableActionLog(Signallable):
         stacks = self.redo_stacks + self.undo_stacks
         self.redo_stacks = []
         self.undo_stacks = []
+        self._action_count = 0
+        self._base_generation = 0
 
         for stack in stacks:
             self._runStack(stack, stack.clean)
         self.emit("cleaned")
 
+    def getActionCount(self):
+        """
+        Returns the number of actions in the undo and redo stacks.
+        """
+        return self._action_count
+
     def _takeSnapshot(self):
-        return list(self.undo_stacks)
+        # every committed stack gets a new generation, so the generation of
+        # the topmost undo stack identifies the current state
+        if self.undo_stacks:
+            return self.undo_stacks[-1].generation
+
+        return self._base_generation
 
     def checkpoint(self):
         if self.stacks:
@@ -196,8 +288,22 @@ class UndoableActionLog(Signallable):
         self._checkpoint = self._takeSnapshot()
 
     def dirty(self):
-        current_snapshot = self._takeSnapshot()
-        return current_snapshot != self._checkpoint
+        return self._takeSnapshot() != self._checkpoint
+
+    def _dropStacks(self, stacks):
+        for stack in stacks:
+            self._action_count -= stack.getActionCount()
+            self._runStack(stack, stack.clean)
+
+    def _enforceBudget(self):
+        if self.max_actions is None:
+            return
+
+        while self._action_count > self.max_actions and \
+                len(self.undo_stacks) > 1:
+            stack = self.undo_stacks.pop(0)
+            self._base_generation = stack.generation
+            self._dropStacks([stack])
 
     def _runStack(self, stack, run):
         self.running = True
@@ -29,6 +29,7 @@ import gst, bisect
 import os
 from pitivi.signalinterface import Signallable
 import pitivi.log.log as log
+from pitivi.registrycache import registrycache
 from gettext import ngettext
 try:
     import cProfile
@@ -283,42 +284,206 @@ class PropertyChangeTracker(Signallable):
         self.emit(property_name + '-changed', object, old_value, value)
 
 class Seeker(Signallable):
-    __signals__ = {'seek': ['position', 'format']}
+    """
+    Rate-limits the seeks done by the user interface.
+
+    The first seek is done right away, the following ones are delayed so that
+    there's at least C{timeout} milliseconds between two seeks. Only the last
+    position requested meanwhile is sought to. If L{seekDone} is called when
+    the sought position is reached, the delay adapts to the time seeks take to
+    complete, and no seek is emitted while the previous one is in flight. A
+    seek which can't be done must be reported with L{seekFailed}, and a seek
+    which isn't reported at all stops being waited for after
+    C{IN_FLIGHT_TIMEOUT} milliseconds.
+
+    Between L{startScrub} and L{endScrub}, seeks are emitted with the C{scrub}
+    signal and should be done as fast keyframe seeks. An accurate C{seek} to
+    the last position follows when the scrub ends, or when the position
+    doesn't change for C{settle_timeout} milliseconds.
+
+    Signals:
+     - C{seek} : Seek accurately to the given position.
+     - C{scrub} : Seek quickly to a position close to the given one.
+    """
+
+    __signals__ = {
+        'seek': ['position', 'format'],
+        'scrub': ['position', 'format'],
+    }
 
-    def __init__(self, timeout):
+    # the delay between seeks doesn't grow beyond this
+    MAX_TIMEOUT = 500
+    # give up waiting for seekDone() after this
+    IN_FLIGHT_TIMEOUT = 1000
+
+    def __init__(self, timeout, settle_timeout=150):
         self.timeout = timeout
+        self.settle_timeout = settle_timeout
         self.pending_seek_id = None
+        self.pending_settle_id = None
+        self.pending_flight_id = None
         self.position = None
         self.format = None
+        self.scrubbing = False
+        self.seek_in_flight = False
+        # the mean time seeks took to complete, if they are reported
+        self._seek_duration = None
+        self._last_scrub = None
 
     def seek(self, position, format=gst.FORMAT_TIME, on_idle=False):
         self.position = position
         self.format = format
 
-        if self.pending_seek_id is None:
+        if self.scrubbing:
+            self._scheduleSettle()
+
+        if self.pending_seek_id is None and not self.seek_in_flight:
             if on_idle:
                 gobject.idle_add(self._seekTimeoutCb)
             else:
                 self._seekTimeoutCb()
-            self.pending_seek_id = self._scheduleSeek(self.timeout,
+            self.pending_seek_id = self._scheduleSeek(self.getTimeout(),
+                    self._seekTimeoutCb)
+
+    def startScrub(self):
+        """
+        Start a scrub, as when the user starts dragging the playhead.
+        """
+        self.scrubbing = True
+
+    def endScrub(self):
+        """
+        End a scrub, seeking accurately to the last position.
+        """
+        if not self.scrubbing:
+            return
+
+        self.scrubbing = False
+        self._cancelSettle()
+        self._settle()
+
+    def seekDone(self, duration):
+        """
+        Tell the seeker that the last seek completed.
+
+        @param duration: The time the seek took to complete, in nanoseconds.
+        @type duration: C{long}
+        """
+        duration = duration / gst.MSECOND
+        if self._seek_duration is None:
+            self._seek_duration = duration
+        else:
+            self._seek_duration = (self._seek_duration + duration) / 2
+
+        self._seekFinished()
+
+    def seekFailed(self):
+        """
+        Tell the seeker that the last seek couldn't be done.
+        """
+        self._seekFinished()
+
+    def _seekFinished(self):
+        self._clearInFlight()
+
+        # a seek was requested while the previous one was in flight
+        if self.pending_seek_id is None and self.position is not None:
+            self._seekTimeoutCb()
+            self.pending_seek_id = self._scheduleSeek(self.getTimeout(),
                     self._seekTimeoutCb)
 
+    def _clearInFlight(self):
+        self.seek_in_flight = False
+        if self.pending_flight_id is not None:
+            self._removeSeek(self.pending_flight_id)
+            self.pending_flight_id = None
+
+    def _inFlightTimeoutCb(self):
+        self.pending_flight_id = None
+        log.doLog(log.WARN, None, "seeker",
+                "seek not reported done after %d ms", (self.IN_FLIGHT_TIMEOUT,))
+        self._seekFinished()
+        return False
+
+    def getTimeout(self):
+        """
+        Returns the minimal delay between two seeks, in milliseconds.
+        """
+        if self._seek_duration is None:
+            return self.timeout
+
+        return int(max(self.timeout,
+                min(self._seek_duration, self.MAX_TIMEOUT)))
+
     def _scheduleSeek(self, timeout, callback):
         return gobject.timeout_add(timeout, callback)
 
+    def _removeSeek(self, seek_id):
+        gobject.source_remove(seek_id)
+
+    def _scheduleSettle(self):
+        self._cancelSettle()
+        self.pending_settle_id = self._scheduleSeek(self.settle_timeout,
+                self._settleTimeoutCb)
+
+    def _cancelSettle(self):
+        if self.pending_settle_id is not None:
+            self._removeSeek(self.pending_settle_id)
+            self.pending_settle_id = None
+
+    def _settle(self):
+        # supersede the scrub seeks that didn't happen yet
+        if self.position is not None and self.format is not None:
+            self._last_scrub = self.position, self.format
+            self.position = None
+            self.format = None
+
+        if self._last_scrub is None:
+            return
+
+        position, format = self._last_scrub
+        self._last_scrub = None
+        self._emitSeek('seek', position, format)
+
+    def _settleTimeoutCb(self):
+        self.pending_settle_id = None
+        self._settle()
+        return False
+
     def _seekTimeoutCb(self):
         self.pending_seek_id = None
+        if self.seek_in_flight:
+            # wait for seekDone() instead
+            return False
+
         if self.position != None and self.format != None:
             position, self.position = self.position, None
             format, self.format = self.format, None
-            try:
-                self.emit('seek', position, format)
-            except:
-                log.doLog(log.ERROR, None, "seeker", "Error while seeking to position:%s format:%r",
-                          (gst.TIME_ARGS(position), format))
-                # if an exception happened while seeking, properly
-                # reset ourselves
-                return False
+            if self.scrubbing and format == gst.FORMAT_TIME:
+                self._last_scrub = position, format
+                signal = 'scrub'
+            else:
+                self._last_scrub = None
+                signal = 'seek'
+
+            return self._emitSeek(signal, position, format)
+        return False
+
+    def _emitSeek(self, signal, position, format):
+        if self._seek_duration is not None:
+            # seeks report their completion
+            self._clearInFlight()
+            self.seek_in_flight = True
+            self.pending_flight_id = self._scheduleSeek(self.IN_FLIGHT_TIMEOUT,
+                    self._inFlightTimeoutCb)
+        try:
+            self.emit(signal, position, format)
+        except:
+            self._clearInFlight()
+            log.doLog(log.ERROR, None, "seeker", "Error while seeking to position:%s format:%r",
+                      (gst.TIME_ARGS(position), format))
+            # if an exception happened while seeking, properly
+            # reset ourselves
         return False
 
 def get_filesystem_encoding():
@@ -449,8 +614,17 @@ def getNextObject(obj, objects, priority=-1, skip=None):
 
 
 class CachedFactoryList(object):
-    def __init__(self, factoryFilter=None):
+    """
+    Lazily built list of element factories, sorted by rank.
+
+    If cache_name is given, the names of the factories that pass
+    factoryFilter are kept in the persistent registry cache under that
+    name, so that the filter doesn't run on the whole registry at every
+    startup. The filter must then only depend on the registry.
+    """
+    def __init__(self, factoryFilter=None, cache_name=None):
         self._factoryFilter = factoryFilter
+        self._cache_name = cache_name
         self._factories = None
         self._registry = gst.registry_get_default()
         self._registry.connect("feature-added", self._registryFeatureAddedCb)
@@ -464,16 +638,29 @@ class CachedFactoryList(object):
     def _buildFactories(self):
         # build the cache
         log.debug("utils", "Getting factories list")
-        factories = self._registry.get_feature_list(gst.ElementFactory)
-        if self._factoryFilter is not None:
-            log.debug("utils", "filtering")
-            factories = filter(self._factoryFilter, factories)
+        if self._cache_name is not None:
+            names = registrycache().get(self._cache_name, self._scanRegistry)
+            factories = [factory for factory in
+                    (gst.element_factory_find(name) for name in names)
+                    if factory is not None]
+        else:
+            factories = self._filterFactories()
 
         log.debug("utils", "Sorting by rank")
         factories.sort(key=lambda factory: factory.get_rank(), reverse=True)
         self._factories = factories
         log.debug("utils", "Cached factories is now %r", self._factories)
 
+    def _filterFactories(self):
+        factories = self._registry.get_feature_list(gst.ElementFactory)
+        if self._factoryFilter is not None:
+            log.debug("utils", "filtering")
+            factories = filter(self._factoryFilter, factories)
+        return factories
+
+    def _scanRegistry(self):
+        return [factory.get_name() for factory in self._filterFactories()]
+
     def _registryFeatureAddedCb(self, registry, feature):
         # invalidate the cache
         log.warning("utils", "New feature added, invalidating cached factories")
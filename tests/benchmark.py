@@ -0,0 +1,495 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/benchmark.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Benchmarks of the timeline hot paths, on generated timelines
+
+Run with C{make benchmark}, or directly::
+
+    benchmark.py --clips 1000 --output results.txt
+    benchmark.py --clips 1000 --baseline results.txt
+
+Results are written one per line, as tab separated fields: C{param} lines
+give the size of the timeline and C{time} lines the shortest time of each
+benchmark over all the runs, in seconds.
+"""
+
+import gc
+import sys
+import time
+from optparse import OptionParser
+from xml.etree.ElementTree import fromstring
+
+import gobject
+gobject.threads_init()
+import gst
+
+from pitivi.log import log
+from pitivi.factories.test import VideoTestSourceFactory, \
+        AudioTestSourceFactory
+from pitivi.factories.operation import EffectFactory
+from pitivi.formatters.etree import ElementTreeFormatter, tostring
+from pitivi.project import Project
+from pitivi.stream import VideoStream
+from pitivi.timeline.timeline import Timeline, TimelineObject, \
+        TimelineError, MoveContext, TrimStartContext
+from pitivi.timeline.track import Track, SourceTrackObject, TrackEffect
+from pitivi.timeline.timeline_undo import TimelineLogObserver
+from pitivi.undo import UndoableActionLog
+
+# number of positions looked up by each query benchmark
+QUERIES = 200
+
+# number of intermediate positions of each edit
+EDIT_STEPS = 10
+
+
+class SyntheticEffects(object):
+    """
+    The effects used by a L{SyntheticTimeline}, looked up by name when
+    loading a project like L{EffectsHandler} does.
+    """
+
+    def __init__(self):
+        self.factories = {}
+
+    def getFactory(self, stream):
+        """ Returns the effect factory for the tracks of C{stream} """
+        if isinstance(stream, VideoStream):
+            name = "video-identity"
+        else:
+            name = "audio-identity"
+        try:
+            return self.factories[name]
+        except KeyError:
+            factory = EffectFactory("identity", name)
+            factory.addInputStream(stream)
+            factory.addOutputStream(stream)
+            self.factories[name] = factory
+            return factory
+
+    def getFactoryFromName(self, name):
+        return self.factories[name]
+
+
+class SyntheticTimeline(object):
+    """
+    A timeline filled with generated clips, which don't need any media file.
+
+    Clips are spread over the layers in turn. Consecutive clips of a layer
+    overlap, so that the tracks have transitions.
+
+    @ivar timeline: The generated timeline.
+    @type timeline: L{Timeline}
+    @ivar sources: The source factories used by the clips.
+    @ivar effects: The effect factories used by the clips.
+    @type effects: L{SyntheticEffects}
+    """
+
+    def __init__(self, clips=100, tracks=2, layers=3, keyframes=0,
+            effects=0, clip_duration=5 * gst.SECOND, overlap=gst.SECOND):
+        """
+        @param clips: The number of timeline objects.
+        @param tracks: The number of tracks, alternately video and audio.
+        Every clip has a track object in each of them.
+        @param layers: The number of priorities the clips are spread over.
+        @param keyframes: The number of keyframes of each source.
+        @param effects: The number of effects on each source.
+        """
+        self.params = [("clips", clips), ("tracks", tracks),
+                ("layers", layers), ("keyframes", keyframes),
+                ("effects", effects)]
+        self.clip_duration = clip_duration
+        self.overlap = overlap
+        self.timeline = Timeline()
+        self.effects = SyntheticEffects()
+
+        video_source = VideoTestSourceFactory()
+        audio_source = AudioTestSourceFactory()
+        self.sources = [video_source, audio_source]
+
+        for index in xrange(tracks):
+            if index % 2:
+                source = audio_source
+            else:
+                source = video_source
+            stream = source.getOutputStreams()[0]
+            self.timeline.addTrack(Track(stream))
+
+        self.timeline.disableUpdates()
+        try:
+            for index in xrange(clips):
+                self._addClip(index, layers, keyframes, effects)
+        finally:
+            self.timeline.enableUpdates()
+
+    def getEnd(self):
+        """ Returns the end of the last clip """
+        return max([timeline_object.start + timeline_object.duration
+                for timeline_object in self.timeline.timeline_objects])
+
+    def getPositions(self, count):
+        """ Returns C{count} positions spread over the whole timeline """
+        end = self.getEnd()
+        return [end * index / count for index in xrange(count)]
+
+    def _addClip(self, index, layers, keyframes, effects):
+        layer = index % layers
+        start = (index / layers) * (self.clip_duration - self.overlap) + \
+                layer * self.overlap / 2
+
+        timeline_object = None
+        for track in self.timeline.tracks:
+            if isinstance(track.stream, VideoStream):
+                factory = self.sources[0]
+            else:
+                factory = self.sources[1]
+            track_object = SourceTrackObject(factory, track.stream,
+                    start=start, duration=self.clip_duration,
+                    media_duration=self.clip_duration)
+            track.addTrackObject(track_object)
+            self._addKeyframes(track_object, keyframes)
+            if timeline_object is None:
+                timeline_object = TimelineObject(factory)
+            timeline_object.addTrackObject(track_object)
+
+            for unused_index in xrange(effects):
+                effect = TrackEffect(self.effects.getFactory(track.stream),
+                        track.stream, start=start,
+                        duration=self.clip_duration,
+                        media_duration=self.clip_duration)
+                track.addTrackObject(effect)
+                timeline_object.addTrackObject(effect)
+
+        if timeline_object is not None:
+            self.timeline.addTimelineObject(timeline_object)
+            timeline_object.priority = layer
+
+    def _addKeyframes(self, track_object, keyframes):
+        interpolators = track_object.getInterpolators()
+        if not keyframes or not interpolators:
+            return
+
+        unused_prop, interpolator = interpolators[sorted(interpolators)[0]]
+        step = track_object.media_duration / (keyframes + 1)
+        for index in xrange(keyframes):
+            if index % 2:
+                value = interpolator.upper
+            else:
+                value = interpolator.lower
+            interpolator.newKeyframe(track_object.in_point +
+                    (index + 1) * step, value)
+
+
+class BenchmarkResults(object):
+    """
+    The shortest time taken by each benchmark over several runs.
+
+    @ivar params: The (name, value) of each parameter of the timeline.
+    @ivar times: The times of the benchmarks, in seconds, by name.
+    @ivar names: The names of the benchmarks, in the order they ran.
+    """
+
+    def __init__(self, params=()):
+        self.params = list(params)
+        self.times = {}
+        self.names = []
+
+    def add(self, name, seconds):
+        if name not in self.times:
+            self.names.append(name)
+            self.times[name] = seconds
+        else:
+            self.times[name] = min(self.times[name], seconds)
+
+    def write(self, output):
+        for name, value in self.params:
+            output.write("param\t%s\t%s\n" % (name, value))
+        for name in self.names:
+            output.write("time\t%s\t%.6f\n" % (name, self.times[name]))
+
+    def read(cls, input):
+        results = cls()
+        for line in input:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            kind, name, value = line.split("\t")
+            if kind == "param":
+                results.params.append((name, int(value)))
+            elif kind == "time":
+                results.add(name, float(value))
+        return results
+
+    read = classmethod(read)
+
+    def compare(self, baseline, tolerance):
+        """
+        Find the benchmarks slower than in C{baseline} by more than
+        C{tolerance}, a fraction of the baseline time.
+
+        @raise ValueError: If the timelines of the results differ.
+        @return: The (name, baseline time, time) of each regression.
+        """
+        if dict(self.params) != dict(baseline.params):
+            raise ValueError("the baseline was measured on another timeline")
+
+        regressions = []
+        for name in self.names:
+            if name not in baseline.times:
+                continue
+            if self.times[name] > baseline.times[name] * (1 + tolerance):
+                regressions.append((name, baseline.times[name],
+                        self.times[name]))
+        return regressions
+
+
+class TimelineBenchmarks(object):
+    """
+    Times the hot paths of the timeline on a L{SyntheticTimeline}.
+
+    Every benchmark leaves the timeline as it found it, so they can be run
+    several times in a row.
+    """
+
+    def __init__(self, synthetic, results):
+        self.synthetic = synthetic
+        self.timeline = synthetic.timeline
+        self.results = results
+        self.positions = synthetic.getPositions(QUERIES)
+        # edits are made from the first track object of a clip in the
+        # middle, like when dragging it in the timeline
+        objects = self.timeline.timeline_objects
+        self.focus = objects[len(objects) / 2].track_objects[0]
+
+    def run(self):
+        self.benchmarkQueries()
+        self.benchmarkEditPoints()
+        self.benchmarkNeighbours()
+        self.benchmarkMove()
+        self.benchmarkRippleMove()
+        self.benchmarkTrimStart()
+        self.benchmarkTransitions()
+        self.benchmarkSaveLoad()
+        self.benchmarkUndoRedo()
+
+    def _time(self, name, function, *args):
+        gc.collect()
+        start = time.time()
+        try:
+            return function(*args)
+        finally:
+            self.results.add(name, time.time() - start)
+
+    def _queries(self, query, *args):
+        for position in self.positions:
+            query(position, *args)
+
+    def benchmarkQueries(self):
+        end = self.synthetic.getEnd()
+        self._time("timeline.getObjsAtTime", self._queries,
+                self.timeline.getObjsAtTime)
+        self._time("timeline.getObjsBeforeTime", self._queries,
+                self.timeline.getObjsBeforeTime)
+        self._time("timeline.getObjsAfterTime", self._queries,
+                self.timeline.getObjsAfterTime)
+        self._time("timeline.getObjsInRegion", self._queries,
+                self.timeline.getObjsInRegion, end)
+        self._time("timeline.snapToEdge", self._queries,
+                self.timeline.snapToEdge)
+
+    def benchmarkEditPoints(self):
+        end = self.synthetic.getEnd()
+        self._time("timeline.getPrevKeyframe", self._queries,
+                self.timeline.getPrevKeyframe)
+        self._time("timeline.getNextKeyframe", self._queries,
+                self.timeline.getNextKeyframe)
+        self._time("timeline.getKeyframesInRange", self._queries,
+                self.timeline.getKeyframesInRange, end)
+
+    def _neighbours(self):
+        objects = self.timeline.timeline_objects
+        for index in xrange(0, len(objects), max(1, len(objects) / QUERIES)):
+            obj = objects[index]
+            for method in (self.timeline.getPreviousTimelineObject,
+                    self.timeline.getNextTimelineObject):
+                try:
+                    method(obj, obj.priority)
+                except TimelineError:
+                    pass
+
+    def benchmarkNeighbours(self):
+        self._time("timeline.getNeighbours", self._neighbours)
+
+    def _edit(self, context_class, focus, offsets, mode=None):
+        original = focus.start
+        context = context_class(self.timeline, focus, set())
+        if mode is not None:
+            context.setMode(mode)
+        for offset in offsets:
+            context.editTo(original + offset, focus.priority)
+        context.finish()
+
+    def _getOffsets(self, distance):
+        return [distance * (step + 1) / EDIT_STEPS
+                for step in xrange(EDIT_STEPS)]
+
+    def _editBackAndForth(self, context_class, distance, mode=None):
+        self._edit(context_class, self.focus, self._getOffsets(distance), mode)
+        self._edit(context_class, self.focus, self._getOffsets(-distance),
+                mode)
+
+    def benchmarkMove(self):
+        self._time("edit.move", self._editBackAndForth, MoveContext,
+                gst.SECOND * 2)
+
+    def benchmarkRippleMove(self):
+        self._time("edit.move.ripple", self._editBackAndForth, MoveContext,
+                gst.SECOND * 2, MoveContext.RIPPLE)
+
+    def benchmarkTrimStart(self):
+        self._time("edit.trimStart", self._editBackAndForth,
+                TrimStartContext, gst.SECOND)
+
+    def _updateTransitions(self):
+        for track in self.timeline.tracks:
+            track.updateTransitions()
+
+    def benchmarkTransitions(self):
+        self._time("track.updateTransitions", self._updateTransitions)
+
+    def _save(self, formatter, project):
+        return tostring(formatter._serializeProject(project))
+
+    def _load(self, formatter, data):
+        root = fromstring(data)
+        formatter.factoriesnode = root.find("factories")
+        formatter.timelinenode = root.find("timeline")
+        formatter._loadSources()
+        formatter._loadTimeline(formatter.timelinenode)
+
+    def benchmarkSaveLoad(self):
+        project = Project()
+        project.timeline = self.timeline
+        for source in self.synthetic.sources:
+            project.sources.addFactory(source)
+        formatter = ElementTreeFormatter(self.synthetic.effects)
+        data = self._time("formatter.save", self._save, formatter, project)
+
+        # the rediscovery of the sources is left out, it needs files
+        formatter = ElementTreeFormatter(self.synthetic.effects)
+        formatter.project = Project()
+        self._time("formatter.load", self._load, formatter, data)
+
+    def benchmarkUndoRedo(self):
+        action_log = UndoableActionLog()
+        observer = TimelineLogObserver(action_log)
+        observer.startObserving(self.timeline)
+        try:
+            action_log.begin("ripple move")
+            self._edit(MoveContext, self.focus,
+                    self._getOffsets(gst.SECOND * 2), MoveContext.RIPPLE)
+            action_log.commit()
+
+            self._time("undo", action_log.undo)
+            self._time("redo", action_log.redo)
+            action_log.undo()
+        finally:
+            observer.stopObserving(self.timeline)
+
+
+def run_benchmarks(synthetic, repeat=3):
+    """
+    Run all the benchmarks C{repeat} times on C{synthetic}.
+
+    @type synthetic: L{SyntheticTimeline}
+    @rtype: L{BenchmarkResults}
+    """
+    results = BenchmarkResults(synthetic.params)
+    benchmarks = TimelineBenchmarks(synthetic, results)
+    for unused_run in xrange(repeat):
+        benchmarks.run()
+    return results
+
+
+def main(argv):
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("-c", "--clips", type="int", default=500,
+            help="number of clips of the timeline")
+    parser.add_option("-t", "--tracks", type="int", default=2,
+            help="number of tracks, alternately video and audio")
+    parser.add_option("-l", "--layers", type="int", default=3,
+            help="number of layers the clips are spread over")
+    parser.add_option("-k", "--keyframes", type="int", default=4,
+            help="number of keyframes of each clip")
+    parser.add_option("-e", "--effects", type="int", default=1,
+            help="number of effects on each clip")
+    parser.add_option("-r", "--repeat", type="int", default=3,
+            help="number of runs, the shortest time is kept")
+    parser.add_option("-o", "--output",
+            help="write the results to OUTPUT instead of the standard output")
+    parser.add_option("-b", "--baseline",
+            help="compare the results with the ones in BASELINE")
+    parser.add_option("--tolerance", type="float", default=0.25,
+            help="slowdown reported as a regression, as a fraction of the "
+            "baseline time [default: %default]")
+    options, args = parser.parse_args(argv[1:])
+    if args:
+        parser.error("unexpected arguments")
+    if options.clips < 1 or options.tracks < 1 or options.layers < 1:
+        parser.error("the timeline needs at least a clip, track and layer")
+
+    log.init('PITIVI_DEBUG', 1)
+    synthetic = SyntheticTimeline(clips=options.clips,
+            tracks=options.tracks, layers=options.layers,
+            keyframes=options.keyframes, effects=options.effects)
+    results = run_benchmarks(synthetic, options.repeat)
+
+    if options.output:
+        output = open(options.output, "w")
+        try:
+            results.write(output)
+        finally:
+            output.close()
+    else:
+        results.write(sys.stdout)
+
+    if options.baseline:
+        baseline_file = open(options.baseline)
+        try:
+            baseline = BenchmarkResults.read(baseline_file)
+        finally:
+            baseline_file.close()
+
+        try:
+            regressions = results.compare(baseline, options.tolerance)
+        except ValueError, e:
+            sys.stderr.write("%s\n" % e)
+            return 2
+
+        for name, baseline_time, new_time in regressions:
+            sys.stderr.write("%s: %.6f s, was %.6f s\n" %
+                    (name, new_time, baseline_time))
+        if regressions:
+            return 1
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -31,7 +31,8 @@ import gst
 from pitivi.factories.test import VideoTestSourceFactory
 from pitivi.stream import VideoStream
 from pitivi.timeline.track import Track, SourceTrackObject, Interpolator
-from pitivi.elements.mixer import SmartVideomixerBinPropertyHelper
+from pitivi.elements.mixer import SmartVideomixerBin, \
+        SmartVideomixerBinPropertyHelper
 from pitivi.utils import infinity
 
 def set_one_keyframe(track_object, value):
@@ -238,3 +239,53 @@ class TestAlpha(TestCase):
         track_object2.priority = old_priority
         self.track1.updateTransitions()
         self.failUnlessAlphaIsNotSet()
+
+class TestPassthrough(TestCase):
+    def setUp(self):
+        self.track = Track(yuv("I420"))
+        self.svmbin = SmartVideomixerBin(self.track)
+        self.template = gst.PadTemplate("sink_%u", gst.PAD_SINK,
+                gst.PAD_REQUEST, gst.Caps("video/x-raw-yuv;video/x-raw-rgb"))
+
+    def tearDown(self):
+        del self.svmbin
+        del self.track
+        TestCase.tearDown(self)
+
+    def failUnlessPassthrough(self, pad):
+        self.failUnlessEqual(self.svmbin.passthrough_input, pad.get_name())
+        self.failUnlessEqual(pad.get_target(),
+                self.svmbin.passthrough.get_pad("sink"))
+        self.failUnlessEqual(self.svmbin.srcpad.get_target(),
+                self.svmbin.passthrough.get_pad("src"))
+
+    def failUnlessMixing(self):
+        self.failUnlessEqual(self.svmbin.passthrough_input, None)
+        self.failUnlessEqual(self.svmbin.srcpad.get_target(),
+                self.svmbin.csp.get_pad("src"))
+        for sinkpad, csp, capsfilter, videomixerpad in \
+                self.svmbin.inputs.values():
+            self.failUnlessEqual(sinkpad.get_target(), csp.get_pad("sink"))
+
+    def testOverlap(self):
+        pad1 = self.svmbin.do_request_new_pad(self.template)
+        self.failUnlessPassthrough(pad1)
+
+        pad2 = self.svmbin.do_request_new_pad(self.template)
+        self.failUnlessMixing()
+
+        self.svmbin.do_release_pad(pad1)
+        self.failUnlessPassthrough(pad2)
+
+    def testKeyframeAlpha(self):
+        pad = self.svmbin.do_request_new_pad(self.template)
+        self.failUnlessPassthrough(pad)
+
+        helper = self.svmbin.alpha_helper
+        helper.keyframe_alpha_count = 1
+        helper._updateAlphaState()
+        self.failUnlessMixing()
+
+        helper.keyframe_alpha_count = 0
+        helper._updateAlphaState()
+        self.failUnlessPassthrough(pad)
@@ -0,0 +1,88 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_benchmark.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+from StringIO import StringIO
+from unittest import TestCase
+
+from benchmark import BenchmarkResults, SyntheticTimeline, run_benchmarks
+
+
+class TestBenchmarkResults(TestCase):
+
+    def testReadWrite(self):
+        results = BenchmarkResults([("clips", 10)])
+        results.add("edit.move", 0.5)
+        results.add("edit.move", 0.25)
+        results.add("undo", 1.0)
+
+        output = StringIO()
+        results.write(output)
+        results = BenchmarkResults.read(StringIO(output.getvalue()))
+        self.failUnlessEqual(results.params, [("clips", 10)])
+        self.failUnlessEqual(results.names, ["edit.move", "undo"])
+        self.failUnlessEqual(results.times,
+                {"edit.move": 0.25, "undo": 1.0})
+
+    def testCompare(self):
+        baseline = BenchmarkResults([("clips", 10)])
+        baseline.add("edit.move", 1.0)
+        baseline.add("undo", 1.0)
+        results = BenchmarkResults([("clips", 10)])
+        results.add("edit.move", 1.5)
+        results.add("undo", 1.125)
+        results.add("redo", 1.0)
+
+        self.failUnlessEqual(results.compare(baseline, 0.25),
+                [("edit.move", 1.0, 1.5)])
+        self.failUnlessEqual(results.compare(baseline, 0.5), [])
+
+        baseline.params = [("clips", 20)]
+        self.failUnlessRaises(ValueError, results.compare, baseline, 0.25)
+
+
+class TestSyntheticTimeline(TestCase):
+
+    def testGenerate(self):
+        synthetic = SyntheticTimeline(clips=6, tracks=2, layers=2,
+                keyframes=2, effects=1)
+        timeline = synthetic.timeline
+        self.failUnlessEqual(len(timeline.timeline_objects), 6)
+        self.failUnlessEqual(len(timeline.tracks), 2)
+        self.failUnlessEqual(
+                sorted(set(obj.priority for obj in timeline.timeline_objects)),
+                [0, 1])
+        for track in timeline.tracks:
+            # a source and an effect for each clip
+            self.failUnlessEqual(len(track.track_objects), 12)
+            # the overlapping clips of each layer
+            self.failUnlessEqual(len(track.transitions), 4)
+
+    def testRun(self):
+        synthetic = SyntheticTimeline(clips=6, layers=2, keyframes=2,
+                effects=1)
+        starts = [obj.start for obj in synthetic.timeline.timeline_objects]
+        results = run_benchmarks(synthetic, repeat=2)
+        self.failUnless("edit.move" in results.names)
+        self.failUnless("formatter.load" in results.names)
+        self.failUnless("redo" in results.names)
+
+        # the benchmarks leave the timeline unchanged
+        self.failUnlessEqual(
+                [obj.start for obj in synthetic.timeline.timeline_objects],
+                starts)
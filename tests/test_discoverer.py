@@ -20,6 +20,8 @@
 # Free Software Foundation, Inc., 59 Temple Place - Suite 330,
 # Boston, MA 02111-1307, USA.
 
+import os
+import tempfile
 import gobject
 gobject.threads_init()
 import gst
@@ -79,12 +81,16 @@ class Discoverer1(Discoverer):
     timeout_cancelled = False
     new_video_pad_cb = 0
     new_pad_cb = 0
+    thumbnail_scheduled = 0
 
     def _scheduleAnalysis(self):
         # we call _analyze manually so we don't have to do tricks to keep test
         # methods alive across mainloop iterations
         pass
 
+    def _scheduleThumbnail(self):
+        self.thumbnail_scheduled += 1
+
     def _scheduleTimeout(self):
         self.timeout_scheduled = True
         self.timeout_id = 1
@@ -412,13 +418,51 @@ class TestStateChange(TestCase):
         self.discoverer.addUri('illbepopped')
         self.failUnlessEqual(self.error, None)
         self.discoverer._busMessageStateChangedCb(None, message)
-        # should go to PLAYING to do thumbnails
-        self.failUnlessEqual(self.src.get_state(0)[2], gst.STATE_PLAYING)
-        self.discoverer._finishAnalysis("foo")
+        # the thumbnail is made later
+        self.failIfEqual(self.src.get_state(0)[2], gst.STATE_PLAYING)
         self.failUnlessEqual(len(self.factories), 1)
         factory = self.factories[0]
         self.failUnless(isinstance(factory, FileSourceFactory))
         self.failUnlessEqual(len(factory.output_streams), 1)
+        self.failUnlessEqual(self.discoverer.thumbnail_queue,
+                [('file:///foo/bar', factory)])
+        self.failUnlessEqual(self.discoverer.thumbnail_scheduled, 1)
+
+    def testThumbnail(self):
+        pad = gst.Pad('src', gst.PAD_SRC)
+        pad.set_caps(gst.Caps('video/x-raw-rgb'))
+        self.discoverer._newDecodedPadCb(None, pad, False)
+        message = gst.message_new_state_changed(self.src,
+                gst.STATE_READY, gst.STATE_PAUSED, gst.STATE_VOID_PENDING)
+        self.discoverer.addUri('illbepopped')
+        self.discoverer._busMessageStateChangedCb(None, message)
+        stream = self.factories[0].output_streams[0]
+        self.failUnlessEqual(stream.thumbnail, None)
+
+        # analyzing comes first
+        self.discoverer.working = True
+        self.discoverer._thumbnail()
+        self.failIf(self.discoverer.thumbnailing)
+        self.discoverer.working = False
+
+        def thumbnail_done_cb(discoverer, uri, factory, done):
+            done.append(factory)
+
+        done = []
+        self.discoverer.connect('thumbnail-done', thumbnail_done_cb, done)
+        fd, thumbnail = tempfile.mkstemp()
+        os.close(fd)
+        self.discoverer._getThumbnailFilenameFromPad = lambda pad: thumbnail
+        try:
+            # the thumbnail is already there, no need for a pipeline
+            self.discoverer._thumbnail()
+        finally:
+            os.remove(thumbnail)
+
+        self.failUnlessEqual(done, self.factories)
+        self.failUnlessEqual(stream.thumbnail, thumbnail)
+        self.failUnlessEqual(self.discoverer.thumbnail_queue, [])
+        self.failIf(self.discoverer.thumbnailing)
 
     def testBusStateChangedAudioOnly(self):
         # only audio
@@ -457,9 +501,7 @@ class TestStateChange(TestCase):
         self.discoverer.addUri('illbepopped')
         self.failUnlessEqual(self.error, None)
         self.discoverer._busMessageStateChangedCb(None, message)
-        # should go to PLAYING to do thumbnails
-        self.failUnlessEqual(self.src.get_state(0)[2], gst.STATE_PLAYING)
-        self.discoverer._finishAnalysis("foo")
+        self.failIfEqual(self.src.get_state(0)[2], gst.STATE_PLAYING)
         self.failUnlessEqual(len(self.factories), 1)
         factory = self.factories[0]
         self.failUnless(isinstance(factory, PictureFileSourceFactory))
@@ -624,6 +624,8 @@ class TestFormatterLoad(TestCase):
         self.failUnlessEqual(len(track.track_objects), 1)
         # FIXME: this is an hack
         self.failUnlessEqual(str(track.stream), str(stream))
+        # updates are enabled back by _loadTimeline
+        self.failIf(track.composition.props.update)
 
     def testLoadTimelineObject(self):
         video_stream = VideoStream(gst.Caps("video/x-raw-yuv"))
@@ -687,6 +689,10 @@ class TestFormatterLoad(TestCase):
         # point gun at foot; pull trigger
         self.formatter._loadTimeline(timeline_element)
         self.failUnlessEqual(len(self.formatter.project.timeline.tracks), 1)
+        track = self.formatter.project.timeline.tracks[0]
+        self.failUnless(track.composition.props.update)
+        # the gap before the object got its default source
+        self.failUnlessEqual(len(track.default_sources), 1)
 
     def testLoadProject(self):
         video_stream = VideoStream(gst.Caps("video/x-raw-yuv"))
@@ -23,7 +23,8 @@
 import gst
 
 from pitivi.factories.base import ObjectFactory, ObjectFactoryError, \
-        SourceFactory, RandomAccessSourceFactory, LiveSourceFactory
+        SourceFactory, RandomAccessSourceFactory, LiveSourceFactory, \
+        caps_accepted_by
 from pitivi.stream import AudioStream, VideoStream
 
 from common import SignalMonitor, TestCase
@@ -122,6 +123,55 @@ class TestSourceFactory(TestCase):
         self.failUnlessEqual(self.factory.current_bins, 0)
         self.failUnlessEqual(self.monitor.bin_released_count, 2)
 
+class StubStreamSourceFactory(SourceFactory):
+    def _makeStreamBinReal(self, output_stream):
+        return gst.Bin()
+
+class TestCommonElements(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.factory = StubStreamSourceFactory('name')
+
+    def tearDown(self):
+        self.factory = None
+        TestCase.tearDown(self)
+
+    def makeBin(self, stream):
+        self.factory.addOutputStream(stream)
+        return self.factory.makeBin(stream)
+
+    def testCapsAcceptedBy(self):
+        caps = gst.Caps("video/x-raw-yuv,format=(fourcc)I420,width=320,"
+                "height=240,framerate=25/1")
+        self.failUnless(caps_accepted_by(caps, ["videoscale"]))
+        # not fixed
+        self.failIf(caps_accepted_by(gst.Caps("video/x-raw-yuv"),
+                ["videoscale"]))
+        self.failIf(caps_accepted_by(caps, ["audioresample"]))
+        self.failIf(caps_accepted_by(caps, ["no-such-element"]))
+
+    def testVideoConversionElided(self):
+        bin = self.makeBin(VideoStream(gst.Caps("video/x-raw-yuv,"
+                "format=(fourcc)I420,width=320,height=240,framerate=25/1")))
+        self.failUnlessEqual(bin.csp, None)
+        self.failUnlessEqual(bin.queue.get_pad("src").get_peer().get_parent(),
+                bin.scale)
+        self.factory.releaseBin(bin)
+
+        bin = self.makeBin(VideoStream(gst.Caps("video/x-raw-yuv")))
+        self.failIfEqual(bin.csp, None)
+        self.factory.releaseBin(bin)
+
+    def testAudioConversionElided(self):
+        bin = self.makeBin(AudioStream(gst.Caps("audio/x-raw-float,"
+                "endianness=1234,width=32,rate=44100,channels=2")))
+        self.failUnlessEqual(bin.aconv, None)
+        self.factory.releaseBin(bin)
+
+        bin = self.makeBin(AudioStream(gst.Caps("audio/x-raw-int")))
+        self.failIfEqual(bin.aconv, None)
+        self.factory.releaseBin(bin)
+
 class TestLiveSourceFactory(TestCase):
     def testDefaultDuration(self):
         # pass an explicit default_duration
@@ -25,6 +25,7 @@ from common import TestCase
 
 from pitivi.factories.file import FileSourceFactory, PictureFileSourceFactory
 from pitivi.stream import AudioStream, VideoStream
+from pitivi.imagecache import ImageCache
 
 class StubSingleDecodeBin(gst.Bin):
     def __init__(self, uri, caps, stream):
@@ -169,6 +170,7 @@ class TestPictureFileSourceFactory(TestCase):
     def setUp(self):
         TestCase.setUp(self)
         self.factory = StubPictureFileSourceFactory('file:///path/to/file')
+        self.factory.image_cache = ImageCache()
 
     def tearDown(self):
         self.factory = None
@@ -208,6 +210,30 @@ class TestPictureFileSourceFactory(TestCase):
         self.failUnlessEqual(bin.get_pad('src'), None)
         self.factory._releaseBin(bin)
 
+    def testCachedBin(self):
+        caps = gst.Caps('video/x-raw-rgb, width=2048')
+        video1 = VideoStream(caps, pad_name='src0')
+        self.factory.addOutputStream(video1)
+        bin = self.factory.makeBin()
+        self.failUnless(hasattr(bin, 'decodebin'))
+        self.factory.releaseBin(bin)
+
+        # once the image is decoded, bins are fed from the cache and have
+        # their source pad right away
+        buf = gst.Buffer('\0' * 16)
+        buf.set_caps(gst.Caps('video/x-raw-yuv, width=(int)4, height=(int)2'))
+        self.factory.image_cache.add(self.factory.uri,
+                self.factory._filtercaps.to_string(), buf)
+        bin = self.factory.makeBin()
+        self.failIf(hasattr(bin, 'decodebin'))
+        self.failIfEqual(bin.get_pad('src'), None)
+        self.factory.releaseBin(bin)
+
+        self.factory.image_cache.setMaxSize(0)
+        bin = self.factory.makeBin()
+        self.failUnless(hasattr(bin, 'decodebin'))
+        self.factory.releaseBin(bin)
+
     def testMakeStreamBin(self):
         # streams are usually populated by the discoverer so here we have to do
         # that ourselves
@@ -0,0 +1,144 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_framecache.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+from common import TestCase
+import gst
+
+from pitivi.framecache import Frame, FrameCache
+from pitivi.timeline.timeline import Timeline
+from pitivi.timeline.track import Track, SourceTrackObject
+from pitivi.stream import VideoStream
+from common import StubFactory
+
+FRAME = gst.SECOND / 25
+
+
+def make_frame(index):
+    # 4x2 pixels, 12 bytes per row
+    return Frame(index * FRAME, FRAME, 4, 2, "\0" * 24)
+
+
+class TestFrameCache(TestCase):
+    def testLookup(self):
+        cache = FrameCache()
+        self.failUnless(cache.add(make_frame(1), cache.generation))
+        self.failUnless(cache.add(make_frame(3), cache.generation))
+
+        self.failUnlessEqual(cache.lookup(0), None)
+        self.failUnlessEqual(cache.lookup(FRAME).position, FRAME)
+        self.failUnlessEqual(cache.lookup(2 * FRAME - 1).position, FRAME)
+        self.failUnlessEqual(cache.lookup(2 * FRAME), None)
+        self.failUnlessEqual(cache.lookup(3 * FRAME + 1).position, 3 * FRAME)
+        self.failUnlessEqual((cache.hits, cache.misses), (3, 2))
+
+    def testEvictFarthestFromPlayhead(self):
+        cache = FrameCache(max_size=3 * 24)
+        for index in range(3):
+            cache.add(make_frame(index), cache.generation)
+        self.failUnlessEqual(cache.size, 3 * 24)
+
+        # the playhead moves to the third frame, the first one goes
+        cache.add(make_frame(3), cache.generation)
+        self.failUnlessEqual(len(cache), 3)
+        self.failUnlessEqual(cache.lookup(0), None)
+
+        # going back keeps the frames around the playhead
+        cache.lookup(FRAME)
+        cache.add(make_frame(0), cache.generation)
+        self.failUnlessEqual(cache.lookup(3 * FRAME), None)
+
+        cache.setMaxSize(24)
+        self.failUnlessEqual(len(cache), 1)
+        self.failUnlessEqual(cache.lookup(2 * FRAME).position, 2 * FRAME)
+
+    def testInvalidate(self):
+        cache = FrameCache()
+        for index in range(5):
+            cache.add(make_frame(index), cache.generation)
+
+        generation = cache.generation
+        cache.invalidate(FRAME + 1, 3 * FRAME)
+        self.failUnlessEqual(len(cache), 3)
+        self.failUnlessEqual(cache.lookup(FRAME), None)
+        self.failUnlessEqual(cache.lookup(2 * FRAME), None)
+        self.failUnlessEqual(cache.lookup(3 * FRAME).position, 3 * FRAME)
+
+        # frames decoded before the edit are dropped
+        self.failIf(cache.add(make_frame(1), generation))
+        self.failUnless(cache.add(make_frame(1), cache.generation))
+
+        cache.clear()
+        self.failUnlessEqual((len(cache), cache.size), (0, 0))
+
+
+class TestFrameCacheTimeline(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.stream = VideoStream(gst.Caps("video/x-raw-rgb"))
+        self.factory = StubFactory()
+        self.factory.addOutputStream(self.stream)
+        self.track = Track(self.stream)
+        self.timeline = Timeline()
+        self.timeline.addTrack(self.track)
+        self.cache = FrameCache()
+        self.cache.connectToTimeline(self.timeline)
+
+    def tearDown(self):
+        self.cache.disconnectFromTimeline()
+        self.track.removeAllTrackObjects()
+        del self.cache
+        del self.timeline
+        del self.track
+        del self.factory
+        TestCase.tearDown(self)
+
+    def fill(self, count):
+        for index in range(count):
+            self.cache.add(make_frame(index), self.cache.generation)
+
+    def testEdits(self):
+        track_object = SourceTrackObject(self.factory, self.stream)
+        track_object.start = 2 * FRAME
+        track_object.duration = 2 * FRAME
+        self.track.addTrackObject(track_object)
+
+        self.fill(8)
+        # moving invalidates where the object was and where it goes
+        track_object.start = 5 * FRAME
+        self.failUnlessEqual([frame_index
+                for frame_index in range(8)
+                if self.cache.lookup(frame_index * FRAME) is not None],
+                [0, 1, 4, 7])
+
+        self.fill(8)
+        track_object.priority = 1
+        self.failUnlessEqual(len(self.cache), 6)
+
+        self.fill(8)
+        self.track.removeTrackObject(track_object)
+        self.failUnlessEqual(len(self.cache), 6)
+
+    def testDisableUpdates(self):
+        self.timeline.disableUpdates()
+        generation = self.cache.generation
+        self.failIf(self.cache.add(make_frame(0), generation))
+
+        self.timeline.enableUpdates()
+        self.failIf(self.cache.add(make_frame(0), generation))
+        self.failUnless(self.cache.add(make_frame(0), self.cache.generation))
@@ -0,0 +1,68 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_imagecache.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+from common import TestCase
+import gst
+
+from pitivi.imagecache import ImageCache
+
+CAPS = "video/x-raw-yuv, width=(int)4, height=(int)2"
+
+
+def make_buffer():
+    return gst.Buffer("\0" * 16)
+
+
+class TestImageCache(TestCase):
+    def testLookup(self):
+        cache = ImageCache()
+        buf = make_buffer()
+        self.failUnless(cache.add("file:///a.png", CAPS, buf))
+
+        self.failUnlessEqual(cache.lookup("file:///a.png", CAPS), buf)
+        # the same image at another size needs decoding again
+        self.failUnlessEqual(cache.lookup("file:///a.png", "video/x-raw-rgb"),
+                None)
+        self.failUnlessEqual(cache.lookup("file:///b.png", CAPS), None)
+        self.failUnlessEqual((cache.hits, cache.misses), (1, 2))
+
+        # replacing an image doesn't count it twice
+        cache.add("file:///a.png", CAPS, make_buffer())
+        self.failUnlessEqual((len(cache), cache.size), (1, 16))
+
+    def testEvictLeastRecentlyUsed(self):
+        cache = ImageCache(max_size=3 * 16)
+        for name in ("a", "b", "c"):
+            cache.add("file:///%s.png" % name, CAPS, make_buffer())
+
+        cache.lookup("file:///a.png", CAPS)
+        cache.add("file:///d.png", CAPS, make_buffer())
+        self.failUnlessEqual(len(cache), 3)
+        self.failUnlessEqual(cache.lookup("file:///b.png", CAPS), None)
+        self.failIfEqual(cache.lookup("file:///a.png", CAPS), None)
+
+        cache.setMaxSize(16)
+        self.failUnlessEqual(len(cache), 1)
+        self.failIfEqual(cache.lookup("file:///a.png", CAPS), None)
+
+        # too big to be kept at all
+        self.failIf(cache.add("file:///e.png", CAPS, gst.Buffer("\0" * 32)))
+
+        cache.clear()
+        self.failUnlessEqual((len(cache), cache.size), (0, 0))
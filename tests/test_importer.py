@@ -0,0 +1,119 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_importer.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import gobject
+gobject.threads_init()
+
+from pitivi.importer import FolderImporter, is_media_file, \
+        is_media_header, path_to_uri
+from pitivi.threads import JobExecutor
+
+
+class TestPrefilter(TestCase):
+
+    def testHeaders(self):
+        self.failUnless(is_media_header("OggS\x00\x02"))
+        self.failUnless(is_media_header("\x00\x00\x00\x18ftypmp42"))
+        self.failUnless(is_media_header("\xff\xfb\x90\x64"))
+        self.failUnless(is_media_header("\x47" + "\x00" * 187 + "\x47"))
+        # unknown binary data is left to the discoverer
+        self.failUnless(is_media_header("\x00\x01\x02\x03"))
+
+        self.failIf(is_media_header(""))
+        self.failIf(is_media_header("%PDF-1.4\n"))
+        self.failIf(is_media_header("PK\x03\x04\x14\x00"))
+        self.failIf(is_media_header("just some notes\n"))
+
+
+class TestFolderImporter(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.mainloop = gobject.MainLoop()
+        self.executor = JobExecutor(2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        shutil.rmtree(self.directory)
+
+    def _createFile(self, name, contents=""):
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        media_file = open(path, "wb")
+        media_file.write(contents)
+        media_file.close()
+        return path
+
+    def testIsMediaFile(self):
+        self.failUnless(is_media_file(self._createFile("clip.MOV")))
+        self.failUnless(is_media_file(self._createFile("clip", "OggS\x00")))
+        self.failIf(is_media_file(self._createFile("notes.txt", "OggS\x00")))
+        self.failIf(is_media_file(self._createFile(".hidden.avi")))
+        self.failIf(is_media_file(self._createFile("readme", "hello\n")))
+
+    def testImport(self):
+        expected = set([
+            path_to_uri(self._createFile("a.avi")),
+            path_to_uri(self._createFile("sub/b.ogg")),
+            path_to_uri(self._createFile("sub/sub/c", "RIFF\x00\x00")),
+            path_to_uri(self._createFile("sub 2/d e.mkv"))])
+        self._createFile("sub/notes.txt")
+        self._createFile("sub/sub/README", "read me\n")
+
+        found = []
+        def urisFoundCb(importer, uris):
+            found.extend(uris)
+
+        def doneCb(importer):
+            self.mainloop.quit()
+
+        importer = FolderImporter([path_to_uri(self.directory)],
+                self.executor, batch_interval=0)
+        importer.connect("uris-found", urisFoundCb)
+        importer.connect("done", doneCb)
+        importer.start()
+        self.mainloop.run()
+
+        self.failUnlessEqual(len(found), len(expected))
+        self.failUnlessEqual(set(found), expected)
+
+    def testAbort(self):
+        self._createFile("a.avi")
+
+        found = []
+        def urisFoundCb(importer, uris):
+            found.extend(uris)
+
+        def doneCb(importer):
+            self.mainloop.quit()
+
+        importer = FolderImporter([self.directory], self.executor)
+        importer.connect("uris-found", urisFoundCb)
+        importer.connect("done", doneCb)
+        importer.abort()
+        importer.start()
+        self.mainloop.run()
+
+        self.failUnlessEqual(found, [])
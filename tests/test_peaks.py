@@ -0,0 +1,142 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_peaks.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import array
+
+from common import TestCase
+import gst
+
+from pitivi.peaks import PeakPyramid, PeakExtractorQueue
+from pitivi.signalinterface import Signallable
+
+
+def make_samples(values, repeat):
+    samples = array.array('f')
+    for value in values:
+        samples.extend([value] * repeat)
+    return samples
+
+
+class FakeExtractor(Signallable):
+    __signals__ = {
+        "done": [],
+        "error": ["message"],
+    }
+
+    def __init__(self):
+        self.started = False
+
+    def start(self):
+        self.started = True
+
+
+class TestPeakPyramid(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.pyramid = PeakPyramid()
+        # 8 samples per peak of level 0, one peak per millisecond
+        self.pyramid.setRate(8000)
+
+    def tearDown(self):
+        del self.pyramid
+        TestCase.tearDown(self)
+
+    def testLevels(self):
+        self.pyramid.addSamples(make_samples([0.5, -0.5, 1.0], 8))
+        # the samples of an incomplete peak wait for the next ones
+        self.pyramid.addSamples(make_samples([0.25], 4))
+        self.failUnlessEqual(self.pyramid.duration, 3 * gst.MSECOND)
+        self.failUnlessEqual([len(mins) for mins, maxs in
+                self.pyramid.levels], [3, 1])
+
+        self.pyramid.finish()
+        self.failUnless(self.pyramid.complete)
+        self.failUnlessEqual([list(maxs) for mins, maxs in
+                self.pyramid.levels],
+                [[63, -63, 127, 31], [63, 127], [127]])
+        self.failUnlessEqual(list(self.pyramid.levels[-1][0]), [-63])
+
+    def testGetPeaks(self):
+        self.pyramid.addSamples(make_samples([0.0, 1.0, -1.0, 0.0], 8))
+        self.pyramid.finish()
+
+        # a column per peak
+        peaks = self.pyramid.getPeaks(0, 4 * gst.MSECOND, 4)
+        self.failUnlessEqual(peaks,
+                [(0.0, 0.0), (1.0, 1.0), (-1.0, -1.0), (0.0, 0.0)])
+
+        # zoomed out, the columns come from the upper levels
+        peaks = self.pyramid.getPeaks(0, 4 * gst.MSECOND, 2)
+        self.failUnlessEqual(peaks, [(0.0, 1.0), (-1.0, 0.0)])
+        peaks = self.pyramid.getPeaks(0, 4 * gst.MSECOND, 1)
+        self.failUnlessEqual(peaks, [(-1.0, 1.0)])
+
+        # zoomed in, neighbouring columns share a peak
+        peaks = self.pyramid.getPeaks(gst.MSECOND, 2 * gst.MSECOND, 4)
+        self.failUnlessEqual(peaks, [(1.0, 1.0)] * 4)
+
+        # past the end of what was extracted
+        peaks = self.pyramid.getPeaks(3 * gst.MSECOND, 5 * gst.MSECOND, 2)
+        self.failUnlessEqual(peaks, [(0.0, 0.0), None])
+
+    def testUnknownRate(self):
+        pyramid = PeakPyramid()
+        self.failUnlessEqual(pyramid.duration, 0)
+        self.failUnlessEqual(pyramid.getPeaks(0, gst.SECOND, 3),
+                [None] * 3)
+
+
+class TestPeakExtractorQueue(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.queue = PeakExtractorQueue()
+
+    def tearDown(self):
+        del self.queue
+        TestCase.tearDown(self)
+
+    def testOneAtATime(self):
+        first, second, third = FakeExtractor(), FakeExtractor(), FakeExtractor()
+        for extractor in first, second, third:
+            self.queue.add(extractor)
+        self.queue.add(first)
+        self.failUnless(first.started)
+        self.failIf(second.started or third.started)
+
+        first.emit("done")
+        self.failUnless(self.queue.running is second)
+        self.failIf(third.started)
+
+        # a failed extraction lets the next one start too
+        second.emit("error", "no decoder")
+        self.failUnless(third.started)
+        third.emit("done")
+        self.failUnlessEqual(self.queue.running, None)
+
+    def testRemove(self):
+        first, second = FakeExtractor(), FakeExtractor()
+        self.queue.add(first)
+        self.queue.add(second)
+
+        # the running extractor is left alone
+        self.failIf(self.queue.remove(first))
+        self.failUnless(self.queue.remove(second))
+        first.emit("done")
+        self.failIf(second.started)
+        self.failUnlessEqual(self.queue.running, None)
@@ -0,0 +1,109 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_pipelineprofiler.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+from unittest import TestCase
+
+import gobject
+gobject.threads_init()
+import gst
+
+from pitivi.pipelineprofiler import PipelineProfiler, ElementStats
+
+
+class TestElementStats(TestCase):
+    def testRates(self):
+        stats = ElementStats("dec", "theoradec")
+        self.failUnlessEqual(stats.getSpeed(), 0.0)
+        self.failUnlessEqual(stats.getBufferRate(), 0.0)
+
+        stats.buffers = 50
+        stats.media_duration = 2 * gst.SECOND
+        stats.processing_time = 0.5
+        stats.first_time = 10.0
+        stats.last_time = 11.0
+        self.failUnlessEqual(stats.getBufferRate(), 50.0)
+        self.failUnlessEqual(stats.getSpeed(), 2.0)
+        self.failUnlessEqual(stats.getMeanProcessingTime(), 0.01)
+        self.failIf(stats.isQueue())
+
+    def testQueueLevel(self):
+        stats = ElementStats("queue0", "queue")
+        self.failUnless(stats.isQueue())
+        self.failUnlessEqual(stats.getMeanLevel(), 0.0)
+
+        stats.level_samples = 4
+        stats.level_buffers = 6
+        self.failUnlessEqual(stats.getMeanLevel(), 1.5)
+
+
+class TestPipelineProfiler(TestCase):
+    def setUp(self):
+        self.pipeline = gst.parse_launch("fakesrc name=src num-buffers=10 "
+                "sizetype=fixed sizemax=100 ! identity name=identity ! "
+                "queue name=queue ! fakesink name=sink")
+
+    def tearDown(self):
+        self.pipeline.set_state(gst.STATE_NULL)
+        del self.pipeline
+
+    def run_pipeline(self):
+        self.pipeline.set_state(gst.STATE_PLAYING)
+        message = self.pipeline.get_bus().poll(
+                gst.MESSAGE_EOS | gst.MESSAGE_ERROR, 5 * gst.SECOND)
+        self.failUnlessEqual(message.type, gst.MESSAGE_EOS)
+
+    def testMeasure(self):
+        profiler = PipelineProfiler()
+        profiler.start(self.pipeline)
+        self.failUnless(profiler.isRunning())
+        self.run_pipeline()
+        profiler.stop()
+        self.failIf(profiler.isRunning())
+
+        stats = dict((element_stats.name, element_stats)
+                for element_stats in profiler.getReport())
+        # the sink doesn't push anything
+        self.failUnlessEqual(sorted(stats.keys()),
+                ["identity", "queue", "src"])
+        for name in ("src", "identity", "queue"):
+            self.failUnlessEqual(stats[name].buffers, 10)
+            self.failUnlessEqual(stats[name].bytes, 1000)
+        self.failUnlessEqual(stats["queue"].level_samples, 10)
+        self.failUnless(profiler.formatReport())
+
+    def testElementAdded(self):
+        profiler = PipelineProfiler()
+        bin = gst.Bin()
+        profiler.start(bin)
+        bin.add(gst.element_factory_make("identity", "late"))
+        self.failUnlessEqual([element_stats.name
+                for element_stats in profiler.stats.itervalues()], ["late"])
+        profiler.stop()
+
+    def testStopped(self):
+        profiler = PipelineProfiler()
+        bin = gst.Bin()
+        profiler.start(bin)
+        profiler.stop()
+
+        # an element-added emitted while stopping doesn't add probes back
+        element = gst.element_factory_make("identity", "late")
+        profiler._elementAddedCb(bin, element)
+        self.failUnlessEqual(profiler._probes, [])
+        self.failUnlessEqual(profiler._handlers, [])
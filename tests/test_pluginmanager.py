@@ -0,0 +1,154 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_pluginmanager.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import os
+import sys
+import shutil
+import tempfile
+
+from common import TestCase
+from pitivi.pluginmanager import PluginManager
+import pitivi.plugincore as plugincore
+
+plugin_source = """
+from zope.interface import implements
+from pitivi.plugincore import IPlugin
+
+class ManifestDummy(object):
+    implements(IPlugin)
+
+    name = "manifest-dummy"
+    category = "Test"
+    description = "A plugin for the tests"
+    version = "1.0"
+    authors = ""
+    settings = None
+    enabled = %(enabled)s
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def __call__(self, manager=None):
+        pass
+"""
+
+
+class TestPluginManager(TestCase):
+
+    def setUp(self):
+        TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.plugin_path = os.path.join(self.directory, "plugins")
+        self.settings_path = os.path.join(self.directory, "settings")
+        os.mkdir(self.plugin_path)
+        os.mkdir(self.settings_path)
+        self.writePlugin(plugin_source % {"enabled": False})
+
+    def tearDown(self):
+        sys.modules.pop("manifestdummy", None)
+        shutil.rmtree(self.directory)
+        TestCase.tearDown(self)
+
+    def writePlugin(self, source):
+        filename = os.path.join(self.plugin_path, "manifestdummy.py")
+        plugin_file = open(filename, "w")
+        plugin_file.write(source)
+        plugin_file.close()
+        # don't let a bytecode file from the same second shadow the source
+        if os.path.exists(filename + "c"):
+            os.remove(filename + "c")
+
+    def createManager(self):
+        sys.modules.pop("manifestdummy", None)
+        return PluginManager(self.plugin_path, self.settings_path)
+
+    def testDisabledPluginsLoadedOnDemand(self):
+        manager = self.createManager()
+        self.failIfEqual(manager.pluginbag["manifest-dummy"]["plugin"], None)
+
+        # the manifest now knows the plugin is disabled
+        manager = self.createManager()
+        self.failUnlessEqual(manager.pluginbag["manifest-dummy"]["plugin"],
+                None)
+        self.failIf("manifestdummy" in sys.modules)
+        self.failUnlessEqual(manager.getPlugins(category="Other"), [])
+        self.failUnlessEqual(manager.getPlugins(only_enabled=True), [])
+        self.failIf("manifestdummy" in sys.modules)
+
+        plugins = manager.getPlugins(category="Test")
+        self.failUnlessEqual([plugin.name for plugin in plugins],
+                ["manifest-dummy"])
+        self.failUnless(plugincore.IPlugin.providedBy(plugins[0]))
+
+    def testEnabledPluginsLoadedOnStartup(self):
+        manager = self.createManager()
+        manager.enablePlugins(name="manifest-dummy")
+
+        manager = self.createManager()
+        self.failIfEqual(manager.pluginbag["manifest-dummy"]["plugin"], None)
+
+    def testModifiedPlugin(self):
+        self.createManager()
+        plugin_file = open(os.path.join(self.plugin_path,
+                "manifestdummy.py"), "a")
+        plugin_file.write("# changed\n")
+        plugin_file.close()
+
+        manager = self.createManager()
+        self.failIfEqual(manager.pluginbag["manifest-dummy"]["plugin"], None)
+
+    def testEnabledStateKept(self):
+        manager = self.createManager()
+        manager.enablePlugins(name="manifest-dummy")
+
+        for restart in xrange(3):
+            manager = self.createManager()
+            plugin = manager.pluginbag["manifest-dummy"]["plugin"]
+            self.failIfEqual(plugin, None)
+            self.failUnless(plugin.enabled)
+
+    def testDisabledStateKept(self):
+        # the plugin is enabled by default
+        self.writePlugin(plugin_source % {"enabled": True})
+        manager = self.createManager()
+        manager.disablePlugins(name="manifest-dummy")
+
+        manager = self.createManager()
+        self.failUnlessEqual(manager.pluginbag["manifest-dummy"]["plugin"],
+                None)
+        plugins = manager.getPlugins()
+        self.failUnlessEqual(len(plugins), 1)
+        self.failIf(plugins[0].enabled)
+
+        # still known as disabled, not imported on startup
+        manager = self.createManager()
+        self.failUnlessEqual(manager.pluginbag["manifest-dummy"]["plugin"],
+                None)
+        self.failIf("manifestdummy" in sys.modules)
+
+    def testInvalidPlaceholder(self):
+        self.createManager()
+        manager = self.createManager()
+        self.failUnlessEqual(manager.pluginbag["manifest-dummy"]["plugin"],
+                None)
+
+        # the file is broken after the startup
+        self.writePlugin("class Other(object):\n    pass\n")
+        self.failUnlessEqual(manager.getPlugins(), [])
+        self.failIf("manifest-dummy" in manager.pluginbag)
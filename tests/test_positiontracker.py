@@ -0,0 +1,146 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_positiontracker.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+from unittest import TestCase
+
+from pitivi.positiontracker import PositionTracker, SECOND, MAX_DRIFTS
+
+
+class FakePipeline(object):
+    def __init__(self):
+        self.clock_time = 0
+        self.position = 0
+        self.queries = 0
+
+    def queryPosition(self):
+        self.queries += 1
+        return self.position
+
+    def getClockTime(self):
+        return self.clock_time
+
+    def advance(self, time, speed=1):
+        self.clock_time += time
+        self.position += time * speed
+
+
+class TestPositionTracker(TestCase):
+    def setUp(self):
+        self.pipeline = FakePipeline()
+        self.tracker = PositionTracker(self.pipeline.queryPosition,
+                self.pipeline.getClockTime, resync_interval=SECOND)
+        self.positions = []
+        self.tracker.connect("position", self._positionCb)
+
+    def tearDown(self):
+        self.tracker.stop()
+
+    def _positionCb(self, tracker, position):
+        self.positions.append(position)
+
+    def testInterpolation(self):
+        self.pipeline.position = 5 * SECOND
+        self.tracker.update()
+        self.failUnlessEqual(self.positions, [5 * SECOND])
+        self.failUnlessEqual(self.pipeline.queries, 1)
+
+        for i in xrange(4):
+            self.pipeline.advance(SECOND / 5)
+            self.tracker.update()
+        self.failUnlessEqual(self.pipeline.queries, 1)
+        self.failUnlessEqual(self.positions[-1], 5 * SECOND + 4 * SECOND / 5)
+
+        # resync once a second
+        self.pipeline.advance(SECOND / 5)
+        self.tracker.update()
+        self.failUnlessEqual(self.pipeline.queries, 2)
+        self.failUnlessEqual(self.positions[-1], 6 * SECOND)
+
+    def testNoEmissionWithoutChange(self):
+        self.tracker.update()
+        self.tracker.update()
+        self.failUnlessEqual(self.positions, [0])
+
+    def testResync(self):
+        self.tracker.update()
+        self.pipeline.position = 10 * SECOND
+        self.tracker.resync()
+        self.tracker.update()
+        self.failUnlessEqual(self.pipeline.queries, 2)
+        self.failUnlessEqual(self.positions, [0, 10 * SECOND])
+
+    def testSingleDrift(self):
+        # the clock ran while the pipeline prerolled after a seek
+        self.tracker.update()
+        self.pipeline.advance(SECOND, speed=0)
+        self.tracker.update()
+        self.failUnlessEqual(self.positions[-1], 0)
+
+        # the estimate starts again from the real position
+        self.pipeline.advance(SECOND / 5)
+        self.tracker.update()
+        self.failUnlessEqual(self.pipeline.queries, 2)
+        self.failUnlessEqual(self.positions[-1], SECOND / 5)
+
+    def testDrift(self):
+        # the pipeline runs faster than the clock, as when rendering
+        self.tracker.update()
+        for i in xrange(MAX_DRIFTS):
+            self.pipeline.advance(SECOND, speed=3)
+            self.tracker.update()
+        self.failUnlessEqual(self.positions[-1], 3 * MAX_DRIFTS * SECOND)
+
+        # interpolation is disabled, positions are only real ones
+        position = self.positions[-1]
+        self.pipeline.advance(SECOND / 2, speed=3)
+        self.tracker.update()
+        self.failUnlessEqual(self.positions[-1], position)
+        self.pipeline.advance(SECOND / 2, speed=3)
+        self.tracker.update()
+        self.failUnlessEqual(self.positions[-1], position + 3 * SECOND)
+
+    def testSeekAfterDrift(self):
+        self.tracker.update()
+        for i in xrange(MAX_DRIFTS):
+            self.pipeline.advance(SECOND, speed=3)
+            self.tracker.update()
+
+        # seeking interpolates again
+        self.pipeline.position = 20 * SECOND
+        self.tracker.resync()
+        self.tracker.update()
+        queries = self.pipeline.queries
+        self.pipeline.advance(SECOND / 5)
+        self.tracker.update()
+        self.failUnlessEqual(self.pipeline.queries, queries)
+        self.failUnlessEqual(self.positions[-1], 20 * SECOND + SECOND / 5)
+
+    def testNoClock(self):
+        self.tracker = PositionTracker(self.pipeline.queryPosition,
+                lambda: None)
+        self.tracker.update()
+        self.tracker.update()
+        self.failUnlessEqual(self.pipeline.queries, 2)
+
+    def testStartStop(self):
+        self.failIf(self.tracker.isRunning())
+        self.tracker.start()
+        self.failUnless(self.tracker.isRunning())
+        self.tracker.stop()
+        self.failIf(self.tracker.isRunning())
@@ -0,0 +1,184 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_prerender.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import os
+import shutil
+import tempfile
+
+from common import TestCase
+import gst
+
+from pitivi.prerender import find_heavy_regions, get_region_key, \
+        PrerenderCache
+from pitivi.timeline.track import Track, SourceTrackObject, TrackEffect
+from pitivi.stream import VideoStream
+from pitivi.signalinterface import Signallable
+from common import StubFactory, FakeEffectFactory
+
+
+class TestPrerender(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.stream = VideoStream(gst.Caps("video/x-raw-rgb"))
+        self.factory = StubFactory()
+        self.factory.addOutputStream(self.stream)
+        self.effect_factory = FakeEffectFactory()
+        self.effect_factory.addInputStream(self.stream)
+        self.effect_factory.addOutputStream(self.stream)
+        self.track = Track(self.stream)
+
+    def tearDown(self):
+        self.track.removeAllTrackObjects()
+        del self.track
+        del self.effect_factory
+        del self.factory
+        TestCase.tearDown(self)
+
+    def addObject(self, cls, factory, start, duration):
+        track_object = cls(factory, self.stream, start=start,
+                duration=duration)
+        self.track.addTrackObject(track_object)
+        return track_object
+
+    def addSource(self, start, duration):
+        return self.addObject(SourceTrackObject, self.factory, start,
+                duration)
+
+    def addEffect(self, start, duration):
+        return self.addObject(TrackEffect, self.effect_factory, start,
+                duration)
+
+    def testLightTrack(self):
+        self.addSource(0, 10 * gst.SECOND)
+        self.addEffect(0, 10 * gst.SECOND)
+        self.failUnlessEqual(find_heavy_regions(self.track), [])
+
+    def testEffects(self):
+        self.addSource(0, 10 * gst.SECOND)
+        self.addEffect(2 * gst.SECOND, 4 * gst.SECOND)
+        self.addEffect(2 * gst.SECOND, 4 * gst.SECOND)
+        # too short to be worth it
+        self.addEffect(8 * gst.SECOND, gst.SECOND / 2)
+        self.addEffect(8 * gst.SECOND, gst.SECOND / 2)
+
+        regions = find_heavy_regions(self.track)
+        self.failUnlessEqual([(region.start, region.stop)
+                for region in regions],
+                [(2 * gst.SECOND, 6 * gst.SECOND)])
+        self.failUnlessEqual(len(regions[0].track_objects), 3)
+
+    def testTransition(self):
+        source1 = self.addSource(0, 10 * gst.SECOND)
+        source2 = self.addSource(6 * gst.SECOND, 10 * gst.SECOND)
+        self.failUnlessEqual(len(self.track.transitions), 1)
+        # a plain transition plays in real time
+        self.failUnlessEqual(find_heavy_regions(self.track), [])
+
+        effect = self.addEffect(7 * gst.SECOND, gst.SECOND)
+        regions = find_heavy_regions(self.track)
+        self.failUnlessEqual([(region.start, region.stop)
+                for region in regions],
+                [(6 * gst.SECOND, 10 * gst.SECOND)])
+        self.failUnlessEqual(set(regions[0].track_objects),
+                set([source1, source2, effect]))
+
+    def testRegionKey(self):
+        caps = gst.Caps("video/x-raw-yuv")
+        source = self.addSource(0, 10 * gst.SECOND)
+        effect1 = self.addEffect(0, 10 * gst.SECOND)
+        effect2 = self.addEffect(0, 10 * gst.SECOND)
+        key = get_region_key(find_heavy_regions(self.track)[0], caps)
+
+        # the same content elsewhere reuses the render
+        for track_object in (source, effect1, effect2):
+            track_object.start += 5 * gst.SECOND
+        self.failUnlessEqual(
+                get_region_key(find_heavy_regions(self.track)[0], caps), key)
+
+        effect2.getElement().props.drop_probability = 0.5
+        self.failIfEqual(
+                get_region_key(find_heavy_regions(self.track)[0], caps), key)
+
+
+class FakeFrameCache(Signallable):
+    __signals__ = {
+        "invalidated": ["start", "stop"],
+    }
+
+
+class FakePipeline(Signallable):
+    __signals__ = {
+        "state-changed": ["state"],
+        "position": ["position"],
+    }
+
+
+class FakeProject(object):
+    def __init__(self):
+        self.frame_cache = FakeFrameCache()
+        self.pipeline = FakePipeline()
+
+
+class TestPrerenderCache(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.cache = PrerenderCache(FakeProject(), self.directory,
+                max_size=250)
+
+    def tearDown(self):
+        self.cache.release()
+        del self.cache
+        shutil.rmtree(self.directory)
+        TestCase.tearDown(self)
+
+    def writeFile(self, name, size, used):
+        filename = os.path.join(self.directory, name)
+        rendered = file(filename, "w")
+        rendered.write("x" * size)
+        rendered.close()
+        os.utime(filename, (used, used))
+        return filename
+
+    def testEvict(self):
+        self.writeFile("oldest.mkv", 100, 1000)
+        wanted = self.writeFile("wanted.mkv", 100, 2000)
+        self.writeFile("old.mkv", 100, 3000)
+        recent = self.writeFile("recent.mkv", 100, 4000)
+
+        # the wanted file stays even though it's one of the oldest
+        self.failUnlessEqual(self.cache.evict(set([wanted])), 200)
+        self.failUnlessEqual(sorted(os.listdir(self.directory)),
+                ["recent.mkv", "wanted.mkv"])
+
+        # under the limit, nothing is removed
+        self.failUnlessEqual(self.cache.evict(), 200)
+        self.failUnless(os.path.exists(recent))
+
+        # the files still wanted can't be evicted, even past the limit
+        self.cache.max_size = 0
+        self.failUnlessEqual(self.cache.evict(set([wanted, recent])), 200)
+
+    def testPartialFilesRemoved(self):
+        self.writeFile("kept.mkv", 100, 1000)
+        self.writeFile("interrupted.mkv.part", 100, 1000)
+        self.cache.release()
+
+        self.cache = PrerenderCache(FakeProject(), self.directory)
+        self.failUnlessEqual(os.listdir(self.directory), ["kept.mkv"])
@@ -0,0 +1,89 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_registrycache.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import os
+import shutil
+import tempfile
+import cPickle
+
+from common import TestCase
+from pitivi.registrycache import RegistryCache, get_registry_key
+
+
+class TestRegistryCache(TestCase):
+
+    def setUp(self):
+        TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "pitivi",
+                "registry.cache")
+        self.built = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        TestCase.tearDown(self)
+
+    def _builder(self):
+        self.built += 1
+        return ["identity", "videotestsrc"]
+
+    def testBuildOnce(self):
+        cache = RegistryCache(self.filename)
+        self.failUnlessEqual(cache.get("names", self._builder),
+                ["identity", "videotestsrc"])
+        self.failUnlessEqual(cache.get("names", self._builder),
+                ["identity", "videotestsrc"])
+        self.failUnlessEqual(self.built, 1)
+
+    def testPersistent(self):
+        cache = RegistryCache(self.filename)
+        cache.get("names", self._builder)
+        self.failUnless(os.path.exists(self.filename))
+
+        cache = RegistryCache(self.filename)
+        self.failUnlessEqual(cache.get("names", self._builder),
+                ["identity", "videotestsrc"])
+        self.failUnlessEqual(self.built, 1)
+
+    def testRegistryChanged(self):
+        os.makedirs(os.path.dirname(self.filename))
+        cache_file = open(self.filename, "wb")
+        cPickle.dump(("not the registry key", {"names": []}), cache_file)
+        cache_file.close()
+
+        cache = RegistryCache(self.filename)
+        self.failUnlessEqual(cache.get("names", self._builder),
+                ["identity", "videotestsrc"])
+        self.failUnlessEqual(self.built, 1)
+
+        cache_file = open(self.filename, "rb")
+        key, entries = cPickle.load(cache_file)
+        cache_file.close()
+        self.failUnlessEqual(key, get_registry_key())
+
+    def testCorruptFile(self):
+        os.makedirs(os.path.dirname(self.filename))
+        cache_file = open(self.filename, "wb")
+        cache_file.write("garbage")
+        cache_file.close()
+
+        cache = RegistryCache(self.filename)
+        self.failUnlessEqual(cache.get("names", self._builder),
+                ["identity", "videotestsrc"])
+        self.failUnlessEqual(self.built, 1)
@@ -0,0 +1,105 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_renderqueue.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+from unittest import TestCase
+
+from pitivi.renderqueue import parse_manifest, ManifestError, RenderLog, \
+        RenderQueue, EXIT_OK, EXIT_LOAD_ERROR, main
+
+
+class TestManifest(TestCase):
+    def testParse(self):
+        entries = parse_manifest([
+                "# comment",
+                "",
+                "file:///a.xptv file:///a.ogg",
+                "'my project.xptv' out.ogg"])
+        cwd = os.path.abspath(os.getcwd())
+        self.failUnlessEqual(entries, [
+                ("file:///a.xptv", "file:///a.ogg"),
+                ("file://" + os.path.join(cwd, "my%20project.xptv"),
+                    "file://" + os.path.join(cwd, "out.ogg"))])
+
+    def testInvalid(self):
+        self.failUnlessRaises(ManifestError, parse_manifest,
+                ["a.xptv"])
+        self.failUnlessRaises(ManifestError, parse_manifest,
+                ["a.xptv b.ogg c.ogg"])
+        self.failUnlessRaises(ManifestError, parse_manifest,
+                ["'a.xptv b.ogg"])
+
+
+class TestRenderLog(TestCase):
+    def testWrite(self):
+        output = StringIO()
+        log = RenderLog(output)
+        log.write("job-done", job=1, error="a\tb", eta=None, wall_time=2.5)
+
+        fields = output.getvalue().rstrip("\n").split("\t")
+        self.failUnless(fields[0].startswith("time="))
+        self.failUnlessEqual(fields[1:], ["event=job-done", "error=a b",
+                "eta=", "job=1", "wall_time=2.500"])
+
+
+class StubJob(object):
+    def __init__(self, exit_code):
+        self.exit_code = exit_code
+
+
+class TestRenderQueue(TestCase):
+    def testExitCode(self):
+        queue = RenderQueue([], None)
+        self.failUnlessEqual(queue.getExitCode(), 0)
+
+        queue.jobs = [StubJob(EXIT_OK), StubJob(EXIT_OK)]
+        self.failUnlessEqual(queue.getExitCode(), 0)
+
+        queue.jobs.append(StubJob(EXIT_LOAD_ERROR))
+        self.failUnlessEqual(queue.getExitCode(), 1)
+
+
+class TestMain(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.directory, "manifest.txt")
+        self.log_file = os.path.join(self.directory, "render.log")
+        manifest = open(self.manifest, "w")
+        manifest.write("# nothing to render\n")
+        manifest.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testArgv(self):
+        # argv[0] is the program, not the manifest
+        exit_code = main(["/usr/bin/pitivi", "--render-queue",
+                "-l", self.log_file, self.manifest])
+        self.failUnlessEqual(exit_code, 0)
+
+        events = [line.split("\t")[1] for line in open(self.log_file)]
+        self.failUnlessEqual(events, ["event=queue-started",
+                "event=queue-done"])
+
+    def testNoManifest(self):
+        self.failUnlessRaises(SystemExit, main,
+                ["/usr/bin/pitivi", "--render-queue"])
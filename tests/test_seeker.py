@@ -33,6 +33,9 @@ class StubSeeker(Seeker):
 
         return seek_id
 
+    def _removeSeek(self, seek_id):
+        pass
+
 class TestSeeker(TestCase):
     def setUp(self):
         self.seek_count = 0
@@ -82,3 +85,113 @@ class TestSeeker(TestCase):
         # timeout with None position
         seeker._seekTimeoutCb()
 
+    def testScrub(self):
+        seeks = []
+        def seek_cb(seeker, position, format, signal):
+            seeks.append((signal, position))
+
+        seeker = StubSeeker(timeout=10)
+        seeker.connect('seek', seek_cb, 'seek')
+        seeker.connect('scrub', seek_cb, 'scrub')
+
+        seeker.startScrub()
+        seeker.seek(1)
+        seeker.seek(2)
+        seeker.seek(3)
+        self.failUnlessEqual(seeks, [('scrub', 1)])
+        self.failIfEqual(seeker.pending_settle_id, None)
+
+        # positions requested meanwhile are dropped
+        seeker._seekTimeoutCb()
+        self.failUnlessEqual(seeks, [('scrub', 1), ('scrub', 3)])
+
+        # the playhead stops moving
+        seeker._settleTimeoutCb()
+        self.failUnlessEqual(seeks[-1], ('seek', 3))
+
+        seeker.seek(4)
+        seeker.endScrub()
+        self.failUnlessEqual(seeks[-1], ('seek', 4))
+        self.failIf(seeker.scrubbing)
+        self.failUnlessEqual(seeker.pending_settle_id, None)
+
+        # nothing to settle anymore
+        count = len(seeks)
+        seeker._seekTimeoutCb()
+        seeker.endScrub()
+        self.failUnlessEqual(len(seeks), count)
+
+    def testSeekDone(self):
+        seeks = []
+        def seek_cb(seeker, position, format):
+            seeks.append(position)
+
+        seeker = StubSeeker(timeout=10)
+        seeker.connect('seek', seek_cb)
+        self.failUnlessEqual(seeker.getTimeout(), 10)
+
+        # seeks take long to complete, the seeker slows down
+        seeker.seekDone(200 * gst.MSECOND)
+        self.failUnlessEqual(seeker.getTimeout(), 200)
+        seeker.seekDone(10000 * gst.MSECOND)
+        self.failUnlessEqual(seeker.getTimeout(), Seeker.MAX_TIMEOUT)
+
+        seeker.seek(1)
+        self.failUnless(seeker.seek_in_flight)
+
+        # no seek while the previous one is in flight
+        seeker.seek(2)
+        seeker._seekTimeoutCb()
+        seeker.seek(3)
+        self.failUnlessEqual(seeks, [1])
+
+        # the last position is sought to as soon as the seek completes
+        seeker.seekDone(20 * gst.MSECOND)
+        self.failUnlessEqual(seeks, [1, 3])
+
+    def testSeekNotReported(self):
+        seeks = []
+        def seek_cb(seeker, position, format):
+            seeks.append(position)
+
+        seeker = StubSeeker(timeout=10)
+        seeker.connect('seek', seek_cb)
+        seeker.seekDone(20 * gst.MSECOND)
+
+        # seekDone() never comes for this one
+        seeker.seek(1)
+        self.failUnless(seeker.seek_in_flight)
+        self.failIfEqual(seeker.pending_flight_id, None)
+        seeker.seek(2)
+        seeker._seekTimeoutCb()
+        self.failUnlessEqual(seeks, [1])
+
+        # the requested position isn't dropped when we stop waiting
+        seeker._inFlightTimeoutCb()
+        self.failUnlessEqual(seeks, [1, 2])
+        self.failUnless(seeker.seek_in_flight)
+
+    def testSeekFailed(self):
+        seeks = []
+        def seek_cb(seeker, position, format):
+            seeks.append(position)
+
+        seeker = StubSeeker(timeout=10)
+        seeker.connect('seek', seek_cb)
+        seeker.seekDone(20 * gst.MSECOND)
+
+        seeker.seek(1)
+        seeker.seek(2)
+        seeker._seekTimeoutCb()
+        self.failUnlessEqual(seeks, [1])
+
+        seeker.seekFailed()
+        self.failUnlessEqual(seeks, [1, 2])
+
+        # once reported, the last seek isn't waited for anymore
+        seeker.seekFailed()
+        self.failIf(seeker.seek_in_flight)
+        self.failUnlessEqual(seeker.pending_flight_id, None)
+        seeker._seekTimeoutCb()
+        seeker.seek(3)
+        self.failUnlessEqual(seeks, [1, 2, 3])
@@ -0,0 +1,69 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_settings.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import os
+
+from common import TestCase
+
+from pitivi.settings import GlobalSettings
+
+GlobalSettings.addConfigOption("testEarlyNotification",
+    default=0,
+    notify=True)
+
+
+class TestGlobalSettings(TestCase):
+    def testLateOptions(self):
+        os.environ["PITIVI_TEST_LATE_OPTION"] = "42"
+        try:
+            settings = GlobalSettings()
+            settings.connect("testEarlyNotificationChanged", self._changedCb)
+
+            # as done by a module imported on first use
+            GlobalSettings.addConfigOption("testLateOption",
+                environment="PITIVI_TEST_LATE_OPTION",
+                default=0)
+            GlobalSettings.addConfigOption("testLateNotification",
+                default=0,
+                notify=True)
+        finally:
+            del os.environ["PITIVI_TEST_LATE_OPTION"]
+        self.failUnlessEqual(settings.testLateOption, 42)
+
+        self.changed = []
+        settings.connect("testLateNotificationChanged", self._changedCb)
+        settings.testLateNotification = 1
+        self.failUnlessEqual(self.changed, [settings])
+
+    def testEnvironmentOnlyOption(self):
+        # an option which isn't saved, like startupTiming
+        GlobalSettings.addConfigOption("testEnvironmentOnly",
+            environment="PITIVI_TEST_ENVIRONMENT_ONLY",
+            default=False)
+
+        os.environ["PITIVI_TEST_ENVIRONMENT_ONLY"] = "1"
+        try:
+            settings = GlobalSettings()
+        finally:
+            del os.environ["PITIVI_TEST_ENVIRONMENT_ONLY"]
+        self.failUnlessEqual(settings.testEnvironmentOnly, True)
+        self.failUnlessEqual(GlobalSettings().testEnvironmentOnly, False)
+
+    def _changedCb(self, settings):
+        self.changed.append(settings)
@@ -71,6 +71,22 @@ class TestSourceList(TestCase):
         # was complete
         self.sourcelist.addUri(uri)
 
+    def testThumbnailDone(self):
+        uri = "file:///ciao"
+        factory = FileSourceFactory(uri)
+        done = []
+        self.sourcelist.connect("thumbnail-done",
+                lambda sourcelist, factory: done.append(factory))
+        self.sourcelist.addUri(uri)
+        self.sourcelist.discoverer.emit("discovery-done", uri, factory)
+        self.sourcelist.discoverer.emit("thumbnail-done", uri, factory)
+        self.failUnlessEqual(done, [factory])
+
+        # the thumbnail of a removed source is ignored
+        self.sourcelist.removeUri(uri)
+        self.sourcelist.discoverer.emit("thumbnail-done", uri, factory)
+        self.failUnlessEqual(done, [factory])
+
     def testAddUriDiscoveryErrorSourceGone(self):
         """
         Same as the test above, but testing the discovery-error handler.
@@ -102,3 +118,21 @@ class TestSourceList(TestCase):
 
         # there was an error, the factory wasn't added so this shouldn't raise
         self.sourcelist.addUri(uri)
+
+    def testAddUriBatch(self):
+        batches = []
+        def urisAddedCb(sourcelist, uris):
+            batches.append(uris)
+        self.sourcelist.connect("uris-added", urisAddedCb)
+
+        self.sourcelist.addUri("file:///ciao")
+        added = self.sourcelist.addUriBatch(["file:///ciao", "file:///a",
+                "file:///b", "file:///a"])
+        self.failUnlessEqual(added, ["file:///a", "file:///b"])
+        self.failUnlessEqual(batches, [["file:///a", "file:///b"]])
+        self.failUnlessEqual(self.sourcelist.discoverer.queue,
+                ["file:///ciao", "file:///a", "file:///b"])
+
+        # nothing new, nothing emitted
+        self.failUnlessEqual(self.sourcelist.addUriBatch(["file:///b"]), [])
+        self.failUnlessEqual(len(batches), 1)
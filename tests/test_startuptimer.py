@@ -0,0 +1,60 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_startuptimer.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+from common import TestCase
+
+from pitivi.startuptimer import StartupTimer
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestStartupTimer(TestCase):
+    def testNestedPhases(self):
+        clock = FakeClock()
+        timer = StartupTimer(clock=clock)
+
+        timer.begin("settings")
+        clock.now += 0.5
+        timer.end()
+
+        timer.begin("user interface")
+        clock.now += 1.0
+        # initialized on first use by the user interface
+        timer.begin("device probe")
+        clock.now += 0.25
+        timer.end()
+        timer.end()
+
+        self.failUnlessEqual(timer.phases, [
+                (0, "settings", 0.5),
+                (0, "user interface", 1.25),
+                (1, "device probe", 0.25)])
+
+        clock.now += 0.25
+        lines = timer.getReport().split("\n")
+        self.failUnlessEqual([line.split()[-2] for line in lines],
+                ["500.0", "1250.0", "250.0", "2000.0"])
+        self.failUnless(lines[2].startswith("  device probe"))
+        self.failUnless(lines[3].startswith("total"))
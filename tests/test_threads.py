@@ -0,0 +1,155 @@
+# PiTiVi , Non-linear video editor
+#
+#       tests/test_threads.py
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import threading
+from unittest import TestCase
+
+import gobject
+gobject.threads_init()
+
+from pitivi.threads import JobExecutor, CallbackJob, INTERACTIVE, \
+        BACKGROUND, BULK, JOB_DONE, JOB_CANCELLED
+
+
+class TestJobExecutor(TestCase):
+
+    def setUp(self):
+        self.mainloop = gobject.MainLoop()
+        self.executor = JobExecutor(1)
+        self.order = []
+        self.done = []
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def _submit(self, name, priority, function=None):
+        if function is None:
+            function = self.order.append
+        job = CallbackJob(function, name, priority=priority)
+        job.connect("done", self._jobDoneCb)
+        return self.executor.submit(job)
+
+    def _jobDoneCb(self, job):
+        self.done.append(job)
+        if len(self.done) == self.expected:
+            self.mainloop.quit()
+
+    def testPriorities(self):
+        # block both workers until everything is queued
+        events = [threading.Event(), threading.Event()]
+        started = [threading.Event(), threading.Event()]
+        def block(index):
+            started[index].set()
+            events[index].wait()
+
+        self._submit(0, INTERACTIVE, block)
+        self._submit(1, INTERACTIVE, block)
+        for event in started:
+            event.wait()
+        last = threading.Event()
+        def bulk(name):
+            self.order.append(name)
+            last.set()
+
+        self._submit("bulk", BULK, bulk)
+        self._submit("background", BACKGROUND)
+        self._submit("interactive", INTERACTIVE)
+        self.failUnlessEqual(self.executor.getQueueDepth(BULK), 1)
+        self.failUnlessEqual(self.executor.getQueueDepth(INTERACTIVE), 1)
+
+        # a single worker picks the queued jobs one after the other
+        events[0].set()
+        last.wait()
+        self.expected = 5
+        events[1].set()
+        self.mainloop.run()
+
+        self.failUnlessEqual(self.order, ["interactive", "background", "bulk"])
+        self.failUnlessEqual(self.executor.getStats(BULK).completed, 1)
+        self.failUnlessEqual(self.executor.getStats(INTERACTIVE).completed, 3)
+        self.failUnlessEqual(self.executor.getQueueDepth(BULK), 0)
+
+    def testCancel(self):
+        event = threading.Event()
+        self._submit("first", BACKGROUND, lambda name: event.wait())
+        cancelled = self._submit("cancelled", BACKGROUND)
+        kept = self._submit("kept", BACKGROUND)
+        cancelled.cancel()
+
+        self.expected = 3
+        event.set()
+        self.mainloop.run()
+
+        self.failUnlessEqual(self.order, ["kept"])
+        self.failUnlessEqual(cancelled.state, JOB_CANCELLED)
+        self.failUnlessEqual(kept.state, JOB_DONE)
+        self.failUnlessEqual(self.executor.getStats(BACKGROUND).cancelled, 1)
+
+    def testError(self):
+        def fail(name):
+            raise ValueError(name)
+
+        job = self._submit("error", INTERACTIVE, fail)
+        self.expected = 1
+        self.mainloop.run()
+
+        self.failUnless(isinstance(job.error, ValueError))
+        self.failUnlessEqual(self.executor.getStats(INTERACTIVE).failed, 1)
+
+    def testSingleWorker(self):
+        event = threading.Event()
+        started = threading.Event()
+        def block(name):
+            started.set()
+            event.wait()
+
+        # even with one CPU, bulk work doesn't take every worker
+        self._submit("bulk", BULK, block)
+        started.wait()
+        self._submit("interactive", INTERACTIVE)
+        self.expected = 1
+        self.mainloop.run()
+        self.failUnlessEqual(self.order, ["interactive"])
+
+        self.expected = 2
+        event.set()
+        self.mainloop.run()
+
+    def testInteractiveNotStarved(self):
+        executor = JobExecutor(2)
+        event = threading.Event()
+        started = threading.Event()
+        def block(name):
+            started.set()
+            event.wait()
+
+        for i in xrange(4):
+            executor.submit(CallbackJob(block, i, priority=BULK))
+        started.wait()
+
+        # only one worker may run bulk jobs, the other one is free
+        job = CallbackJob(self.order.append, "interactive",
+                priority=INTERACTIVE)
+        job.connect("done", lambda job: self.mainloop.quit())
+        executor.submit(job)
+        self.mainloop.run()
+        self.failUnlessEqual(self.order, ["interactive"])
+
+        event.set()
+        executor.shutdown()
@@ -804,6 +804,45 @@ class TestTimeline(TestCase):
         result = timeline.getNextKeyframe(time2)
         self.failUnlessEqual(result, 10.5 * gst.SECOND)
 
+    def testGetKeyframesInRange(self):
+        timeline_object1 = self.makeTimelineObject()
+        timeline_object1.start = 0
+        timeline_object1.duration = 5 * gst.SECOND
+
+        factory = AudioTestSourceFactory()
+        stream = AudioStream(gst.Caps("audio/x-raw-int"))
+        track_object = SourceTrackObject(factory, stream)
+        self.track1.addTrackObject(track_object)
+        timeline_object2 = TimelineObject(factory)
+        timeline_object2.addTrackObject(track_object)
+        self.timeline.addTimelineObject(timeline_object2)
+        timeline_object2.start = 5 * gst.SECOND
+        timeline_object2.duration = 10 * gst.SECOND
+
+        interpolator = track_object.getInterpolator("volume")
+        keyframe = interpolator.newKeyframe(2 * gst.SECOND, 0.0)
+
+        timeline = self.timeline
+        self.failUnlessEqual(timeline.getKeyframesInRange(0, 20 * gst.SECOND),
+                [0, 5 * gst.SECOND, 7 * gst.SECOND, 15 * gst.SECOND])
+        self.failUnlessEqual(timeline.getKeyframesInRange(6 * gst.SECOND,
+                14 * gst.SECOND), [7 * gst.SECOND])
+
+        # moving objects and keyframes updates the index
+        keyframe.time = 4 * gst.SECOND
+        timeline_object2.start = 6 * gst.SECOND
+        self.failUnlessEqual(timeline.getKeyframesInRange(0, 20 * gst.SECOND),
+                [0, 5 * gst.SECOND, 6 * gst.SECOND, 10 * gst.SECOND,
+                16 * gst.SECOND])
+
+        interpolator.removeKeyframe(keyframe)
+        self.failUnlessEqual(timeline.getNextKeyframe(6 * gst.SECOND),
+                16 * gst.SECOND)
+
+        self.timeline.removeTimelineObject(timeline_object2, deep=True)
+        self.failUnlessEqual(timeline.getKeyframesInRange(0, 20 * gst.SECOND),
+                [0, 5 * gst.SECOND])
+
 class TestLink(TestCase):
 
     def test(self):
@@ -1223,6 +1262,12 @@ class TestContexts(TestCase):
         self.timeline.addTimelineObject(self.timeline_object3)
         self.other = set([self.track_object2, self.track_object3])
 
+    def _getRippledStart(self, track_object):
+        # rippled objects only move for real when the context is finished
+        if track_object.timeline_object in self.timeline.ripple_objects:
+            return track_object.start + self.timeline.ripple_offset
+        return track_object.start
+
     def testMoveContext(self):
         # set up the initial state of the timeline and create the track object
         # [focus]     [t2   ]     [t3     ]
@@ -1245,11 +1290,11 @@ class TestContexts(TestCase):
         #            [focus]  [t2   ]     [t3     ]
         context.setMode(context.RIPPLE)
         context.editTo(gst.SECOND * 20, 0)
-        self.failUnlessEqual(self.track_object1.start, gst.SECOND * 20)
+        self.failUnlessEqual(self._getRippledStart(self.track_object1), gst.SECOND * 20)
         self.failUnlessEqual(self.track_object1.duration,  gst.SECOND * 5)
         self.failUnlessEqual(self.track_object1.in_point, 0)
-        self.failUnlessEqual(self.track_object2.start, gst.SECOND * 35)
-        self.failUnlessEqual(self.track_object3.start, gst.SECOND * 45)
+        self.failUnlessEqual(self._getRippledStart(self.track_object2), gst.SECOND * 35)
+        self.failUnlessEqual(self._getRippledStart(self.track_object3), gst.SECOND * 45)
 
         # change back to default mode, and make sure this works as expected
         #             [t2   ]     [t3     ]
@@ -1354,9 +1399,9 @@ class TestContexts(TestCase):
         context.setMode(context.RIPPLE)
 
         #                            [t2  ][focus]  [t3     ]
-        self.failUnlessEqual(self.track_object1.start, 20 * gst.SECOND)
-        self.failUnlessEqual(self.track_object2.start, 11 * gst.SECOND)
-        self.failUnlessEqual(self.track_object3.start, 25 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object1), 20 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object2), 11 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object3), 25 * gst.SECOND)
 
         context.setMode(context.DEFAULT)
 
@@ -1766,29 +1811,29 @@ class TestContexts(TestCase):
 
         context.setMode(context.RIPPLE)
 
-        self.failUnlessEqual(self.track_object1.start, 15 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object1), 15 * gst.SECOND)
         self.failUnlessEqual(self.track_object1.in_point, 0 * gst.SECOND)
         self.failUnlessEqual(self.track_object1.duration, 10 * gst.SECOND)
-        self.failUnlessEqual(self.track_object2.start, 0 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object2), 0 * gst.SECOND)
         self.failUnlessEqual(self.track_object2.in_point, 0 * gst.SECOND)
-        self.failUnlessEqual(self.track_object3.start, 9 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object3), 9 * gst.SECOND)
         self.failUnlessEqual(self.track_object3.in_point, 0 * gst.SECOND)
 
         # ripple right
 
         context.editTo(25 * gst.SECOND, 0)
-        self.failUnlessEqual(self.track_object1.start, 25 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object1), 25 * gst.SECOND)
         self.failUnlessEqual(self.track_object1.in_point, 10 * gst.SECOND)
-        self.failUnlessEqual(self.track_object2.start, 6 * gst.SECOND)
-        self.failUnlessEqual(self.track_object3.start, 15 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object2), 6 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object3), 15 * gst.SECOND)
 
         # check that ripple is clamped to object duration
 
         context.editTo(30 * gst.SECOND, 0)
-        self.failUnlessEqual(self.track_object1.start, 25 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object1), 25 * gst.SECOND)
         self.failUnlessEqual(self.track_object1.in_point, 10 * gst.SECOND)
-        self.failUnlessEqual(self.track_object2.start, 6 * gst.SECOND)
-        self.failUnlessEqual(self.track_object3.start, 15 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object2), 6 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object3), 15 * gst.SECOND)
 
         # test switch back to default
 
@@ -1801,10 +1846,10 @@ class TestContexts(TestCase):
         # test switch back to ripple
 
         context.setMode(context.RIPPLE)
-        self.failUnlessEqual(self.track_object1.start, 25 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object1), 25 * gst.SECOND)
         self.failUnlessEqual(self.track_object1.in_point, 10 * gst.SECOND)
-        self.failUnlessEqual(self.track_object2.start, 6 * gst.SECOND)
-        self.failUnlessEqual(self.track_object3.start, 15 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object2), 6 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object3), 15 * gst.SECOND)
 
         context.finish()
 
@@ -1835,11 +1880,11 @@ class TestContexts(TestCase):
 
         context.setMode(context.RIPPLE)
 
-        self.failUnlessEqual(self.track_object1.start, 1 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object1), 1 * gst.SECOND)
         self.failUnlessEqual(self.track_object1.duration, 9 * gst.SECOND)
-        self.failUnlessEqual(self.track_object2.start, 10 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object2), 10 * gst.SECOND)
         self.failUnlessEqual(self.track_object2.duration, 5 * gst.SECOND)
-        self.failUnlessEqual(self.track_object3.start, 15 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object3), 15 * gst.SECOND)
         self.failUnlessEqual(self.track_object3.duration, 5 * gst.SECOND)
 
         context.editTo(gst.SECOND * 10, 0)
@@ -1848,15 +1893,15 @@ class TestContexts(TestCase):
 
         context.editTo(gst.SECOND * 15, 0)
         self.failUnlessEqual(self.track_object1.duration, 10 * gst.SECOND)
-        self.failUnlessEqual(self.track_object2.start, 11 * gst.SECOND)
-        self.failUnlessEqual(self.track_object3.start, 16 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object2), 11 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object3), 16 * gst.SECOND)
 
         # check that we can't ripple before initial start of focal object
 
         context.editTo(0, 0)
         self.failUnlessEqual(self.track_object1.duration, 0 * gst.SECOND)
-        self.failUnlessEqual(self.track_object2.start, 1 * gst.SECOND)
-        self.failUnlessEqual(self.track_object3.start, 6 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object2), 1 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object3), 6 * gst.SECOND)
 
         # switch back to default mode
 
@@ -1874,8 +1919,8 @@ class TestContexts(TestCase):
         context.setMode(context.RIPPLE)
 
         self.failUnlessEqual(self.track_object1.duration, 0 * gst.SECOND)
-        self.failUnlessEqual(self.track_object2.start, 1 * gst.SECOND)
-        self.failUnlessEqual(self.track_object3.start, 6 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object2), 1 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object3), 6 * gst.SECOND)
 
         context.finish()
 
@@ -1901,10 +1946,85 @@ class TestContexts(TestCase):
         context.setMode(context.RIPPLE)
         context.editTo(10 * gst.SECOND, 0)
 
+        self.failUnlessEqual(self._getRippledStart(self.track_object1), 10 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object2), 10 * gst.SECOND)
+        self.failUnlessEqual(self._getRippledStart(self.track_object3), 11 * gst.SECOND)
+
+        context.finish()
         self.failUnlessEqual(self.track_object1.start, 10 * gst.SECOND)
         self.failUnlessEqual(self.track_object2.start, 10 * gst.SECOND)
         self.failUnlessEqual(self.track_object3.start, 11 * gst.SECOND)
 
+    def testRippleIsCommittedOnFinish(self):
+        # [focus]  [t2   ]
+        #              [t3     ]
+        self.track_object1.start = 0
+        self.track_object1.duration = 5 * gst.SECOND
+        self.track_object2.start = 10 * gst.SECOND
+        self.track_object2.duration = 5 * gst.SECOND
+        self.track_object3.start = 12 * gst.SECOND
+        self.track_object3.duration = 5 * gst.SECOND
+        self.track_object3.priority = 1
+
+        context = MoveContext(self.timeline, self.track_object1, set())
+        context.setMode(context.RIPPLE)
+        context.editTo(3 * gst.SECOND, 0)
+        context.editTo(4 * gst.SECOND, 0)
+
+        # nothing is moved while rippling, the timeline holds the offset
+        self.failUnlessEqual(self.timeline.ripple_objects,
+                frozenset([self.timeline_object1, self.timeline_object2,
+                    self.timeline_object3]))
+        self.failUnlessEqual(self.timeline.ripple_offset, 4 * gst.SECOND)
+        self.failUnlessEqual(self.track_object1.start, 0)
+        self.failUnlessEqual(self.track_object2.start, 10 * gst.SECOND)
+        self.failUnlessEqual(self.track_object3.start, 12 * gst.SECOND)
+
+        context.finish()
+        self.failUnlessEqual(self.timeline.ripple_objects, frozenset())
+        self.failUnlessEqual(self.timeline.ripple_offset, 0)
+        self.failUnlessEqual(self.track_object1.start, 4 * gst.SECOND)
+        self.failUnlessEqual(self.track_object2.start, 14 * gst.SECOND)
+        self.failUnlessEqual(self.track_object3.start, 16 * gst.SECOND)
+        self.failUnlessEqual(self.track_object3.priority, 1)
+
+        # finishing twice doesn't move anything again
+        context.finish()
+        self.failUnlessEqual(self.track_object2.start, 14 * gst.SECOND)
+
+    def testRippleDoesntSnapToOwnEdges(self):
+        # [t2]      [focus]  [t3   ]
+        self.track_object1.start = 10 * gst.SECOND
+        self.track_object1.duration = 5 * gst.SECOND
+        self.track_object2.start = 0
+        self.track_object2.duration = 2 * gst.SECOND
+        self.track_object2.priority = 1
+        self.track_object3.start = 20 * gst.SECOND
+        self.track_object3.duration = 5 * gst.SECOND
+        self.timeline.dead_band = gst.SECOND
+
+        context = MoveContext(self.timeline, self.track_object1, set())
+        context.setMode(context.RIPPLE)
+        context.editTo(16 * gst.SECOND, 0)
+        self.failUnlessEqual(self._getRippledStart(self.track_object1),
+                16 * gst.SECOND)
+
+        # dragging back close to where the focus started doesn't pull it to
+        # its original start
+        context.editTo(10 * gst.SECOND + gst.SECOND / 2, 0)
+        self.failUnlessEqual(self._getRippledStart(self.track_object1),
+                10 * gst.SECOND + gst.SECOND / 2)
+
+        # the other edges are still snapped to
+        context.editTo(2 * gst.SECOND + gst.SECOND / 2, 0)
+        self.failUnlessEqual(self._getRippledStart(self.track_object1),
+                2 * gst.SECOND)
+
+        context.finish()
+        self.failUnlessEqual(self.timeline.edges.edges,
+                [0, 2 * gst.SECOND, 2 * gst.SECOND, 7 * gst.SECOND,
+                    12 * gst.SECOND, 17 * gst.SECOND])
+
     def tearDown(self):
         del self.timeline_object1
         del self.timeline_object2
@@ -106,7 +106,7 @@ class TestTrackObject(TestCase):
         # test video stream$
         obj.stream_type = VideoStream
         priority = 100
-        gnl_priority = 3 * 100 + 3 + obj._stagger
+        gnl_priority = 3 * 100 + 4 + obj._stagger
         obj.priority = priority
         self.failUnlessEqual(obj.priority, priority)
         self.failUnlessEqual(gnl_object.props.priority, gnl_priority)
@@ -152,7 +152,7 @@ class TestTrackObject(TestCase):
         # video stream
         obj.stream_type = VideoStream
         gnl_priority = 100
-        priority = (100 - 2 - obj._stagger) // 3
+        priority = (100 - 3 - obj._stagger) // 3
         gnl_object.props.priority = gnl_priority
         self.failUnlessEqual(obj.priority, priority)
         self.failUnlessEqual(gnl_object.props.priority, gnl_priority)
@@ -366,6 +366,45 @@ class TestTrackObject(TestCase):
         self.failUnlessEqual(keyframes, expected)
         self.failUnlessEqual(keyframes2, expected2)
 
+    def testKeyframesInRange(self):
+        factory = AudioTestSourceFactory()
+        factory.duration = 10 * gst.SECOND
+        stream_ = AudioStream(gst.Caps("audio/x-raw-int"))
+        obj = SourceTrackObject(factory, stream_)
+        track = Track(stream_)
+        track.addTrackObject(obj)
+        obj.duration = 10 * gst.SECOND
+
+        interpolator = obj.getInterpolator("volume")
+        # add keyframes out of order, they must be kept sorted
+        kf6 = interpolator.newKeyframe(6 * gst.SECOND, 0.5)
+        kf2 = interpolator.newKeyframe(2 * gst.SECOND, 0.5)
+        kf4 = interpolator.newKeyframe(4 * gst.SECOND, 0.5)
+        kf8 = interpolator.newKeyframe(8 * gst.SECOND, 0.5)
+        self.failUnlessEqual(list(interpolator.getInteriorKeyframes()),
+                [kf2, kf4, kf6, kf8])
+
+        self.failUnlessEqual(interpolator.keyframesInRange(
+                3 * gst.SECOND, 6 * gst.SECOND), [kf4, kf6])
+        self.failUnlessEqual(interpolator.keyframesInRange(
+                4 * gst.SECOND, 4 * gst.SECOND), [kf4])
+        self.failUnlessEqual(interpolator.keyframesInRange(
+                9 * gst.SECOND, 10 * gst.SECOND), [])
+
+        # the visible keyframes include a neighbour on each side of the range
+        visible = list(interpolator.getVisibleKeyframes(
+                5 * gst.SECOND, 5 * gst.SECOND))
+        self.failUnlessEqual(visible,
+                [interpolator.start, kf4, kf6, interpolator.end])
+
+        kf2.time = 7 * gst.SECOND
+        self.failUnlessEqual(list(interpolator.getInteriorKeyframes()),
+                [kf4, kf6, kf2, kf8])
+
+        interpolator.removeKeyframe(kf6)
+        self.failUnlessEqual(interpolator.keyframesInRange(
+                0, 10 * gst.SECOND), [kf4, kf2, kf8])
+
 class TestTrack(TestCase):
     def setUp(self):
         TestCase.setUp(self)
@@ -437,6 +476,42 @@ class TestTrack(TestCase):
         for obj in objs:
             self.failUnlessEqual(obj.track, None)
 
+    def testDefaultSources(self):
+        track = self.track1
+
+        def make_object(start, duration):
+            obj = SourceTrackObject(self.factory, self.stream)
+            obj.start = start
+            obj.duration = duration
+            track.addTrackObject(obj)
+            return obj
+
+        def get_gaps():
+            return [(source.props.start, source.props.duration)
+                    for source in track.default_sources]
+
+        make_object(0, 10 * gst.SECOND)
+        obj2 = make_object(20 * gst.SECOND, 10 * gst.SECOND)
+        track.updateDefaultSources()
+        self.failUnlessEqual(get_gaps(), [(10 * gst.SECOND, 10 * gst.SECOND)])
+        source = track.default_sources[0]
+
+        # the default source is resized, not replaced
+        obj2.start = 25 * gst.SECOND
+        track.updateDefaultSources()
+        self.failUnlessEqual(get_gaps(), [(10 * gst.SECOND, 15 * gst.SECOND)])
+        self.failUnless(track.default_sources[0] is source)
+
+        obj3 = make_object(40 * gst.SECOND, 10 * gst.SECOND)
+        track.updateDefaultSources()
+        self.failUnlessEqual(get_gaps(), [(10 * gst.SECOND, 15 * gst.SECOND),
+                (35 * gst.SECOND, 5 * gst.SECOND)])
+        self.failUnless(track.default_sources[0] is source)
+
+        track.removeTrackObject(obj3)
+        self.failUnlessEqual(get_gaps(), [(10 * gst.SECOND, 15 * gst.SECOND)])
+        self.failUnless(track.default_sources[0] is source)
+
     def testMaxPriority(self):
         track = self.track1
         factory = self.factory
@@ -202,11 +202,11 @@ class TestTransitions(TestCase):
         self.failUnlessEqual(vt.priority, 0)
 
         # check video transition priority basic properties
-        self.failUnlessEqual(vt.operation.props.priority, 1)
+        self.failUnlessEqual(vt.operation.props.priority, 2)
         vt.a.priority = 2
         vt.b.priority = 2
         self.failUnlessEqual(vt.priority, 2)
-        self.failUnlessEqual(vt.operation.props.priority, 7)
+        self.failUnlessEqual(vt.operation.props.priority, 8)
 
         self.failUnlessEqual(at.priority, 2)
 
@@ -214,10 +214,10 @@ class TestTransitions(TestCase):
         vt.a.updatePosition(0)
         vt.b.updatePosition(1)
 
-        self.failUnlessEqual(vt.a.gnl_object.props.priority, 9)
+        self.failUnlessEqual(vt.a.gnl_object.props.priority, 10)
         self.failUnlessEqual(at.a._stagger, 0)
         self.failUnlessEqual(at.b._stagger, 1)
-        self.failUnlessEqual(vt.b.gnl_object.props.priority, 10)
+        self.failUnlessEqual(vt.b.gnl_object.props.priority, 11)
 
         self.failUnlessEqual(vt.controller.get("alpha", 0), 1.0)
         self.failUnlessEqual(vt.controller.get("alpha", vt.duration),
@@ -35,6 +35,27 @@ class DummyUndoableAction(UndoableAction):
         self.done_ = False
         self._undone()
 
+class PropertyAction(UndoableAction):
+    def __init__(self, obj, name, old_value, new_value):
+        self.obj = obj
+        self.name = name
+        self.old_value = old_value
+        self.new_value = new_value
+
+    def do(self):
+        self.obj[self.name] = self.new_value
+        self._done()
+
+    def undo(self):
+        self.obj[self.name] = self.old_value
+        self._undone()
+
+    def getCoalesceKey(self):
+        return (id(self.obj), self.name)
+
+    def coalesce(self, action):
+        self.new_value = action.new_value
+
 class TestUndoableAction(TestCase):
     def testSimpleSignals(self):
         """
@@ -139,6 +160,30 @@ class TestUndoableActionStack(TestCase):
         self.failUnlessEqual(state["actions"], 1)
         self.failUnless(state["done"])
 
+    def testCoalesce(self):
+        """
+        Consecutive changes to the same property are merged.
+        """
+        obj = {"x": 0, "y": 0}
+        stack = UndoableActionStack("meh")
+        self.failIf(stack.push(PropertyAction(obj, "x", 0, 1)))
+        self.failIf(stack.push(PropertyAction(obj, "y", 0, 5)))
+        self.failUnless(stack.push(PropertyAction(obj, "x", 1, 2)))
+        self.failUnless(stack.push(PropertyAction(obj, "x", 2, 3)))
+        self.failUnlessEqual(len(stack.done_actions), 2)
+        self.failUnlessEqual(stack.done_actions[0].old_value, 0)
+        self.failUnlessEqual(stack.done_actions[0].new_value, 3)
+
+        # actions that can't be merged break the sequence
+        self.failIf(stack.push(DummyUndoableAction()))
+        self.failIf(stack.push(PropertyAction(obj, "x", 3, 4)))
+        self.failUnlessEqual(stack.getActionCount(), 4)
+
+        stack.undo()
+        self.failUnlessEqual(obj, {"x": 0, "y": 0})
+        stack.do()
+        self.failUnlessEqual(obj, {"x": 4, "y": 5})
+
 
 class TestUndoableActionLog(TestCase):
     def setUp(self):
@@ -416,3 +461,56 @@ class TestUndoableActionLog(TestCase):
         self.log.undo()
         self.failUnlessEqual(call_sequence, ["undo3", "undo2", "undo1"])
 
+    def testBudget(self):
+        """
+        The oldest stacks are dropped when there are too many actions.
+        """
+        self.log.max_actions = 3
+        for i in xrange(3):
+            self.log.begin("stack%d" % i)
+            self.log.push(DummyUndoableAction())
+            self.log.push(DummyUndoableAction())
+            self.log.commit()
+
+        self.failUnlessEqual([stack.action_group_name
+                for stack in self.log.undo_stacks], ["stack2"])
+        self.failUnlessEqual(self.log.getActionCount(), 2)
+
+        # the last stack is kept even if it's over budget
+        self.log.begin("big")
+        for i in xrange(5):
+            self.log.push(DummyUndoableAction())
+        self.log.commit()
+        self.failUnlessEqual([stack.action_group_name
+                for stack in self.log.undo_stacks], ["big"])
+        self.failUnlessEqual(self.log.getActionCount(), 5)
+
+    def testDirtyAfterBudget(self):
+        self.log.max_actions = 1
+        self.log.begin("meh")
+        self.log.push(DummyUndoableAction())
+        self.log.commit()
+        self.log.begin("meh")
+        self.log.push(DummyUndoableAction())
+        self.log.commit()
+        self.failUnlessEqual(len(self.log.undo_stacks), 1)
+
+        # undoing everything doesn't bring back the initial state
+        self.log.undo()
+        self.failUnless(self.log.dirty())
+        self.log.checkpoint()
+        self.log.redo()
+        self.failUnless(self.log.dirty())
+        self.log.undo()
+        self.failIf(self.log.dirty())
+
+    def testDirtyAfterNewCommit(self):
+        self.log.begin("meh")
+        self.log.push(DummyUndoableAction())
+        self.log.commit()
+        self.log.checkpoint()
+        self.log.undo()
+        self.log.begin("meh")
+        self.log.push(DummyUndoableAction())
+        self.log.commit()
+        self.failUnless(self.log.dirty())